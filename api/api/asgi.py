@@ -12,5 +12,8 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'api.settings')
+os.environ.setdefault('PORTFOLIO_ASYNC_READS', 'True')
+# Persistent connections leak under ASGI, see DB_CONN_MAX_AGE in settings
+os.environ.setdefault('DB_CONN_MAX_AGE', '0')
 
 application = get_asgi_application()
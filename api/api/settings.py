@@ -1,6 +1,7 @@
 from pathlib import Path
 import os
-from decouple import config
+from urllib.parse import urlsplit
+from decouple import Csv, config
 import dj_database_url
 
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -8,6 +9,8 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 SECRET_KEY = config('SECRET_KEY', default='unsafe-secret-key')
 DEBUG = config('DEBUG', default=False, cast=bool)
 ALLOWED_HOSTS = ['portfolio-p2k3.onrender.com', 'portfolio-git-main-krish-patils-projects.vercel.app','portfolio-onu1wc3e3-krish-patils-projects.vercel.app']
+# Domains of host-based tenants (a leading dot matches every subdomain)
+ALLOWED_HOSTS += config('PORTFOLIO_TENANT_HOSTS', default='', cast=Csv())
 
 # Installed apps
 INSTALLED_APPS = [
@@ -26,10 +29,13 @@ INSTALLED_APPS = [
 
 # Middleware
 MIDDLEWARE = [
+    'portfolio.metrics.MetricsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'portfolio.tenants.TenantMiddleware',
+    'portfolio.middleware.WhiteNoiseMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.middleware.common.CommonMiddleware',
+    'portfolio.routers.ReplicaRoutingMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
@@ -37,6 +43,14 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Request timings: a Server-Timing header on every response and Prometheus text at /metrics/
+PORTFOLIO_METRICS = {
+    'SERVER_TIMING': config('PORTFOLIO_SERVER_TIMING', default=True, cast=bool),
+    # When set, /metrics/ wants "Authorization: Bearer <token>"
+    'TOKEN': config('PORTFOLIO_METRICS_TOKEN', default=''),
+    'BUCKETS': (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+}
+
 # CORS
 CORS_ALLOWED_ORIGINS = [
     "https://portfolio-p2k3.onrender.com",
@@ -52,6 +66,20 @@ STATIC_URL = '/static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 
+# Static copy of the content API under STATIC_ROOT/api-snapshot (manage.py build_snapshot).
+# MODE 'redirect' sends plain API reads to the versioned file while it is current,
+# 'serve' answers them from it in place; '' leaves every read to the views. Freshness
+# is checked against the database (max updated_at and count per model) on each read.
+PORTFOLIO_SNAPSHOT = {
+    'MODE': config('PORTFOLIO_SNAPSHOT_MODE', default=''),
+    # Rebuild in the background after content changes
+    'AUTO': config('PORTFOLIO_SNAPSHOT_AUTO', default=False, cast=bool),
+    'DEBOUNCE_SECONDS': config('PORTFOLIO_SNAPSHOT_DEBOUNCE_SECONDS', default=2.0, cast=float),
+    'KEEP': 3,
+    # Absolute URLs in the snapshot are built against this origin
+    'BASE_URL': config('PORTFOLIO_SNAPSHOT_BASE_URL', default='https://portfolio-p2k3.onrender.com'),
+}
+
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
@@ -63,6 +91,24 @@ CLOUDINARY_STORAGE = {
 }
 DEFAULT_FILE_STORAGE = 'cloudinary_storage.storage.MediaCloudinaryStorage'
 
+# Image uploads run on a background worker pool; LocalImageStorage keeps them
+# under MEDIA_ROOT instead of Cloudinary for offline work and tests.
+PORTFOLIO_IMAGE_STORAGE = config('PORTFOLIO_IMAGE_STORAGE', default='portfolio.storage.CloudinaryImageStorage')
+# Widths of the responsive variants stored with every image (the API's image_srcset)
+PORTFOLIO_IMAGE_WIDTHS = (320, 640, 1280)
+PORTFOLIO_UPLOADS = {
+    'WORKERS': config('PORTFOLIO_UPLOAD_WORKERS', default=2, cast=int),
+    'MAX_ATTEMPTS': config('PORTFOLIO_UPLOAD_MAX_ATTEMPTS', default=5, cast=int),
+    'BACKOFF_SECONDS': config('PORTFOLIO_UPLOAD_BACKOFF_SECONDS', default=2.0, cast=float),
+    'STAGING_DIR': os.path.join(MEDIA_ROOT, 'staging'),
+    # Run uploads inline, like Celery's task_always_eager
+    'EAGER': config('PORTFOLIO_UPLOADS_EAGER', default=False, cast=bool),
+    # Chunked uploads (<route>/<pk>/image-upload/): largest image accepted, and how long an
+    # unfinished one may sit idle before process_due_jobs() throws its bytes away
+    'MAX_BYTES': config('PORTFOLIO_UPLOAD_MAX_BYTES', default=50 * 1024 * 1024, cast=int),
+    'SESSION_HOURS': config('PORTFOLIO_UPLOAD_SESSION_HOURS', default=24, cast=int),
+}
+
 # Templates
 TEMPLATES = [
     {
@@ -83,13 +129,112 @@ TEMPLATES = [
 # WSGI
 WSGI_APPLICATION = 'api.wsgi.application'
 
+# Serve plain GET reads of the content routes with native async views.
+# api/asgi.py turns this on; WSGI deployments keep the DRF views.
+PORTFOLIO_ASYNC_READS = config('PORTFOLIO_ASYNC_READS', default=False, cast=bool)
+
 # Database
+# Connections are kept open between requests and health-checked before reuse.
+# Not under ASGI: async ORM calls run in threads of their own, whose persistent
+# connections are never closed, so api/asgi.py defaults DB_CONN_MAX_AGE to 0
+# (use a pooler such as PgBouncer there instead).
+DB_CONN_MAX_AGE = config('DB_CONN_MAX_AGE', default=600, cast=int)
+DB_CONN_HEALTH_CHECKS = config('DB_CONN_HEALTH_CHECKS', default=True, cast=bool)
+
 DATABASES = {
     'default': dj_database_url.config(
-        default=config('DATABASE_URL')
+        default=config('DATABASE_URL'),
+        conn_max_age=DB_CONN_MAX_AGE,
+        conn_health_checks=DB_CONN_HEALTH_CHECKS,
     )
 }
 
+# Optional read replica: safe-method requests to the portfolio API read from it
+DATABASE_REPLICA_URL = config('DATABASE_REPLICA_URL', default='')
+if DATABASE_REPLICA_URL:
+    DATABASES['replica'] = dj_database_url.parse(
+        DATABASE_REPLICA_URL,
+        conn_max_age=DB_CONN_MAX_AGE,
+        conn_health_checks=DB_CONN_HEALTH_CHECKS,
+        test_options={'MIRROR': 'default'},
+    )
+DATABASE_ROUTERS = ['portfolio.routers.ReplicaRouter']
+# How long reads stay on the primary after a write, to hide replication lag
+DB_READ_AFTER_WRITE_SECONDS = config('DB_READ_AFTER_WRITE_SECONDS', default=5, cast=int)
+
+# Caches
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Shared store for multi-worker deployments (point it at Redis in production)
+    'portfolio': {
+        'BACKEND': config('PORTFOLIO_SHARED_CACHE', default='django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': config('PORTFOLIO_SHARED_CACHE_LOCATION', default=os.path.join(BASE_DIR, '.cache')),
+        'TIMEOUT': None,
+        'OPTIONS': {'MAX_ENTRIES': config('PORTFOLIO_CACHE_MAX_ENTRIES', default=512, cast=int)},
+    },
+}
+
+# API response cache: portfolio.cache.MemoryBackend or portfolio.cache.DjangoCacheBackend.
+# Entries are versioned by max(updated_at) and count of their rows, read from the database,
+# so either is safe with several workers; a shared one only saves the duplicate renders.
+# Entries are keyed per tenant but share MAX_ENTRIES; with many tenants, size it (or the
+# shared cache) for all of their pages, about five per tenant (manage.py bench_tenants)
+PORTFOLIO_CACHE = {
+    'BACKEND': config('PORTFOLIO_CACHE_BACKEND', default='portfolio.cache.MemoryBackend'),
+    'OPTIONS': {'max_entries': config('PORTFOLIO_CACHE_MAX_ENTRIES', default=512, cast=int)},
+}
+
+# Serialized output of single content rows, reused until the row's updated_at changes
+# (portfolio.fragments). Counted in /metrics/ as portfolio_fragment_cache_*
+PORTFOLIO_FRAGMENTS = {
+    'MAX_ENTRIES': config('PORTFOLIO_FRAGMENTS_MAX_ENTRIES', default=5000, cast=int),
+}
+
+# Coalescing of concurrent cache misses: how long followers wait for the leader's
+# result before computing their own, and how long a cross-process leader lock lives
+PORTFOLIO_SINGLE_FLIGHT = {
+    'TIMEOUT': config('PORTFOLIO_SINGLE_FLIGHT_TIMEOUT', default=5.0, cast=float),
+    'LOCK_TIMEOUT': config('PORTFOLIO_SINGLE_FLIGHT_LOCK_TIMEOUT', default=30, cast=int),
+}
+
+# /changes/?since=<token>: rows touched up to OVERLAP_SECONDS before the token are sent
+# again, so writes still in flight when it was issued are not missed; tokens older than
+# TOMBSTONE_DAYS (how long deletions are remembered) get a full reset instead
+PORTFOLIO_SYNC = {
+    'OVERLAP_SECONDS': config('PORTFOLIO_SYNC_OVERLAP_SECONDS', default=5, cast=int),
+    'TOMBSTONE_DAYS': config('PORTFOLIO_SYNC_TOMBSTONE_DAYS', default=30, cast=int),
+}
+
+# /events/ (ASGI only): server-sent change notices. portfolio.events.MemoryBroker reaches
+# the streams of one process; portfolio.events.FileBroker fans out across the processes
+# of one host through a shared file (OPTIONS {'path': ...}, default in the temp dir)
+PORTFOLIO_EVENTS = {
+    'BROKER': config('PORTFOLIO_EVENTS_BROKER', default='portfolio.events.MemoryBroker'),
+    'OPTIONS': {},
+    'KEEPALIVE': config('PORTFOLIO_EVENTS_KEEPALIVE', default=15, cast=int),
+    'RETRY_MS': 3000,
+}
+
+# Tenants are picked by Host (Tenant.domain) or by a /<PATH_PREFIX>/<slug>/ path prefix;
+# any other request belongs to the DEFAULT tenant. Each process keeps the slug and domain
+# table for CACHE_SECONDS, or until a tenant is saved or deleted in that process.
+PORTFOLIO_TENANTS = {
+    'DEFAULT': config('PORTFOLIO_DEFAULT_TENANT', default='default'),
+    'PATH_PREFIX': 't',
+    'CACHE_SECONDS': config('PORTFOLIO_TENANT_CACHE_SECONDS', default=60, cast=int),
+}
+
+# Run by gunicorn.conf.py before a worker takes traffic (and by manage.py warmup):
+# open the database connections and fill the response caches for these paths
+PORTFOLIO_WARMUP = {
+    'ENABLED': config('PORTFOLIO_WARMUP', default=True, cast=bool),
+    'PATHS': ['/bundle/', '/education/', '/work/', '/portfolio/', '/skills/'],
+    # Cached responses are keyed by host, so warm them for the public one
+    'HOST': urlsplit(PORTFOLIO_SNAPSHOT['BASE_URL']).netloc,
+}
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
@@ -106,3 +251,6 @@ USE_TZ = True
 
 # Default primary key field
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# Covering indexes (INCLUDE) are PostgreSQL-only; SQLite just builds them without the extra columns
+SILENCED_SYSTEM_CHECKS = ['models.W040']
@@ -18,9 +18,11 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
+from portfolio.metrics import metrics_view
 
 urlpatterns = [
-    path('', include('portfolio.urls')),
+    path('', include('portfolio.async_urls' if settings.PORTFOLIO_ASYNC_READS else 'portfolio.urls')),
+    path('metrics/', metrics_view, name='metrics'),
     path('admin/', admin.site.urls),
     path('api-auth/', include('rest_framework.urls'))
 ]
@@ -0,0 +1,14 @@
+# Picked up automatically when gunicorn is started from this directory (gunicorn api.wsgi)
+
+
+def post_worker_init(worker):
+    # The app is loaded but the worker is not accepting connections yet
+    from django.conf import settings
+
+    if settings.PORTFOLIO_WARMUP['ENABLED']:
+        from portfolio.warmup import warm_up
+
+        try:
+            warm_up()
+        except Exception:
+            worker.log.exception('Warm-up failed; serving cold')
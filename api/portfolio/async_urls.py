@@ -0,0 +1,17 @@
+from django.urls import path
+
+from . import async_views, events, urls
+
+# GET/HEAD on the content routes run natively async; other methods on those
+# routes, and every other route, end up in the regular DRF views. The event
+# stream is ASGI-only: under WSGI each open stream would hold a worker thread.
+urlpatterns = [
+    path('events/', events.events_view, name='events'),
+] + [
+    pattern
+    for resource in async_views.VIEWSETS
+    for pattern in (
+        path(f'{resource}/', async_views.content_list, {'resource': resource}),
+        path(f'{resource}/<int:pk>/', async_views.content_detail, {'resource': resource}),
+    )
+] + urls.urlpatterns
@@ -0,0 +1,101 @@
+"""Native async GET handlers for the content routes, used when served through ASGI.
+
+Plain list/detail reads (optionally with ?fields= / ?omit=) are answered on
+the event loop with the async ORM. Anything else -- writes, pagination,
+browsable API, other query parameters -- is handed to the regular DRF
+viewset, so behaviour matches the WSGI deployment.
+"""
+from asgiref.sync import sync_to_async
+from django.db.models import Count, Max
+from django.http import Http404, HttpResponse, JsonResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from rest_framework.exceptions import ValidationError
+from rest_framework.renderers import JSONRenderer
+
+from .cache import content_version, get_backend, response_key
+from .mixins import content_etag
+from .views import EducationViewSet, WorkViewSet, PortfolioViewSet, SkillViewSet
+
+VIEWSETS = {
+    'education': EducationViewSet,
+    'work': WorkViewSet,
+    'portfolio': PortfolioViewSet,
+    'skills': SkillViewSet,
+}
+ASYNC_PARAMS = {'fields', 'omit', 'format'}
+
+_fallbacks = {
+    (resource, detail): sync_to_async(viewset.as_view(
+        {'get': 'retrieve', 'put': 'update', 'patch': 'partial_update', 'delete': 'destroy'} if detail
+        else {'get': 'list', 'post': 'create'}
+    ))
+    for resource, viewset in VIEWSETS.items()
+    for detail in (False, True)
+}
+
+
+def handled_async(request):
+    if request.method not in ('GET', 'HEAD'):
+        return False
+    if not set(request.GET) <= ASYNC_PARAMS or request.GET.get('format', 'json') != 'json':
+        return False
+    accept = request.headers.get('Accept', '')
+    return 'text/html' not in accept
+
+
+async def content_list(request, resource):
+    if not handled_async(request):
+        return await _fallbacks[resource, False](request)
+    viewset = VIEWSETS[resource]
+    queryset = viewset.queryset.for_tenant()
+    state = await queryset.order_by().aaggregate(last=Max('updated_at'), count=Count('pk'))
+    return await _respond(request, viewset, queryset, state['last'], state['count'], many=True)
+
+
+async def content_detail(request, resource, pk):
+    if not handled_async(request):
+        return await _fallbacks[resource, True](request, pk=pk)
+    viewset = VIEWSETS[resource]
+    queryset = viewset.queryset.for_tenant().filter(pk=pk)
+    last = await queryset.values_list('updated_at', flat=True).afirst()
+    if last is None:
+        raise Http404
+    return await _respond(request, viewset, queryset, last, 1, many=False, pk=pk)
+
+
+async def _respond(request, viewset, queryset, last_modified, count, many, pk=None):
+    model = queryset.model
+    etag = content_etag(model, last_modified, count, request)
+    timestamp = int(last_modified.timestamp()) if last_modified else None
+    response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+
+    if response is None:
+        backend = get_backend()
+        key = response_key(model, request, 'async', pk, version=content_version(last_modified, count))
+        body = await backend.aget(key)
+        if body is None:
+            try:
+                context = {'request': request, 'sparse_fieldsets': True}
+                serializer = viewset.serializer_class(context=context)
+            except ValidationError as e:
+                return JsonResponse(e.detail, status=400)
+            reader = serializer.values_reader() if many else None
+            if reader is not None:
+                columns, read = reader
+                # ValuesListIterable runs its query as soon as it is iterated, so aiterator() would do that on the loop
+                rows = await sync_to_async(list)(queryset.values_list(*columns))
+                data = [read(row) for row in rows]
+            else:
+                rows = [obj async for obj in queryset.only(*serializer.model_columns()).aiterator()]
+                if not (many or rows):
+                    raise Http404
+                data = viewset.serializer_class(rows if many else rows[0], many=many, context=context).data
+            body = JSONRenderer().render(data)
+            await backend.aset(key, body)
+        response = HttpResponse(body, content_type='application/json')
+
+    response['ETag'] = etag
+    if timestamp is not None:
+        response['Last-Modified'] = http_date(timestamp)
+    return response
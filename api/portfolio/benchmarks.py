@@ -0,0 +1,50 @@
+"""Helpers shared by the bench_* management commands."""
+import statistics
+from contextlib import contextmanager
+
+from django.contrib.auth.models import User
+from django.db import connections
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from .models import Education, Work, Portfolio, Skills
+
+
+@contextmanager
+def test_database():
+    """A throwaway copy of the default database, so benchmarks never touch real data."""
+    setup_test_environment()
+    old_name = connections['default'].creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        yield
+    finally:
+        connections['default'].creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+def seed(rows, users=0, batch_size=1000):
+    Education.objects.bulk_create(
+        (Education(school=f'S{i}', degree='BS', years='2020', ordinal=i) for i in range(rows)), batch_size=batch_size)
+    Work.objects.bulk_create(
+        (Work(company=f'C{i}', years='2020', description='x' * 500, ordinal=i) for i in range(rows)), batch_size=batch_size)
+    Portfolio.objects.bulk_create(
+        (Portfolio(title=f'P{i}', description='x' * 500, url='https://example.com', ordinal=i) for i in range(rows)),
+        batch_size=batch_size)
+    Skills.objects.bulk_create((Skills(skillName=f'K{i}', ordinal=i) for i in range(rows)), batch_size=batch_size)
+    User.objects.bulk_create((User(username=f'user{i}', email=f'user{i}@example.com') for i in range(users)), batch_size=batch_size)
+
+
+def percentile(latencies, q):
+    """Nearest-rank percentile of an already sorted list."""
+    return latencies[max(int(round(len(latencies) * q)) - 1, 0)]
+
+
+def summarize(latencies, elapsed):
+    latencies = sorted(latencies)
+    return {
+        'requests': len(latencies),
+        'seconds': round(elapsed, 3),
+        'rps': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(statistics.median(latencies) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+    }
@@ -0,0 +1,41 @@
+import hashlib
+
+from rest_framework.renderers import JSONRenderer
+from .cache import content_versions, get_backend, single_flight
+from .models import Education, Work, Portfolio, Skills
+from .serializers import EducationSerializer, WorkSerializer, PortfolioSerializer, SkillsSerializer
+from .tenants import current_tenant_id
+
+# (key, model, serializer) for every collection the frontend loads on start-up
+SECTIONS = (
+    ('education', Education, EducationSerializer),
+    ('work', Work, WorkSerializer),
+    ('portfolio', Portfolio, PortfolioSerializer),
+    ('skills', Skills, SkillsSerializer),
+)
+
+
+def build_bundle(request=None):
+    context = {'request': request}
+    return {
+        key: serializer(model.objects.for_tenant().order_by('ordinal', 'id'), many=True, context=context).data
+        for key, model, serializer in SECTIONS
+    }
+
+
+def get_bundle(request=None):
+    """Rendered JSON for all sections of the current tenant, rebuilt only after one of them changes."""
+    backend = get_backend()
+    # Versions are read before building, so an edit committed while we build
+    # leaves the result under a key nobody asks for again.
+    versions = content_versions([model for _, model, _ in SECTIONS])
+    digest = hashlib.md5(repr(sorted(versions.items())).encode()).hexdigest()
+    key = f'portfolio:bundle:{current_tenant_id()}:{digest}'
+    rendered = backend.get(key)
+    if rendered is None:
+        def build():
+            rendered = JSONRenderer().render(build_bundle(request))
+            backend.set(key, rendered)
+            return rendered
+        rendered = single_flight(key, build)
+    return rendered
@@ -0,0 +1,255 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import Count, Max, Value
+from django.utils.module_loading import import_string
+
+from .signals import content_changed
+from .tenants import current_tenant_id
+
+
+class MemoryBackend:
+    """In-process LRU store. Each worker keeps its own copy."""
+    shared = False
+
+    def __init__(self, max_entries=512, **options):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            try:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+            except KeyError:
+                return None
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def counter(self, key):
+        with self._lock:
+            return self._counters.setdefault(key, time.time_ns())
+
+    def incr(self, key):
+        with self._lock:
+            self._counters[key] = self._counters.get(key, time.time_ns()) + 1
+            return self._counters[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._counters.clear()
+
+    # Nothing here blocks, so the async API just calls straight through
+    async def aget(self, key):
+        return self.get(key)
+
+    async def aset(self, key, value):
+        self.set(key, value)
+
+
+class DjangoCacheBackend:
+    """Entries kept in a Django cache alias (file based, Redis, ...) shared by all workers.
+
+    Size limits and eviction are those of the underlying cache (MAX_ENTRIES,
+    maxmemory-policy allkeys-lru).
+    """
+    shared = True
+
+    def __init__(self, alias='portfolio', timeout=None, **options):
+        self.alias = alias
+        self.timeout = timeout
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def get(self, key):
+        return self.cache.get(key)
+
+    def set(self, key, value):
+        self.cache.set(key, value, self.timeout)
+
+    def counter(self, key):
+        # Counters start from the clock so one evicted and re-created can
+        # never line up with entries cached under an older value.
+        self.cache.add(key, time.time_ns(), None)
+        return self.cache.get(key)
+
+    def incr(self, key):
+        try:
+            return self.cache.incr(key)
+        except ValueError:
+            self.cache.add(key, time.time_ns(), None)
+            return self.cache.incr(key)
+
+    def add(self, key, value, timeout):
+        return self.cache.add(key, value, timeout)
+
+    def delete(self, key):
+        self.cache.delete(key)
+
+    def clear(self):
+        self.cache.clear()
+
+    async def aget(self, key):
+        return await self.cache.aget(key)
+
+    async def aset(self, key, value):
+        await self.cache.aset(key, value, self.timeout)
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                conf = settings.PORTFOLIO_CACHE
+                _backend = import_string(conf['BACKEND'])(**conf.get('OPTIONS', {}))
+    return _backend
+
+
+def generation_key(model, tenant=None):
+    # Per tenant, so an edit only retires what was cached for the tenant it belongs to
+    return f'portfolio:gen:{current_tenant_id() if tenant is None else tenant}:{model._meta.label_lower}'
+
+
+def generation(model, tenant=None):
+    return get_backend().counter(generation_key(model, tenant))
+
+
+def bump_generation(sender, tenant=None, **kwargs):
+    # Only once committed: a read racing the transaction would otherwise
+    # record the old rows against the new generation
+    key = generation_key(sender, tenant)
+    transaction.on_commit(lambda: get_backend().incr(key))
+
+
+def content_version(last_modified, count):
+    """Cache version for rows whose newest updated_at is `last_modified`.
+
+    Unlike a generation it is read from the database, so it moves with every
+    committed edit whichever process, command or shell made it.
+    """
+    return f"{count}@{last_modified.isoformat() if last_modified else ''}"
+
+
+def _versions_query(models, tenant):
+    tenant = current_tenant_id() if tenant is None else tenant
+    queries = [
+        model.objects.for_tenant(tenant).order_by().values('tenant')
+        .annotate(label=Value(model._meta.label_lower), last=Max('updated_at'), count=Count('pk'))
+        .values_list('label', 'last', 'count')
+        for model in models
+    ]
+    return queries[0].union(*queries[1:], all=True)
+
+
+def _versions(models, rows):
+    found = {label: content_version(last, count) for label, last, count in rows}
+    return {model._meta.label_lower: found.get(model._meta.label_lower, content_version(None, 0)) for model in models}
+
+
+def content_versions(models, tenant=None):
+    """{label: content_version()} of the tenant's rows of each model, in one query."""
+    return _versions(models, _versions_query(models, tenant))
+
+
+async def acontent_versions(models, tenant=None):
+    return _versions(models, [row async for row in _versions_query(models, tenant)])
+
+
+class _Flight:
+    __slots__ = ('done', 'value')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+
+
+_flights = {}
+_flights_lock = threading.Lock()
+
+
+def single_flight(key, compute):
+    """compute() run once for any number of callers missing `key` at the same time.
+
+    Threads of this process wait for the first caller's result. With a shared
+    backend the first caller also takes a lock next to `key`, and first
+    callers in other processes poll for `key` instead of computing, so
+    compute() has to store its result under `key` itself. Nobody waits longer
+    than PORTFOLIO_SINGLE_FLIGHT['TIMEOUT'] and the lock expires after
+    LOCK_TIMEOUT, so a stuck or crashed leader only ever costs one timeout.
+    A None result is not shared; waiters then compute their own.
+    """
+    conf = settings.PORTFOLIO_SINGLE_FLIGHT
+    with _flights_lock:
+        flight = _flights.get(key)
+        leader = flight is None
+        if leader:
+            flight = _flights[key] = _Flight()
+    if not leader:
+        if flight.done.wait(conf['TIMEOUT']) and flight.value is not None:
+            return flight.value
+        return compute()
+
+    try:
+        flight.value = _lead(key, compute, conf)
+        return flight.value
+    finally:
+        with _flights_lock:
+            del _flights[key]
+        flight.done.set()
+
+
+def _lead(key, compute, conf):
+    backend = get_backend()
+    if not backend.shared:
+        return compute()
+    # cache.add is atomic on Redis/Memcached; on the file cache two leaders may
+    # occasionally both get in, which only costs the duplicate work.
+    lock = f'{key}:lock'
+    if backend.add(lock, 1, conf['LOCK_TIMEOUT']):
+        try:
+            return compute()
+        finally:
+            backend.delete(lock)
+
+    deadline = time.monotonic() + conf['TIMEOUT']
+    delay = 0.005
+    while time.monotonic() < deadline:
+        time.sleep(delay)
+        delay = min(delay * 2, 0.1)
+        value = backend.get(key)
+        if value is not None:
+            return value
+        if backend.get(lock) is None:
+            # The other leader gave up without a result
+            break
+    return compute()
+
+
+def response_key(model, request, *parts, version):
+    """Key of a cached response; `version` is the content_version() of the rows it was built from."""
+    params = sorted(getattr(request, 'query_params', request.GET).lists())
+    digest = hashlib.md5(repr((request.get_host(), parts, params, version)).encode()).hexdigest()
+    return f'portfolio:resp:{current_tenant_id()}:{model._meta.label_lower}:{digest}'
+
+
+content_changed.connect(bump_generation, dispatch_uid='portfolio.cache.bump_generation')
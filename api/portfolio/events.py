@@ -0,0 +1,238 @@
+"""Server-sent events: compact change notices pushed to open browsers.
+
+content_changed (saves, deletes, bulk updates, imports, the admin) is
+turned into {"model", "ids", "op", "version", "tenant"} once the
+transaction commits and handed to the broker, which fans it out to every
+/events/ stream of the process; each stream passes on its own tenant's
+events. A stream is an async generator waiting on its own asyncio.Queue,
+so an idle connection costs a queue, not a thread. That only holds under
+ASGI, so the route exists in async_urls alone.
+
+Brokers (PORTFOLIO_EVENTS['BROKER']):
+  MemoryBroker  events reach the streams of the process that made them.
+  FileBroker    every process appends to one file and a single thread per
+                process tails it; a stand-in for Redis or Postgres
+                LISTEN/NOTIFY when several workers share a host.
+
+Event ids are increasing per broker, so a reconnecting EventSource resumes
+from Last-Event-ID out of a short history. When the events in between are
+gone, or a slow client's queue overflowed, it gets a "reset" event and
+should reload everything.
+"""
+import asyncio
+import itertools
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import defaultdict, deque
+
+from django.conf import settings
+from django.db import transaction
+from django.http import HttpResponseNotAllowed, StreamingHttpResponse
+from django.utils.module_loading import import_string
+
+from .cache import generation
+from .signals import content_changed
+from .tenants import current_tenant_id
+
+RESET = {'op': 'reset'}
+
+
+class MemoryBroker:
+    def __init__(self, queue_size=100, history=1000):
+        self.queue_size = queue_size
+        self.history = deque(maxlen=history)
+        self._lock = threading.Lock()
+        self._subscribers = {}
+        # Events at or below `_forgotten` can no longer be replayed
+        self._forgotten = 0
+        self._last_id = 0
+        self._ids = itertools.count(1)
+
+    def publish(self, event):
+        self.deliver(event, next(self._ids))
+
+    def deliver(self, event, event_id):
+        """Hand `event` to every stream of this process. Safe to call from any thread."""
+        event = {**event, 'id': event_id}
+        with self._lock:
+            if len(self.history) == self.history.maxlen:
+                self._forgotten = self.history[0]['id']
+            self.history.append(event)
+            self._last_id = event_id
+            by_loop = defaultdict(list)
+            for queue, loop in self._subscribers.items():
+                by_loop[loop].append(queue)
+        # One wake-up per event loop, however many streams it serves
+        for loop, queues in by_loop.items():
+            try:
+                loop.call_soon_threadsafe(self._offer, queues, event)
+            except RuntimeError:
+                # Event loop already closed; its streams are gone with it
+                for queue in queues:
+                    self.unsubscribe(queue)
+
+    @staticmethod
+    def _offer(queues, event):
+        for queue in queues:
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # Too far behind to catch up one event at a time
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(RESET)
+
+    def subscribe(self):
+        queue = asyncio.Queue(self.queue_size)
+        with self._lock:
+            self._subscribers[queue] = asyncio.get_running_loop()
+        return queue
+
+    def unsubscribe(self, queue):
+        with self._lock:
+            self._subscribers.pop(queue, None)
+
+    def replay(self, last_id):
+        """Events after `last_id`, or None if some of them are no longer known."""
+        with self._lock:
+            if not self._forgotten <= last_id <= self._last_id:
+                return None
+            return [event for event in self.history if event['id'] > last_id]
+
+
+class FileBroker(MemoryBroker):
+    """Cross-process fan-out through an append-only file; event ids are byte offsets."""
+
+    def __init__(self, path=None, poll_interval=0.25, **kwargs):
+        super().__init__(**kwargs)
+        self.path = path or os.path.join(tempfile.gettempdir(), 'portfolio-events.log')
+        self.poll_interval = poll_interval
+        self._tailer = None
+
+    def publish(self, event):
+        # One short O_APPEND write per event, so lines from several processes never interleave
+        with open(self.path, 'ab') as f:
+            f.write(json.dumps(event, separators=(',', ':')).encode() + b'\n')
+
+    def subscribe(self):
+        queue = super().subscribe()
+        with self._lock:
+            if self._tailer is None:
+                self._forgotten = self._last_id = self.start_offset()
+                self._tailer = threading.Thread(target=self.tail, name='portfolio-events', daemon=True)
+                self._tailer.start()
+        return queue
+
+    def start_offset(self):
+        with open(self.path, 'ab') as f:
+            return f.tell()
+
+    def tail(self):
+        offset = self._last_id
+        while True:
+            time.sleep(self.poll_interval)
+            try:
+                offset = self.read_from(offset)
+            except FileNotFoundError:
+                offset = 0
+
+    def read_from(self, offset):
+        if os.path.getsize(self.path) < offset:
+            offset = 0  # truncated or replaced
+        with open(self.path, 'rb') as f:
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break  # still being written
+                self.deliver(json.loads(line), offset + len(line))
+                offset += len(line)
+        return offset
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                conf = settings.PORTFOLIO_EVENTS
+                _broker = import_string(conf['BROKER'])(**conf.get('OPTIONS', {}))
+    return _broker
+
+
+def format_event(event):
+    event_id = event.get('id')
+    data = json.dumps({k: v for k, v in event.items() if k != 'id'}, separators=(',', ':'))
+    return (f'id: {event_id}\n' if event_id is not None else '') + f'data: {data}\n\n'
+
+
+def _visible(event, tenant):
+    # A stream without a tenant sees everything; resets carry none and go to everyone
+    return tenant is None or event.get('tenant', tenant) == tenant
+
+
+async def stream(last_id=None, tenant=None):
+    broker = get_broker()
+    queue = broker.subscribe()
+    try:
+        yield f"retry: {settings.PORTFOLIO_EVENTS['RETRY_MS']}\n\n"
+        sent = -1
+        if last_id is not None:
+            missed = broker.replay(last_id)
+            if missed is None:
+                yield format_event(RESET)
+            else:
+                for event in missed:
+                    sent = event['id']
+                    if not _visible(event, tenant):
+                        continue
+                    yield format_event(event)
+        while True:
+            try:
+                event = await asyncio.wait_for(queue.get(), settings.PORTFOLIO_EVENTS['KEEPALIVE'])
+            except asyncio.TimeoutError:
+                # Keeps proxies from closing an idle connection
+                yield ': keepalive\n\n'
+                continue
+            event_id = event.get('id')
+            if event_id is not None:
+                if event_id <= sent:
+                    continue  # already replayed
+                sent = event_id
+            if _visible(event, tenant):
+                yield format_event(event)
+    finally:
+        broker.unsubscribe(queue)
+
+
+async def events_view(request):
+    """GET /events/: text/event-stream of content changes."""
+    if request.method != 'GET':
+        return HttpResponseNotAllowed(['GET'])
+    try:
+        last_id = int(request.headers['Last-Event-ID'])
+    except (KeyError, ValueError):
+        last_id = None
+    # The body is streamed after the tenant middleware has returned, so it is handed over now
+    response = StreamingHttpResponse(stream(last_id, current_tenant_id()), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def publish_change(sender, pks, op, tenant=None, **kwargs):
+    tenant = current_tenant_id() if tenant is None else tenant
+
+    def publish():
+        get_broker().publish({'model': sender._meta.model_name, 'ids': list(pks), 'op': op,
+                              'version': generation(sender, tenant), 'tenant': tenant})
+    transaction.on_commit(publish)
+
+
+content_changed.connect(publish_change, dispatch_uid='portfolio.events.publish_change')
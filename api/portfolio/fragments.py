@@ -0,0 +1,74 @@
+"""Per-row cache of serialized output for the content serializers.
+
+A row's representation is stored under (model, pk, updated_at, variant),
+where the variant covers the fields a ?fields= / ?omit= request kept and
+the host absolute image URLs are built against. Every write moves
+updated_at, so an edited row simply stops matching its old fragment: the
+next list serializes that row again and reuses all the others. Outdated
+fragments are never looked up again and fall out of the LRU. Per process.
+
+Lists first read just (pk, updated_at) to find the fragments they can reuse.
+Until a model has been listed once there is nothing to reuse, so that
+first list is a single plain scan instead.
+"""
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+
+
+class FragmentCache:
+    def __init__(self, max_entries=5000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        # (model, variant) pairs whose whole list has been cached at least once
+        self._listed = set()
+        self.hits = self.misses = self.evictions = 0
+
+    def get_many(self, keys):
+        found = {}
+        with self._lock:
+            for key in keys:
+                value = self._entries.get(key)
+                if value is not None:
+                    self._entries.move_to_end(key)
+                    found[key] = value
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def get(self, key):
+        return self.get_many([key]).get(key)
+
+    def set_many(self, fragments):
+        with self._lock:
+            self._entries.update(fragments)
+            for key in fragments:
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def set(self, key, value):
+        self.set_many({key: value})
+
+    def was_listed(self, group):
+        return group in self._listed
+
+    def mark_listed(self, group):
+        with self._lock:
+            self._listed.add(group)
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions, 'entries': len(self._entries)}
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._listed.clear()
+            self.hits = self.misses = self.evictions = 0
+
+
+fragment_cache = FragmentCache(settings.PORTFOLIO_FRAGMENTS['MAX_ENTRIES'])
@@ -0,0 +1,128 @@
+import gc
+import json
+import platform
+import tempfile
+import time
+import tracemalloc
+from unittest import mock
+
+import django
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from portfolio.benchmarks import seed, summarize, test_database
+from portfolio.cache import MemoryBackend
+from portfolio.models import Education, Work, Portfolio, Skills
+
+# route -> (model, field a PATCH changes)
+CONTENT = {
+    'education': (Education, 'degree'),
+    'work': (Work, 'description'),
+    'portfolio': (Portfolio, 'description'),
+    'skills': (Skills, 'skillName'),
+}
+# The four requests App.js used to make on load, before /bundle/
+FETCH_DATA = ['/education/', '/work/', '/portfolio/', '/skills/']
+
+
+class Command(BaseCommand):
+    help = ('Benchmark list/retrieve/update on every API route against seeded throwaway databases '
+            'and write latency, throughput, query count and memory as JSON.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, nargs='+', default=[10, 1000],
+                            help='Rows seeded per model; one run per value (10 to 100000)')
+        parser.add_argument('--iterations', type=int, default=50, help='Requests per scenario')
+        parser.add_argument('--cold', action='store_true', help='Bypass the response cache')
+        parser.add_argument('--output', help='Write the JSON here instead of stdout')
+
+    def handle(self, *args, **options):
+        report = {
+            'meta': {
+                'started_at': timezone.now().isoformat(),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': connection.vendor,
+                'iterations': options['iterations'],
+                'cold': options['cold'],
+            },
+            'runs': [],
+        }
+        media = tempfile.TemporaryDirectory()
+        # Images go to a temporary LocalImageStorage instead of Cloudinary
+        uploads = dict(settings.PORTFOLIO_UPLOADS, EAGER=True, STAGING_DIR=f'{media.name}/staging')
+        with media, test_database(), override_settings(
+            MEDIA_ROOT=media.name,
+            PORTFOLIO_IMAGE_STORAGE='portfolio.storage.LocalImageStorage',
+            PORTFOLIO_UPLOADS=uploads,
+            ROOT_URLCONF='portfolio.urls',
+        ):
+            for rows in options['rows']:
+                backend = MemoryBackend(max_entries=0 if options['cold'] else 512)
+                with mock.patch('portfolio.cache._backend', backend):
+                    report['runs'].append({'rows': rows, 'results': self.run(rows, options['iterations'])})
+                self.stderr.write(f'{rows} row(s) done')
+
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output)
+        else:
+            self.stdout.write(output)
+
+    def run(self, rows, iterations):
+        for model in (Education, Work, Portfolio, Skills, User):
+            model.objects.all().delete()
+        seed(rows, users=rows)
+        client = APIClient()
+        client.force_authenticate(User.objects.create_superuser('bench', password='bench'))
+
+        scenarios = {}
+        for route, (model, field) in CONTENT.items():
+            pk = model.objects.order_by('ordinal').values_list('pk', flat=True)[rows // 2]
+            scenarios[f'GET /{route}/'] = lambda route=route: client.get(f'/{route}/', HTTP_ACCEPT='application/json')
+            scenarios[f'GET /{route}/{{id}}/'] = lambda route=route, pk=pk: client.get(f'/{route}/{pk}/', HTTP_ACCEPT='application/json')
+            scenarios[f'PATCH /{route}/{{id}}/'] = lambda route=route, pk=pk, field=field: client.patch(
+                f'/{route}/{pk}/', {field: f'bench {time.perf_counter_ns()}'}, format='multipart')
+
+        user = User.objects.order_by('-date_joined', '-pk').values_list('pk', flat=True)[rows // 2]
+        scenarios['GET /users/'] = lambda: client.get('/users/', HTTP_ACCEPT='application/json')
+        scenarios['GET /users/{id}/'] = lambda: client.get(f'/users/{user}/', HTTP_ACCEPT='application/json')
+        scenarios['PATCH /users/{id}/'] = lambda: client.patch(f'/users/{user}/', {'email': 'bench@example.com'}, format='json')
+        scenarios['GET /bundle/'] = lambda: client.get('/bundle/')
+        scenarios['GET /search/'] = lambda: client.get('/search/?q=K1')
+        scenarios['fetchData'] = lambda: [client.get(url, HTTP_ACCEPT='application/json') for url in FETCH_DATA]
+
+        return {name: self.measure(request, iterations) for name, request in scenarios.items()}
+
+    def measure(self, request, iterations):
+        responses = request()
+        responses = responses if isinstance(responses, list) else [responses]
+        status = sorted({response.status_code for response in responses})
+
+        with CaptureQueriesContext(connection) as captured:
+            request()
+        # Read now: every later request_started empties connection.queries
+        queries = len(captured)
+
+        latencies = []
+        started = time.perf_counter()
+        for _ in range(iterations):
+            begin = time.perf_counter()
+            request()
+            latencies.append(time.perf_counter() - begin)
+        result = summarize(latencies, time.perf_counter() - started)
+
+        # Traced separately: tracemalloc slows everything down too much to time under it
+        gc.collect()
+        tracemalloc.start()
+        request()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return {**result, 'status': status, 'queries': queries, 'peak_kib': round(peak / 1024, 1)}
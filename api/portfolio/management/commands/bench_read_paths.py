@@ -0,0 +1,64 @@
+import asyncio
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.test import AsyncClient, Client, override_settings
+
+from portfolio.benchmarks import seed, summarize, test_database
+from portfolio.cache import MemoryBackend
+
+ROUTES = ['/education/', '/work/', '/portfolio/', '/skills/']
+
+
+class Command(BaseCommand):
+    help = 'Compare read throughput of the DRF (WSGI) views and the native async views on a throwaway test database.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument('--concurrency', type=int, default=50)
+        parser.add_argument('--rows', type=int, default=50, help='Rows seeded per model')
+        parser.add_argument('--cold', action='store_true', help='Bypass the response cache')
+
+    def handle(self, *args, **options):
+        with test_database():
+            seed(options['rows'])
+            backend = MemoryBackend(max_entries=0 if options['cold'] else 512)
+            with mock.patch('portfolio.cache._backend', backend):
+                results = {
+                    'wsgi': self.run_sync(options['requests'], options['concurrency']),
+                    'asgi': asyncio.run(self.run_async(options['requests'], options['concurrency'])),
+                }
+        results['asgi_vs_wsgi'] = round(results['asgi']['rps'] / results['wsgi']['rps'], 2)
+        self.stdout.write(json.dumps(results, indent=2))
+
+    def run_sync(self, total, concurrency):
+        def fetch(i):
+            started = time.perf_counter()
+            Client().get(ROUTES[i % len(ROUTES)], HTTP_ACCEPT='application/json')
+            connections.close_all()
+            return time.perf_counter() - started
+
+        with override_settings(ROOT_URLCONF='portfolio.urls'):
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                latencies = list(pool.map(fetch, range(total)))
+            return summarize(latencies, time.perf_counter() - started)
+
+    async def run_async(self, total, concurrency):
+        client = AsyncClient()
+        limit = asyncio.Semaphore(concurrency)
+
+        async def fetch(i):
+            async with limit:
+                started = time.perf_counter()
+                await client.get(ROUTES[i % len(ROUTES)], headers={'Accept': 'application/json'})
+                return time.perf_counter() - started
+
+        with override_settings(ROOT_URLCONF='portfolio.async_urls'):
+            started = time.perf_counter()
+            latencies = await asyncio.gather(*(fetch(i) for i in range(total)))
+            return summarize(latencies, time.perf_counter() - started)
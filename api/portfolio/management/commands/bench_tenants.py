@@ -0,0 +1,82 @@
+import json
+import random
+import time
+from unittest import mock
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+
+from portfolio import tenants
+from portfolio.benchmarks import seed, summarize, test_database
+from portfolio.cache import MemoryBackend
+from portfolio.models import Tenant
+
+ROUTES = ['/education/', '/work/', '/portfolio/', '/skills/', '/bundle/']
+
+
+class Command(BaseCommand):
+    help = ('Load test for multi-tenant serving: per-request latency and queries as the number of tenants '
+            'on a throwaway test database grows.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tenants', type=int, nargs='+', default=[1, 10, 100, 1000],
+                            help='Tenant counts to measure at, in increasing order')
+        parser.add_argument('--rows', type=int, default=20, help='Rows seeded per model and tenant')
+        parser.add_argument('--requests', type=int, default=2000, help='Requests per tenant count')
+        parser.add_argument('--cold', action='store_true', help='Bypass the response cache')
+        parser.add_argument('--cache-entries', type=int, default=512,
+                            help='Response cache size; it is shared by all tenants, so size it for their working set')
+
+    def handle(self, *args, **options):
+        runs = []
+        with test_database():
+            backend = MemoryBackend(max_entries=0 if options['cold'] else options['cache_entries'])
+            with mock.patch('portfolio.cache._backend', backend):
+                for count in sorted(options['tenants']):
+                    self.grow(count, options['rows'])
+                    if not options['cold']:
+                        # Every tenant's routes once, so runs compare steady state rather than first hits
+                        self.measure(count, count * len(ROUTES), sequential=True)
+                    runs.append({'tenants': count, **self.measure(count, options['requests'])})
+                    self.stderr.write(f"{count} tenants: p50 {runs[-1]['p50_ms']} ms, p95 {runs[-1]['p95_ms']} ms")
+        # Flat means the largest deployment is about as fast as the smallest
+        report = {'rows_per_tenant': options['rows'], 'cold': options['cold'],
+                  'cache_entries': 0 if options['cold'] else options['cache_entries'], 'runs': runs,
+                  'p50_growth': round(runs[-1]['p50_ms'] / runs[0]['p50_ms'], 2)}
+        self.stdout.write(json.dumps(report, indent=2))
+
+    def grow(self, count, rows):
+        existing = Tenant.objects.filter(slug__startswith='tenant').count()
+        Tenant.objects.bulk_create(Tenant(slug=f'tenant{i}', name=f'Tenant {i}') for i in range(existing, count))
+        # bulk_create sends no post_save, so the directory has to be told
+        tenants.clear_directory()
+        for pk in Tenant.objects.filter(slug__startswith='tenant').order_by('pk').values_list('pk', flat=True)[existing:]:
+            with tenants.activate(pk):
+                seed(rows)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def measure(self, count, total, sequential=False):
+        client = Client()
+        pick = random.Random(count)
+        latencies, queries = [], []
+
+        def counted(execute, *args):
+            queries.append(1)
+            return execute(*args)
+
+        started = time.perf_counter()
+        with connection.execute_wrapper(counted):
+            for _ in range(total):
+                if sequential:
+                    url = f'/t/tenant{len(latencies) // len(ROUTES)}{ROUTES[len(latencies) % len(ROUTES)]}'
+                else:
+                    url = f'/t/tenant{pick.randrange(count)}{pick.choice(ROUTES)}'
+                before = time.perf_counter()
+                response = client.get(url, HTTP_ACCEPT='application/json')
+                latencies.append(time.perf_counter() - before)
+                assert response.status_code == 200, (url, response.status_code)
+        result = summarize(latencies, time.perf_counter() - started)
+        result['queries_per_request'] = round(len(queries) / total, 2)
+        return result
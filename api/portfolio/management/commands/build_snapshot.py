@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from portfolio.snapshot import build_snapshot, snapshot_url
+
+
+class Command(BaseCommand):
+    help = 'Render every content API response to precompressed JSON under STATIC_ROOT for WhiteNoise.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Rewrite the snapshot even if it is current.')
+        parser.add_argument('--keep', type=int, help="Versions to keep (default PORTFOLIO_SNAPSHOT['KEEP']).")
+
+    def handle(self, *args, **options):
+        version = build_snapshot(force=options['force'], keep=options['keep'])
+        self.stdout.write(f'Snapshot {version} at {snapshot_url()}{version}/')
@@ -0,0 +1,33 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from portfolio.storage import LocalImageStorage, cloudinary_configured, get_image_storage
+from portfolio.tenants import activate, default_tenant_id, tenant_id_for
+from portfolio.transfer import export_content
+
+
+class Command(BaseCommand):
+    help = 'Snapshot education, work, portfolio and skills to JSON or CSV plus an images directory.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Directory to write into')
+        parser.add_argument('--format', choices=['json', 'csv'], default='json')
+        parser.add_argument('--workers', type=int, default=8, help='Concurrent image downloads')
+        parser.add_argument('--no-images', action='store_true', help='Skip downloading images')
+        parser.add_argument('--tenant', metavar='SLUG', help='Tenant to work on (default: the default tenant)')
+        parser.add_argument('--local', action='store_true', help='Read images from LocalImageStorage')
+
+    def handle(self, *args, **options):
+        os.makedirs(options['path'], exist_ok=True)
+        storage = LocalImageStorage() if options['local'] or not cloudinary_configured() else get_image_storage()
+        started = time.monotonic()
+        try:
+            tenant = tenant_id_for(options['tenant']) if options['tenant'] else default_tenant_id()
+        except LookupError as e:
+            raise CommandError(e)
+        with activate(tenant):
+            export_content(options['path'], options['format'], storage, options['workers'], self.stdout.write,
+                           with_images=not options['no_images'])
+        self.stdout.write(self.style.SUCCESS(f'Exported to {options["path"]} in {time.monotonic() - started:.2f}s'))
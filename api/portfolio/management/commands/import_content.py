@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from portfolio.storage import LocalImageStorage, cloudinary_configured, get_image_storage
+from portfolio.tenants import activate, default_tenant_id, tenant_id_for
+from portfolio.transfer import import_content
+
+
+class Command(BaseCommand):
+    help = 'Load education, work, portfolio and skills from an export_content directory (upserts on natural keys).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Directory written by export_content')
+        parser.add_argument('--format', choices=['json', 'csv'], default='json')
+        parser.add_argument('--workers', type=int, default=8, help='Concurrent image uploads')
+        parser.add_argument('--tenant', metavar='SLUG', help='Tenant to work on (default: the default tenant)')
+        parser.add_argument('--local', action='store_true', help='Upload images to LocalImageStorage')
+
+    def handle(self, *args, **options):
+        storage = LocalImageStorage() if options['local'] or not cloudinary_configured() else get_image_storage()
+        started = time.monotonic()
+        try:
+            tenant = tenant_id_for(options['tenant']) if options['tenant'] else default_tenant_id()
+        except LookupError as e:
+            raise CommandError(e)
+        with activate(tenant):
+            import_content(options['path'], options['format'], storage, options['workers'], self.stdout.write)
+        self.stdout.write(self.style.SUCCESS(f'Imported from {options["path"]} in {time.monotonic() - started:.2f}s'))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from portfolio.uploads import process_due_jobs
+
+
+class Command(BaseCommand):
+    help = 'Run pending image upload jobs, including retries left over from a restart.'
+
+    def handle(self, *args, **options):
+        count = process_due_jobs()
+        self.stdout.write(self.style.SUCCESS(f'Processed {count} upload job(s)'))
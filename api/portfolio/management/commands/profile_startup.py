@@ -0,0 +1,79 @@
+import json
+import os
+import re
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Run in a fresh interpreter, so nothing this process has imported skews the numbers
+STARTUP = '''
+import json, os, time
+started = time.perf_counter()
+import django
+django.setup()
+setup = time.perf_counter()
+from django.core.wsgi import get_wsgi_application
+get_wsgi_application()
+application = time.perf_counter()
+from django.urls import get_resolver
+get_resolver().url_patterns
+urls = time.perf_counter()
+phases = {'setup': setup - started, 'application': application - setup, 'urlconf': urls - application}
+path = os.environ.get('PROFILE_REQUEST')
+if path:
+    from django.test import Client
+    before = time.perf_counter()
+    Client(HTTP_HOST=os.environ['PROFILE_HOST']).get(path, HTTP_ACCEPT='application/json')
+    phases['first_request'] = time.perf_counter() - before
+print(json.dumps({name: round(seconds * 1000, 1) for name, seconds in phases.items()}))
+'''
+IMPORT_LINE = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)')
+
+
+def profile(request=None):
+    env = dict(os.environ, DJANGO_SETTINGS_MODULE=os.environ.get('DJANGO_SETTINGS_MODULE', 'api.settings'),
+               PROFILE_REQUEST=request or '', PROFILE_HOST=settings.PORTFOLIO_WARMUP['HOST'])
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', STARTUP], env=env,
+                            cwd=settings.BASE_DIR, capture_output=True, text=True)
+    if result.returncode:
+        raise CommandError(result.stderr.strip().splitlines()[-1])
+
+    modules, packages = [], defaultdict(int)
+    for line in result.stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if match:
+            own, cumulative, name = int(match[1]), int(match[2]), match[4]
+            modules.append((name, own, cumulative))
+            packages[name.split('.')[0]] += own
+    return {
+        'phases_ms': json.loads(result.stdout.strip().splitlines()[-1]),
+        'imports_ms': round(sum(own for _, own, _ in modules) / 1000, 1),
+        'modules': len(modules),
+        'packages_ms': {name: round(us / 1000, 1) for name, us in sorted(packages.items(), key=lambda p: -p[1])},
+        'slowest_modules_ms': {name: round(own / 1000, 1) for name, own, _ in sorted(modules, key=lambda m: -m[1])[:25]},
+    }
+
+
+class Command(BaseCommand):
+    help = 'Profile worker start-up (python -X importtime): time per phase, per package and per module.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--request', metavar='PATH', help='Also time a first request to PATH (needs the database)')
+        parser.add_argument('--top', type=int, default=15, help='Packages and modules to list')
+        parser.add_argument('--json', action='store_true', help='Print the full results as JSON')
+
+    def handle(self, *args, **options):
+        result = profile(options['request'])
+        if options['json']:
+            self.stdout.write(json.dumps(result, indent=2))
+            return
+
+        phases = ', '.join(f'{name} {ms} ms' for name, ms in result['phases_ms'].items())
+        self.stdout.write(f"{phases}; {result['modules']} modules imported in {result['imports_ms']} ms")
+        for title in ('packages_ms', 'slowest_modules_ms'):
+            self.stdout.write(f'{title[:-3].replace("_", " ")}:')
+            for name, ms in list(result[title].items())[:options['top']]:
+                self.stdout.write(f'  {ms:8.1f} ms  {name}')
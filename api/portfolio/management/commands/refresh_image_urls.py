@@ -0,0 +1,32 @@
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from portfolio.models import Education, Work, Portfolio
+from portfolio.signals import content_changed
+
+
+class Command(BaseCommand):
+    help = 'Recompute stored image URLs and srcsets, e.g. after changing PORTFOLIO_IMAGE_WIDTHS.'
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        for model in (Education, Work, Portfolio):
+            changed = []
+            for row in model.objects.all():
+                before = (row.image_url, row.image_srcset)
+                row.refresh_image_urls()
+                if (row.image_url, row.image_srcset) != before:
+                    row.updated_at = now
+                    changed.append(row)
+            with transaction.atomic():
+                model.objects.bulk_update(changed, ['image_url', 'image_srcset', 'updated_at'], batch_size=500)
+            # bulk_update sends no post_save, so caches, search and the event stream are told here
+            by_tenant = defaultdict(list)
+            for row in changed:
+                by_tenant[row.tenant_id].append(row.pk)
+            for tenant, pks in by_tenant.items():
+                content_changed.send(sender=model, pks=pks, op='update', tenant=tenant)
+            self.stdout.write(f'{model._meta.verbose_name_plural}: {len(changed)} row(s) changed')
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from portfolio.warmup import warm_up
+
+
+class Command(BaseCommand):
+    help = "Open database connections and prime the response caches for PORTFOLIO_WARMUP['PATHS']."
+
+    def handle(self, *args, **options):
+        for path, status in warm_up().items():
+            self.stdout.write(f'{status} {path}')
@@ -0,0 +1,219 @@
+"""Per-request timings, a Server-Timing header and Prometheus text metrics.
+
+MetricsMiddleware opens a Timings record for each request. Code on the hot
+path reports into it with timed('phase'), and every SQL statement is counted
+by a wrapper installed on each database connection. Each record becomes a
+Server-Timing header and is folded into per-route totals served by
+metrics_view. Phases outside any request, such as background uploads, are
+counted under the route "background". Totals are per process; Prometheus
+scrapes each worker. The fragment cache's counters are appended as they are.
+"""
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import FileResponse, HttpResponse, HttpResponseForbidden
+
+from .fragments import fragment_cache
+
+_current = ContextVar('portfolio_timings', default=None)
+
+
+class Timings:
+    __slots__ = ('started', 'phases', 'queries')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases = defaultdict(float)
+        self.queries = 0
+
+    def server_timing(self, total):
+        entries = [f'db;dur={self.phases["db"] * 1000:.1f};desc="{self.queries} queries"']
+        entries += [f'{name};dur={seconds * 1000:.1f}' for name, seconds in self.phases.items() if name != 'db']
+        entries.append(f'app;dur={total * 1000:.1f}')
+        return ', '.join(entries)
+
+
+def record(phase, seconds):
+    """Add `seconds` to `phase` of the current request, or to the background totals."""
+    timings = _current.get()
+    if timings is not None:
+        timings.phases[phase] += seconds
+    else:
+        registry.add_phase('background', phase, seconds)
+
+
+@contextmanager
+def timed(phase):
+    """Add the time spent in the block to `phase` of the current request."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(phase, time.perf_counter() - started)
+
+
+def _count_query(execute, sql, params, many, context):
+    timings = _current.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.phases['db'] += time.perf_counter() - started
+        timings.queries += 1
+
+
+def install_query_counter(connection, **kwargs):
+    if _count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_count_query)
+
+
+class Registry:
+    """Process-wide totals: a duration histogram per route and counters per phase."""
+
+    def __init__(self, buckets):
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._durations = {}
+        self._requests = defaultdict(int)
+        self._queries = defaultdict(int)
+        self._bytes = defaultdict(int)
+        self._phases = defaultdict(float)
+
+    def observe(self, route, method, status, seconds, timings, size):
+        with self._lock:
+            histogram = self._durations.setdefault((route, method), [[0] * len(self.buckets), 0.0, 0])
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    histogram[0][i] += 1
+                    break
+            histogram[1] += seconds
+            histogram[2] += 1
+            self._requests[(route, method, status)] += 1
+            self._queries[route] += timings.queries
+            self._bytes[route] += size
+            for phase, phase_seconds in timings.phases.items():
+                self._phases[(route, phase)] += phase_seconds
+
+    def add_phase(self, route, phase, seconds):
+        with self._lock:
+            self._phases[(route, phase)] += seconds
+
+    def clear(self):
+        with self._lock:
+            for store in (self._durations, self._requests, self._queries, self._bytes, self._phases):
+                store.clear()
+
+    def render(self):
+        with self._lock:
+            lines = [
+                '# HELP portfolio_request_duration_seconds Time spent handling requests.',
+                '# TYPE portfolio_request_duration_seconds histogram',
+            ]
+            for (route, method), (counts, total, count) in sorted(self._durations.items()):
+                labels = f'route="{route}",method="{method}"'
+                cumulative = 0
+                for bound, bucket in zip(self.buckets, counts):
+                    cumulative += bucket
+                    lines.append(f'portfolio_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+                lines.append(f'portfolio_request_duration_seconds_bucket{{{labels},le="+Inf"}} {count}')
+                lines.append(f'portfolio_request_duration_seconds_sum{{{labels}}} {total}')
+                lines.append(f'portfolio_request_duration_seconds_count{{{labels}}} {count}')
+
+            lines += ['# HELP portfolio_requests_total Requests handled.', '# TYPE portfolio_requests_total counter']
+            lines += [f'portfolio_requests_total{{route="{route}",method="{method}",status="{status}"}} {n}'
+                      for (route, method, status), n in sorted(self._requests.items())]
+            lines += ['# HELP portfolio_db_queries_total SQL statements executed.', '# TYPE portfolio_db_queries_total counter']
+            lines += [f'portfolio_db_queries_total{{route="{route}"}} {n}' for route, n in sorted(self._queries.items())]
+            lines += ['# HELP portfolio_response_bytes_total Response body bytes sent.', '# TYPE portfolio_response_bytes_total counter']
+            lines += [f'portfolio_response_bytes_total{{route="{route}"}} {n}' for route, n in sorted(self._bytes.items())]
+            lines += ['# HELP portfolio_phase_seconds_total Time spent per phase (db, serialize, image_url, upload).',
+                      '# TYPE portfolio_phase_seconds_total counter']
+            lines += [f'portfolio_phase_seconds_total{{route="{route}",phase="{phase}"}} {seconds}'
+                      for (route, phase), seconds in sorted(self._phases.items())]
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry(settings.PORTFOLIO_METRICS['BUCKETS'])
+
+
+class MetricsMiddleware:
+    """Time every request, add Server-Timing and feed the per-route totals."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        timings = Timings()
+        token = _current.set(timings)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, timings)
+
+    async def __acall__(self, request):
+        timings = Timings()
+        token = _current.set(timings)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, timings)
+
+    def finish(self, request, response, timings):
+        total = time.perf_counter() - timings.started
+        match = getattr(request, 'resolver_match', None)
+        if match is not None:
+            route = match.view_name
+        else:
+            route = 'static' if isinstance(response, FileResponse) else 'unmatched'
+        # Streamed bodies are not buffered, so only their declared length is known
+        size = len(response.content) if not response.streaming else int(response.get('Content-Length', 0))
+        registry.observe(route, request.method, response.status_code, total, timings, size)
+        if settings.PORTFOLIO_METRICS['SERVER_TIMING']:
+            response['Server-Timing'] = timings.server_timing(total)
+            # Browsers hide Server-Timing from cross-origin pages (the frontend) without this
+            origin = request.headers.get('Origin')
+            if origin in settings.CORS_ALLOWED_ORIGINS:
+                response['Timing-Allow-Origin'] = origin
+        return response
+
+
+def metrics_view(request):
+    """Prometheus text exposition of the totals of this process."""
+    token = settings.PORTFOLIO_METRICS['TOKEN']
+    if token and request.headers.get('Authorization') != f'Bearer {token}':
+        return HttpResponseForbidden()
+    return HttpResponse(registry.render() + render_fragment_cache(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+def render_fragment_cache():
+    stats = fragment_cache.stats()
+    lines = []
+    for name, kind, help_text in (('hits', 'counter', 'Rows served from the fragment cache.'),
+                                  ('misses', 'counter', 'Rows looked up and not found in the fragment cache.'),
+                                  ('evictions', 'counter', 'Fragments dropped to stay under MAX_ENTRIES.'),
+                                  ('entries', 'gauge', 'Fragments held.')):
+        metric = f'portfolio_fragment_cache_{name}' + ('_total' if kind == 'counter' else '')
+        lines += [f'# HELP {metric} {help_text}', f'# TYPE {metric} {kind}', f'{metric} {stats[name]}']
+    return '\n'.join(lines) + '\n'
+
+
+connection_created.connect(install_query_counter, dispatch_uid='portfolio.metrics.install_query_counter')
+for _connection in connections.all(initialized_only=True):
+    install_query_counter(_connection)
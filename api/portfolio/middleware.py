@@ -0,0 +1,81 @@
+import os
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.http import HttpResponseRedirect
+from whitenoise.middleware import WhiteNoiseMiddleware as BaseWhiteNoiseMiddleware
+from whitenoise.responders import MissingFileError
+
+from . import snapshot
+
+
+class WhiteNoiseMiddleware(BaseWhiteNoiseMiddleware):
+    """WhiteNoise that can sit in an async middleware chain and serves the API snapshot.
+
+    Stock WhiteNoise is sync-only, which makes Django push every ASGI request
+    through a thread just to pass it. Here only requests that actually hit a
+    static file leave the event loop.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, *args, **kwargs):
+        super().__init__(get_response, *args, **kwargs)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        hit = snapshot.lookup(request)
+        if hit is not None and snapshot.is_fresh(hit):
+            response = self.snapshot_response(hit, request)
+            if response is not None:
+                return response
+        static_file = self.static_file(request.path_info)
+        if static_file is not None:
+            return self.serve(static_file, request)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        hit = snapshot.lookup(request)
+        if hit is not None and await snapshot.ais_fresh(hit):
+            response = await sync_to_async(self.snapshot_response)(hit, request)
+            if response is not None:
+                return response
+        static_file = self.static_file(request.path_info)
+        if static_file is not None:
+            return await sync_to_async(self.serve)(static_file, request)
+        return await self.get_response(request)
+
+    def static_file(self, url):
+        if self.autorefresh:
+            return self.find_file(url)
+        static_file = self.files.get(url)
+        if static_file is None and url.startswith(snapshot.snapshot_url()):
+            # Snapshots are written after start-up, so they are never in self.files
+            path = os.path.join(settings.STATIC_ROOT, url[len(settings.STATIC_URL):])
+            if os.path.commonpath((snapshot.snapshot_root(), path)) == snapshot.snapshot_root():
+                try:
+                    static_file = self.find_file_at_path(path, url)
+                except MissingFileError:
+                    pass
+        return static_file
+
+    def snapshot_response(self, hit, request):
+        if settings.PORTFOLIO_SNAPSHOT['MODE'] == 'redirect':
+            return HttpResponseRedirect(hit.url)
+        try:
+            # Keyed on the API URL, so it is not given the immutable headers
+            static_file = self.find_file_at_path(hit.path, request.path_info)
+        except MissingFileError:
+            return None
+        response = self.serve(static_file, request)
+        response['Cache-Control'] = 'no-cache'
+        return response
+
+    def immutable_file_test(self, path, url):
+        # Versioned snapshot directories never change once written
+        if url.startswith(snapshot.snapshot_url()) and not url.endswith(f'/{snapshot.MANIFEST}'):
+            return True
+        return super().immutable_file_test(path, url)
@@ -0,0 +1,61 @@
+# Generated by Django 5.1.4 on 2026-10-18 19:00
+
+import cloudinary.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portfolio', '0011_alter_education_image_alter_portfolio_image_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='education',
+            options={'ordering': ['ordinal']},
+        ),
+        migrations.AlterModelOptions(
+            name='portfolio',
+            options={'ordering': ['ordinal'], 'verbose_name_plural': 'Portfolio entries'},
+        ),
+        migrations.AlterModelOptions(
+            name='work',
+            options={'ordering': ['ordinal']},
+        ),
+        migrations.AddField(
+            model_name='education',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='portfolio',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='skills',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='work',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AlterField(
+            model_name='education',
+            name='image',
+            field=cloudinary.models.CloudinaryField(blank=True, max_length=255, null=True, verbose_name='image'),
+        ),
+        migrations.AlterField(
+            model_name='portfolio',
+            name='image',
+            field=cloudinary.models.CloudinaryField(blank=True, max_length=255, null=True, verbose_name='image'),
+        ),
+        migrations.AlterField(
+            model_name='work',
+            name='image',
+            field=cloudinary.models.CloudinaryField(blank=True, max_length=255, null=True, verbose_name='image'),
+        ),
+    ]
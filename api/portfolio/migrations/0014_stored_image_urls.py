@@ -0,0 +1,71 @@
+# Generated by Django 5.1.4 on 2026-10-18 19:03
+
+from django.db import migrations, models
+from django.utils import timezone
+
+# Widths of the srcset variants when this migration was written. The URLs are
+# built here rather than by portfolio.storage, so changing the app code later
+# cannot change what this migration does.
+WIDTHS = (320, 640, 1280)
+
+
+def image_urls(resource):
+    srcset = ', '.join(
+        f"{resource.build_url(secure=True, width=width, crop='limit', fetch_format='auto', quality='auto')} {width}w"
+        for width in WIDTHS
+    )
+    return resource.build_url(secure=True), srcset
+
+
+def fill_image_urls(apps, schema_editor):
+    # Migrations send no signals, so updated_at has to move for ETags and cached copies to change
+    now = timezone.now()
+    for name in ('Education', 'Work', 'Portfolio'):
+        model = apps.get_model('portfolio', name)
+        field = model._meta.get_field('image')
+        rows = list(model.objects.exclude(image__isnull=True).exclude(image=''))
+        for row in rows:
+            row.image_url, row.image_srcset = image_urls(field.to_python(row.image))
+            row.updated_at = now
+        model.objects.bulk_update(rows, ['image_url', 'image_srcset', 'updated_at'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portfolio', '0013_image_upload_jobs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='education',
+            name='image_srcset',
+            field=models.TextField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='education',
+            name='image_url',
+            field=models.CharField(blank=True, editable=False, max_length=500, null=True),
+        ),
+        migrations.AddField(
+            model_name='portfolio',
+            name='image_srcset',
+            field=models.TextField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='portfolio',
+            name='image_url',
+            field=models.CharField(blank=True, editable=False, max_length=500, null=True),
+        ),
+        migrations.AddField(
+            model_name='work',
+            name='image_srcset',
+            field=models.TextField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='work',
+            name='image_url',
+            field=models.CharField(blank=True, editable=False, max_length=500, null=True),
+        ),
+        migrations.RunPython(fill_image_urls, migrations.RunPython.noop),
+    ]
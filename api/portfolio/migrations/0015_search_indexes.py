@@ -0,0 +1,39 @@
+from django.db import migrations
+
+# Must stay in step with portfolio.search.tsvector_sql()
+INDEXES = {
+    'portfolio_portfolio': ('title', 'description'),
+    'portfolio_work': ('company', 'description'),
+    'portfolio_education': ('school', 'degree'),
+    'portfolio_skills': ('skillName',),
+}
+
+
+def create_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    quote = schema_editor.quote_name
+    for table, columns in INDEXES.items():
+        document = " || ' ' || ".join(f"coalesce({quote(column)}, '')" for column in columns)
+        schema_editor.execute(
+            f"CREATE INDEX IF NOT EXISTS {quote(table + '_search')} ON {quote(table)} "
+            f"USING GIN (to_tsvector('english', {document}))"
+        )
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for table in INDEXES:
+        schema_editor.execute(f"DROP INDEX IF EXISTS {schema_editor.quote_name(table + '_search')}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portfolio', '0014_stored_image_urls'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
@@ -0,0 +1,26 @@
+from django.db import migrations
+
+# Serves UserPagination: ORDER BY date_joined DESC, id DESC and its cursor seeks
+INDEX = 'portfolio_user_joined'
+
+
+def create_user_index(apps, schema_editor):
+    quote = schema_editor.quote_name
+    schema_editor.execute(f"CREATE INDEX IF NOT EXISTS {quote(INDEX)} ON {quote('auth_user')} "
+                          f"({quote('date_joined')}, {quote('id')})")
+
+
+def drop_user_index(apps, schema_editor):
+    schema_editor.execute(f"DROP INDEX IF EXISTS {schema_editor.quote_name(INDEX)}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('portfolio', '0015_search_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_user_index, drop_user_index),
+    ]
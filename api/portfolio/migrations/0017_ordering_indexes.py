@@ -0,0 +1,45 @@
+# Generated by Django 5.1.4 on 2026-10-18 19:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portfolio', '0016_user_directory_index'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='education',
+            options={'ordering': ['ordinal', 'id']},
+        ),
+        migrations.AlterModelOptions(
+            name='portfolio',
+            options={'ordering': ['ordinal', 'id'], 'verbose_name_plural': 'Portfolio entries'},
+        ),
+        migrations.AlterModelOptions(
+            name='skills',
+            options={'ordering': ['ordinal', 'id']},
+        ),
+        migrations.AlterModelOptions(
+            name='work',
+            options={'ordering': ['ordinal', 'id']},
+        ),
+        migrations.AddIndex(
+            model_name='education',
+            index=models.Index(fields=['ordinal', 'id'], name='education_order'),
+        ),
+        migrations.AddIndex(
+            model_name='portfolio',
+            index=models.Index(fields=['ordinal', 'id'], name='portfolio_order'),
+        ),
+        migrations.AddIndex(
+            model_name='skills',
+            index=models.Index(fields=['ordinal', 'id'], include=('skillName',), name='skills_order'),
+        ),
+        migrations.AddIndex(
+            model_name='work',
+            index=models.Index(fields=['ordinal', 'id'], name='work_order'),
+        ),
+    ]
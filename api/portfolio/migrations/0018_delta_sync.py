@@ -0,0 +1,39 @@
+# Generated by Django 5.1.4 on 2026-10-18 19:28
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portfolio', '0017_ordering_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(max_length=100)),
+                ('object_id', models.BigIntegerField()),
+                ('deleted_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='education',
+            index=models.Index(fields=['updated_at'], name='education_updated'),
+        ),
+        migrations.AddIndex(
+            model_name='portfolio',
+            index=models.Index(fields=['updated_at'], name='portfolio_updated'),
+        ),
+        migrations.AddIndex(
+            model_name='skills',
+            index=models.Index(fields=['updated_at'], name='skills_updated'),
+        ),
+        migrations.AddIndex(
+            model_name='work',
+            index=models.Index(fields=['updated_at'], name='work_updated'),
+        ),
+    ]
@@ -0,0 +1,156 @@
+# Generated by Django 5.1.4 on 2026-10-18 19:42
+
+import django.db.models.deletion
+import portfolio.tenants
+from django.conf import settings
+from django.db import migrations, models
+
+OWNED = ['education', 'work', 'portfolio', 'skills', 'tombstone']
+
+
+def create_default_tenant(apps, schema_editor):
+    """Everything that exists so far belongs to the default tenant."""
+    Tenant = apps.get_model('portfolio', 'Tenant')
+    slug = settings.PORTFOLIO_TENANTS['DEFAULT']
+    tenant, _ = Tenant.objects.get_or_create(slug=slug, defaults={'name': slug})
+    for name in OWNED:
+        apps.get_model('portfolio', name).objects.update(tenant=tenant)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portfolio', '0019_upload_sessions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tenant',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('slug', models.SlugField(max_length=63, unique=True)),
+                ('name', models.CharField(max_length=255)),
+                ('domain', models.CharField(blank=True, max_length=255, null=True, unique=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.RemoveIndex(
+            model_name='education',
+            name='education_order',
+        ),
+        migrations.RemoveIndex(
+            model_name='education',
+            name='education_updated',
+        ),
+        migrations.RemoveIndex(
+            model_name='portfolio',
+            name='portfolio_order',
+        ),
+        migrations.RemoveIndex(
+            model_name='portfolio',
+            name='portfolio_updated',
+        ),
+        migrations.RemoveIndex(
+            model_name='skills',
+            name='skills_order',
+        ),
+        migrations.RemoveIndex(
+            model_name='skills',
+            name='skills_updated',
+        ),
+        migrations.RemoveIndex(
+            model_name='work',
+            name='work_order',
+        ),
+        migrations.RemoveIndex(
+            model_name='work',
+            name='work_updated',
+        ),
+        migrations.AddField(
+            model_name='education',
+            name='tenant',
+            field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, to='portfolio.tenant'),
+        ),
+        migrations.AddField(
+            model_name='portfolio',
+            name='tenant',
+            field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, to='portfolio.tenant'),
+        ),
+        migrations.AddField(
+            model_name='skills',
+            name='tenant',
+            field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, to='portfolio.tenant'),
+        ),
+        migrations.AddField(
+            model_name='tombstone',
+            name='tenant',
+            field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, to='portfolio.tenant'),
+        ),
+        migrations.AddField(
+            model_name='work',
+            name='tenant',
+            field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, to='portfolio.tenant'),
+        ),
+        migrations.RunPython(create_default_tenant, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='education',
+            name='tenant',
+            field=models.ForeignKey(db_index=False, default=portfolio.tenants.current_tenant_id, on_delete=django.db.models.deletion.CASCADE, to='portfolio.tenant'),
+        ),
+        migrations.AlterField(
+            model_name='portfolio',
+            name='tenant',
+            field=models.ForeignKey(db_index=False, default=portfolio.tenants.current_tenant_id, on_delete=django.db.models.deletion.CASCADE, to='portfolio.tenant'),
+        ),
+        migrations.AlterField(
+            model_name='skills',
+            name='tenant',
+            field=models.ForeignKey(db_index=False, default=portfolio.tenants.current_tenant_id, on_delete=django.db.models.deletion.CASCADE, to='portfolio.tenant'),
+        ),
+        migrations.AlterField(
+            model_name='tombstone',
+            name='tenant',
+            field=models.ForeignKey(db_index=False, default=portfolio.tenants.current_tenant_id, on_delete=django.db.models.deletion.CASCADE, to='portfolio.tenant'),
+        ),
+        migrations.AlterField(
+            model_name='work',
+            name='tenant',
+            field=models.ForeignKey(db_index=False, default=portfolio.tenants.current_tenant_id, on_delete=django.db.models.deletion.CASCADE, to='portfolio.tenant'),
+        ),
+        migrations.AddIndex(
+            model_name='education',
+            index=models.Index(fields=['tenant', 'ordinal', 'id'], name='education_tenant_order'),
+        ),
+        migrations.AddIndex(
+            model_name='education',
+            index=models.Index(fields=['tenant', 'updated_at'], name='education_tenant_updated'),
+        ),
+        migrations.AddIndex(
+            model_name='portfolio',
+            index=models.Index(fields=['tenant', 'ordinal', 'id'], name='portfolio_tenant_order'),
+        ),
+        migrations.AddIndex(
+            model_name='portfolio',
+            index=models.Index(fields=['tenant', 'updated_at'], name='portfolio_tenant_updated'),
+        ),
+        migrations.AddIndex(
+            model_name='skills',
+            index=models.Index(fields=['tenant', 'ordinal', 'id'], include=('skillName',), name='skills_tenant_order'),
+        ),
+        migrations.AddIndex(
+            model_name='skills',
+            index=models.Index(fields=['tenant', 'updated_at'], name='skills_tenant_updated'),
+        ),
+        migrations.AddIndex(
+            model_name='tombstone',
+            index=models.Index(fields=['tenant', 'deleted_at'], name='tombstone_tenant_deleted'),
+        ),
+        migrations.AddIndex(
+            model_name='work',
+            index=models.Index(fields=['tenant', 'ordinal', 'id'], name='work_tenant_order'),
+        ),
+        migrations.AddIndex(
+            model_name='work',
+            index=models.Index(fields=['tenant', 'updated_at'], name='work_tenant_updated'),
+        ),
+    ]
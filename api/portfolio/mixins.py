@@ -0,0 +1,260 @@
+import hashlib
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Count, Max
+from django.http import Http404, StreamingHttpResponse
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from rest_framework import permissions, serializers, status
+from rest_framework.decorators import action
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+
+from .cache import content_version, get_backend, response_key, single_flight
+from .signals import content_changed
+from .tenants import current_tenant_id
+from .uploads import enqueue_upload, open_session
+
+
+def content_etag(model, last_modified, count, request):
+    # The path and query string pick the representation, so they are part of the tag
+    state = (model._meta.label_lower, last_modified, count, request.get_host(), request.get_full_path())
+    return 'W/"%s"' % hashlib.md5(repr(state).encode()).hexdigest()
+
+
+class ConditionalGetMixin:
+    """ETag / Last-Modified on list and retrieve, answered from one aggregate query."""
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset()).order_by()
+        state = queryset.aggregate(last=Max('updated_at'), count=Count('pk'))
+        return self.conditional_response(super().list, state['last'], state['count'], request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup = {self.lookup_field: kwargs[self.lookup_url_kwarg or self.lookup_field]}
+        try:
+            last = self.get_queryset().filter(**lookup).values_list('updated_at', flat=True).first()
+        except (TypeError, ValueError, ValidationError):
+            # A lookup value the field rejects (/skills/abc/) matches nothing, as in get_object_or_404
+            raise Http404
+        if last is None:
+            return super().retrieve(request, *args, **kwargs)
+        return self.conditional_response(super().retrieve, last, 1, request, *args, **kwargs)
+
+    def conditional_response(self, handler, last_modified, count, request, *args, **kwargs):
+        etag = content_etag(self.queryset.model, last_modified, count, request)
+        # The same validator versions the response cache
+        self.content_version = content_version(last_modified, count)
+        timestamp = int(last_modified.timestamp()) if last_modified else None
+
+        response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+        if response is None:
+            response = handler(request, *args, **kwargs)
+        if response.status_code in (status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED):
+            response['ETag'] = etag
+            if timestamp is not None:
+                response['Last-Modified'] = http_date(timestamp)
+        return response
+
+
+class StreamingListMixin:
+    """?stream=json or ?stream=ndjson: serialize and send the list row by row.
+
+    Rows are read with .iterator(), so memory stays flat however long the
+    table is, and the first bytes go out before the query has finished.
+    The json variant is byte for byte the regular list response.
+    """
+    stream_query_param = 'stream'
+    stream_chunk_size = 500
+    stream_formats = {'json': 'application/json', 'ndjson': 'application/x-ndjson'}
+
+    def list(self, request, *args, **kwargs):
+        variant = request.query_params.get(self.stream_query_param)
+        if variant is None:
+            return super().list(request, *args, **kwargs)
+        if variant not in self.stream_formats:
+            return Response({'error': f"{self.stream_query_param} must be one of {', '.join(self.stream_formats)}"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        queryset = self.filter_queryset(self.get_queryset())
+        # Pin the database now; the body is produced after the middleware has returned
+        queryset = queryset.using(queryset.db)
+        return StreamingHttpResponse(self.stream_rows(queryset, variant), content_type=self.stream_formats[variant])
+
+    def stream_rows(self, queryset, variant):
+        serializer = self.get_serializer()
+        reader = getattr(serializer, 'values_reader', lambda: None)()
+        if reader is not None:
+            columns, represent = reader
+            rows = queryset.values_list(*columns).iterator(chunk_size=self.stream_chunk_size)
+        else:
+            represent = serializer.to_representation
+            rows = queryset.iterator(chunk_size=self.stream_chunk_size)
+        render = JSONRenderer().render
+        if variant == 'ndjson':
+            for row in rows:
+                yield render(represent(row)) + b'\n'
+            return
+        yield b'['
+        for i, row in enumerate(rows):
+            yield (b',' if i else b'') + render(represent(row))
+        yield b']'
+
+
+class CachedResponseMixin:
+    """Serve list/retrieve from the response cache until the rows' validator moves on.
+
+    Entries are keyed by the content_version() ConditionalGetMixin has just
+    read from the database, so it has to come first in the bases. Misses are
+    coalesced with single_flight, so a burst of identical requests after an
+    edit or a deploy runs the query once.
+    """
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(super().retrieve, request, *args, **kwargs)
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        version = getattr(self, 'content_version', None)
+        if version is None:
+            # No rows to version an entry by (a missing detail row), so nothing is cached
+            return handler(request, *args, **kwargs)
+        backend = get_backend()
+        key = response_key(self.queryset.model, request, self.action, kwargs.get(self.lookup_field), version=version)
+        data = backend.get(key)
+        if data is not None:
+            return Response(data)
+
+        response = None
+
+        def compute():
+            nonlocal response
+            response = handler(request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return None
+            backend.set(key, response.data)
+            return response.data
+
+        # Concurrent misses for the same key share one query and serialization
+        data = single_flight(key, compute)
+        return response if response is not None else Response(data)
+
+
+class ImageUploadMixin:
+    """Hand uploaded images to the background workers instead of uploading inside the request.
+
+    Large images can also be sent in chunks: POST <route>/<pk>/image-upload/
+    opens an upload session (see portfolio.uploads).
+    """
+    image_folder = None
+
+    @action(detail=True, methods=['post'], url_path='image-upload', parser_classes=[JSONParser])
+    def image_upload(self, request, *args, **kwargs):
+        instance = self.get_object()
+        size = request.data.get('size') if isinstance(request.data, dict) else None
+        if type(size) is not int or not 0 < size <= settings.PORTFOLIO_UPLOADS['MAX_BYTES']:
+            return Response({'error': f"size must be 1 to {settings.PORTFOLIO_UPLOADS['MAX_BYTES']} bytes."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        session = open_session(instance, self.image_folder, size, str(request.data.get('filename', '')))
+        url = request.build_absolute_uri(reverse('upload-session', args=[session.pk]))
+        return Response({'id': str(session.pk), 'url': url, 'offset': 0, 'size': size},
+                        status=status.HTTP_201_CREATED, headers={'Location': url})
+
+    def perform_create(self, serializer):
+        image_file = serializer.validated_data.pop('image', None)
+        instance = serializer.save()
+        if image_file:
+            enqueue_upload(instance, image_file, self.image_folder)
+
+    def perform_update(self, serializer):
+        self.perform_create(serializer)
+
+
+class TenantQuerysetMixin:
+    """Read and write only rows of the request's tenant; rows it creates belong to that tenant too."""
+
+    def get_queryset(self):
+        return super().get_queryset().for_tenant()
+
+
+class SparseQuerysetMixin:
+    """Load only the columns a ?fields= / ?omit= request is going to serialize."""
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.request.method not in permissions.SAFE_METHODS:
+            return queryset
+        serializer = self.get_serializer()
+        ordering = [name.lstrip('-') for name in getattr(self.paginator, 'ordering', ())]
+        return queryset.only(*serializer.model_columns(), *ordering)
+
+
+class BulkUpdateMixin:
+    """PATCH <route>/bulk/ with [{"id": 1, "ordinal": 3, ...}, ...] to update many rows at once.
+
+    Every item is validated like a partial update, ordinals must stay unique
+    among the rows touched and against the rest of the queryset, and all rows
+    are written by one bulk UPDATE inside a single transaction.
+    """
+
+    bulk_id_field = serializers.IntegerField()
+
+    @action(detail=False, methods=['patch'], url_path='bulk', parser_classes=[JSONParser])
+    def bulk(self, request, *args, **kwargs):
+        items = request.data
+        if not isinstance(items, list) or not items:
+            return Response({'error': 'Expected a non-empty list of objects.'}, status=status.HTTP_400_BAD_REQUEST)
+        if not all(isinstance(item, dict) and 'id' in item for item in items):
+            return Response({'error': 'Every item needs an id.'}, status=status.HTTP_400_BAD_REQUEST)
+        ids, id_errors = [], {}
+        for index, item in enumerate(items):
+            try:
+                ids.append(self.bulk_id_field.run_validation(item['id']))
+            except serializers.ValidationError as e:
+                id_errors[index] = {'id': e.detail}
+        if id_errors:
+            return Response(id_errors, status=status.HTTP_400_BAD_REQUEST)
+        if len(set(ids)) != len(ids):
+            return Response({'error': 'Duplicate ids.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        model = self.queryset.model
+        with transaction.atomic():
+            queryset = self.get_queryset()
+            instances = queryset.select_for_update().in_bulk(ids)
+            missing = [pk for pk in ids if pk not in instances]
+            if missing:
+                return Response({'error': f'Unknown id(s): {missing}'}, status=status.HTTP_400_BAD_REQUEST)
+
+            errors, fields = {}, {'updated_at'}
+            for pk, item in zip(ids, items):
+                data = {key: value for key, value in item.items() if key != 'id'}
+                serializer = self.get_serializer(instances[pk], data=data, partial=True)
+                if not serializer.is_valid():
+                    errors[pk] = serializer.errors
+                    continue
+                for name, value in serializer.validated_data.items():
+                    setattr(serializer.instance, name, value)
+                    fields.add(name)
+            if errors:
+                return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+
+            if 'ordinal' in fields:
+                others = queryset.exclude(pk__in=ids).values_list('ordinal', flat=True)
+                ordinals = [instance.ordinal for instance in instances.values()]
+                if len(set(ordinals)) != len(ordinals) or set(ordinals) & set(others):
+                    return Response({'error': 'Ordinals must be unique.'}, status=status.HTTP_400_BAD_REQUEST)
+
+            now = timezone.now()
+            for instance in instances.values():
+                instance.updated_at = now
+            model.objects.bulk_update(instances.values(), list(fields))
+
+        # bulk_update skips post_save, so tell the caches ourselves once committed
+        content_changed.send(sender=model, pks=ids, op='update', tenant=current_tenant_id())
+        return Response(list(queryset.order_by('ordinal', 'pk').values('id', 'ordinal')))
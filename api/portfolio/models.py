@@ -1,69 +1,206 @@
+import uuid
+
 from django.db import models
+from django.core.files import File
+from django.utils import timezone
 from cloudinary.models import CloudinaryField
+from .storage import image_urls
+from .tenants import current_tenant_id
+
+
+class Tenant(models.Model):
+    """One hosted portfolio, reached at its own domain or under /t/<slug>/ (see portfolio.tenants)."""
+    slug = models.SlugField(max_length=63, unique=True)
+    name = models.CharField(max_length=255)
+    domain = models.CharField(max_length=255, unique=True, blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.name
+
+
+class TenantQuerySet(models.QuerySet):
+    def for_tenant(self, tenant_id=None):
+        """Rows of `tenant_id`, by default those of the current tenant."""
+        return self.filter(tenant_id=current_tenant_id() if tenant_id is None else tenant_id)
+
+
+class TenantModel(models.Model):
+    """Content owned by one tenant; rows are created for the current tenant unless given another."""
+    # No index of its own: every content index starts with tenant
+    tenant = models.ForeignKey(Tenant, on_delete=models.CASCADE, default=current_tenant_id, db_index=False)
+
+    objects = TenantQuerySet.as_manager()
+
+    class Meta:
+        abstract = True
 
-class Education(models.Model):
+
+class ImageStatus(models.TextChoices):
+    READY = 'ready'
+    PENDING = 'pending'
+    FAILED = 'failed'
+
+
+class ImageModel(models.Model):
+    """Keeps the image's display URL and responsive srcset on the row, so reads never build them."""
+    image_status = models.CharField(max_length=10, choices=ImageStatus.choices, default=ImageStatus.READY)
+    image_url = models.CharField(max_length=500, blank=True, null=True, editable=False)
+    image_srcset = models.TextField(blank=True, null=True, editable=False)
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        uploading = isinstance(self.image, File)
+        if not uploading:
+            self.refresh_image_urls()
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None and 'image' in update_fields:
+                kwargs['update_fields'] = {*update_fields, 'image_url', 'image_srcset'}
+        super().save(*args, **kwargs)
+        if uploading:
+            # CloudinaryField has only just turned the file into a resource. updated_at moves
+            # again, and caches hear about it, so nothing built from the row in between
+            # outlives this change: post_save has already been sent by now.
+            from .signals import content_changed
+
+            self.refresh_image_urls()
+            self.updated_at = timezone.now()
+            type(self).objects.filter(pk=self.pk).update(
+                image_url=self.image_url, image_srcset=self.image_srcset, updated_at=self.updated_at)
+            content_changed.send(sender=type(self), pks=[self.pk], op='update', tenant=self.tenant_id)
+
+    def refresh_image_urls(self, storage=None):
+        resource = self._meta.get_field('image').to_python(self.image) if self.image else None
+        self.image_url, self.image_srcset = image_urls(resource, storage)
+
+
+class Education(TenantModel, ImageModel):
     school = models.CharField(max_length=255)
     degree = models.CharField(max_length=255)
     years = models.CharField(max_length=255)
     image = CloudinaryField('image', folder='education', blank=True, null=True)
     ordinal = models.IntegerField()
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
-        ordering = ['ordinal']
+        ordering = ['ordinal', 'id']
+        indexes = [
+            models.Index(fields=['tenant', 'ordinal', 'id'], name='education_tenant_order'),
+            models.Index(fields=['tenant', 'updated_at'], name='education_tenant_updated'),
+        ]
 
     def __str__(self):
         return f"{self.school} - {self.degree}"
 
-    @property
-    def image_url(self):
-        if self.image and hasattr(self.image, 'url'):
-            # Get the secure URL from Cloudinary
-            return self.image.build_url(secure=True)
-        return None
-
-class Work(models.Model):
+class Work(TenantModel, ImageModel):
     company = models.CharField(max_length=255)
     years = models.CharField(max_length=255)
     description = models.TextField()
     image = CloudinaryField('image', folder='work', blank=True, null=True)
     ordinal = models.IntegerField()
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
-        ordering = ['ordinal']
+        ordering = ['ordinal', 'id']
+        indexes = [
+            models.Index(fields=['tenant', 'ordinal', 'id'], name='work_tenant_order'),
+            models.Index(fields=['tenant', 'updated_at'], name='work_tenant_updated'),
+        ]
 
     def __str__(self):
         return f"{self.company} - {self.years}"
 
-    @property
-    def image_url(self):
-        if self.image and hasattr(self.image, 'url'):
-            return self.image.build_url(secure=True)
-        return None
-
-class Portfolio(models.Model):
+class Portfolio(TenantModel, ImageModel):
     title = models.CharField(max_length=255)
     description = models.TextField()
     image = CloudinaryField('image', folder='portfolio', blank=True, null=True)
     url = models.URLField()
     years = models.CharField(max_length=255, blank=True, null=True)
     ordinal = models.IntegerField()
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
-        ordering = ['ordinal']
+        ordering = ['ordinal', 'id']
+        indexes = [
+            models.Index(fields=['tenant', 'ordinal', 'id'], name='portfolio_tenant_order'),
+            models.Index(fields=['tenant', 'updated_at'], name='portfolio_tenant_updated'),
+        ]
         verbose_name_plural = "Portfolio entries"
 
     def __str__(self):
         return self.title
 
-    @property
-    def image_url(self):
-        if self.image and hasattr(self.image, 'url'):
-            return self.image.build_url(secure=True)
-        return None
-
-class Skills(models.Model):  # Changed from Skills to Skill
+class Skills(TenantModel):  # Changed from Skills to Skill
     skillName = models.CharField(max_length=255)
     ordinal = models.IntegerField()
-    
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['ordinal', 'id']
+        # Covers the whole list projection, so PostgreSQL can answer /skills/ from the index alone
+        indexes = [
+            models.Index(fields=['tenant', 'ordinal', 'id'], name='skills_tenant_order', include=['skillName']),
+            models.Index(fields=['tenant', 'updated_at'], name='skills_tenant_updated'),
+        ]
+
+    def __str__(self):
+        return self.skillName
+
+
+class ImageUploadJob(models.Model):
+    """An image waiting to be pushed to storage by the background upload workers."""
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [(PENDING, 'Pending'), (RUNNING, 'Running'), (DONE, 'Done'), (FAILED, 'Failed')]
+
+    model = models.CharField(max_length=100)
+    object_id = models.BigIntegerField()
+    folder = models.CharField(max_length=100)
+    source = models.CharField(max_length=500)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    public_id = models.CharField(max_length=255, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['status', 'next_attempt_at'])]
+
+    def __str__(self):
+        return f"{self.model}#{self.object_id} ({self.status})"
+
+
+class UploadSession(models.Model):
+    """A chunked image upload in progress: byte ranges are PUT in order, then it is finalized."""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    model = models.CharField(max_length=100)
+    object_id = models.BigIntegerField()
+    folder = models.CharField(max_length=100)
+    path = models.CharField(max_length=500)
+    size = models.BigIntegerField()
+    received = models.BigIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.model}#{self.object_id} upload ({self.received}/{self.size} bytes)"
+
+
+class Tombstone(models.Model):
+    """A deleted content row, kept for a while so /changes/ can tell clients to drop it."""
+    tenant = models.ForeignKey(Tenant, on_delete=models.CASCADE, default=current_tenant_id, db_index=False)
+    model = models.CharField(max_length=100)
+    object_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['tenant', 'deleted_at'], name='tombstone_tenant_deleted')]
+
     def __str__(self):
-        return self.skillName
\ No newline at end of file
+        return f"{self.model}#{self.object_id} deleted {self.deleted_at:%Y-%m-%d %H:%M}"
@@ -0,0 +1,162 @@
+import base64
+import datetime
+import json
+from functools import reduce
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections
+from django.db.models import Q
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """Cursor pagination on a unique key such as (ordinal, id).
+
+    The cursor holds the key of the last row served, and the next page is
+    everything strictly after it. Rows inserted, deleted or reordered
+    elsewhere never shift the rest: every row whose key stays put is served
+    exactly once, in order. A row whose own key moves across the cursor
+    while a client pages shows up twice or not at all; the key is only as
+    stable as the ordinal.
+
+    Only used when ?limit= or ?cursor= is given, unless `always` is set;
+    without them the endpoint still returns a plain list. ?count=exact adds
+    a COUNT(*) of the whole result, and ?count=approx a cheap estimate (see
+    estimate_count).
+    """
+    ordering = ('ordinal', 'id')
+    default_limit = 50
+    max_limit = 500
+    always = False
+    limit_query_param = 'limit'
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if not self.is_requested(request):
+            return None
+
+        params = request.query_params
+        self.request = request
+        self.limit = self.get_limit(request)
+        queryset = queryset.order_by(*self.ordering)
+        self.count = self.get_count(queryset, params.get(self.count_query_param))
+        position = self.decode_cursor(queryset.model, params.get(self.cursor_query_param))
+        if position is not None:
+            queryset = queryset.filter(self.after(position))
+
+        rows = list(queryset[:self.limit + 1])
+        self.has_next = len(rows) > self.limit
+        rows = rows[:self.limit]
+        self.next_position = [getattr(rows[-1], name) for name in self.fields()] if self.has_next else None
+        return rows
+
+    def is_requested(self, request):
+        params = request.query_params
+        return self.always or self.limit_query_param in params or self.cursor_query_param in params
+
+    def get_count(self, queryset, mode):
+        if not mode:
+            return None
+        if mode == 'exact':
+            return queryset.count()
+        if mode == 'approx':
+            return estimate_count(queryset)
+        raise ValidationError({self.count_query_param: 'Expected "exact" or "approx".'})
+
+    def get_paginated_response(self, data):
+        body = {'next': self.get_next_link(), 'results': data}
+        if self.count is not None:
+            body = {'count': self.count, **body}
+        return Response(body)
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'count': {'type': 'integer'},
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_limit(self, request):
+        try:
+            limit = int(request.query_params.get(self.limit_query_param, self.default_limit))
+        except ValueError:
+            limit = self.default_limit
+        return max(1, min(limit, self.max_limit))
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        url = replace_query_param(url, self.limit_query_param, self.limit)
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.next_position))
+
+    def fields(self):
+        return [name.lstrip('-') for name in self.ordering]
+
+    def after(self, position):
+        # (a, b) > (x, y)  ==>  a > x OR (a = x AND b > y), flipped for descending keys
+        clauses = []
+        for i, name in enumerate(self.ordering):
+            field = name.lstrip('-')
+            lookup = 'lt' if name.startswith('-') else 'gt'
+            equal = {f: v for f, v in zip(self.fields()[:i], position)}
+            clauses.append(Q(**equal, **{f'{field}__{lookup}': position[i]}))
+        return reduce(Q.__or__, clauses)
+
+    def encode_cursor(self, position):
+        # isoformat() keeps microseconds; DjangoJSONEncoder cuts datetimes to milliseconds,
+        # which would skip rows sharing the boundary's millisecond
+        position = [value.isoformat() if isinstance(value, (datetime.date, datetime.time)) else value
+                    for value in position]
+        raw = json.dumps(position, cls=DjangoJSONEncoder, separators=(',', ':'))
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, model, cursor):
+        if not cursor:
+            return None
+        try:
+            raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+            values = json.loads(raw)
+            if len(values) != len(self.ordering):
+                raise ValueError
+            return [model._meta.get_field(name).to_python(value) for name, value in zip(self.fields(), values)]
+        except Exception:
+            raise NotFound('Invalid cursor')
+
+
+class UserPagination(KeysetPagination):
+    """Newest accounts first, and always paged: the user table is the one that grows."""
+    ordering = ('-date_joined', '-id')
+    always = True
+
+
+# Where the planner cannot estimate, counting stops here and the total reads "at least this many"
+ESTIMATE_CAP = 10000
+
+
+def estimate_count(queryset):
+    """Row count without a full COUNT(*) scan.
+
+    PostgreSQL: the planner's row estimate for the query (pg_class.reltuples
+    and column statistics, kept current by autovacuum/ANALYZE). Elsewhere an
+    exact count that gives up after ESTIMATE_CAP rows.
+    """
+    queryset = queryset.order_by()
+    connection = connections[queryset.db]
+    if connection.vendor == 'postgresql':
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows'])
+    return queryset[:ESTIMATE_CAP].count()
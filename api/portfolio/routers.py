@@ -0,0 +1,107 @@
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import transaction
+from django.urls import Resolver404, resolve
+from rest_framework import permissions
+
+from .signals import content_changed
+
+REPLICA = 'replica'
+PIN_COOKIE = 'portfolio_primary_until'
+
+_use_replica = ContextVar('portfolio_use_replica', default=False)
+_last_write = 0.0
+
+
+def replica_configured():
+    return REPLICA in settings.DATABASES
+
+
+class ReplicaRouter:
+    """Reads go to the replica only inside requests ReplicaRoutingMiddleware cleared for it."""
+
+    def db_for_read(self, model, **hints):
+        if not _use_replica.get() or not replica_configured():
+            return 'default'
+        # Anything read inside a transaction must see that transaction's writes
+        if transaction.get_connection('default').in_atomic_block:
+            return 'default'
+        return REPLICA
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+
+class ReplicaRoutingMiddleware:
+    """Send safe-method requests for portfolio views to the replica.
+
+    Clients that just wrote get a cookie pinning them to the primary for
+    DB_READ_AFTER_WRITE_SECONDS, and the whole process stays on the primary for
+    that long after any content change it made, so nobody reads (or caches)
+    rows the replica has not caught up with yet.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = _use_replica.set(self.use_replica(request))
+        try:
+            response = self.get_response(request)
+        finally:
+            _use_replica.reset(token)
+        return self.process_response(request, response)
+
+    async def __acall__(self, request):
+        token = _use_replica.set(self.use_replica(request))
+        try:
+            response = await self.get_response(request)
+        finally:
+            _use_replica.reset(token)
+        return self.process_response(request, response)
+
+    def process_response(self, request, response):
+        if request.method not in permissions.SAFE_METHODS and response.status_code < 400:
+            window = settings.DB_READ_AFTER_WRITE_SECONDS
+            response.set_cookie(PIN_COOKIE, str(int(time.time() + window)), max_age=window,
+                                secure=request.is_secure(), httponly=True,
+                                samesite='None' if request.is_secure() else 'Lax')
+        return response
+
+    def use_replica(self, request):
+        if request.method not in permissions.SAFE_METHODS or self.pinned(request):
+            return False
+        try:
+            view = resolve(request.path_info, getattr(request, 'urlconf', None)).func
+        except Resolver404:
+            return False
+        return getattr(view, 'cls', view).__module__.startswith('portfolio.')
+
+    def pinned(self, request):
+        now = time.time()
+        if now - _last_write < settings.DB_READ_AFTER_WRITE_SECONDS:
+            return True
+        try:
+            return float(request.COOKIES.get(PIN_COOKIE, 0)) > now
+        except ValueError:
+            return False
+
+
+def record_write(**kwargs):
+    global _last_write
+    _last_write = time.time()
+
+
+content_changed.connect(record_write, dispatch_uid='portfolio.routers.record_write')
@@ -0,0 +1,164 @@
+"""Ranked full-text search over the content models.
+
+On PostgreSQL rows are matched with to_tsvector/plainto_tsquery against the
+GIN expression indexes created in migration 0015. Elsewhere (SQLite in
+development and tests) an in-process inverted index is built once and then
+kept current from content_changed, instead of scanning tables per query.
+Both only ever look at the current tenant's rows.
+"""
+import math
+import re
+import threading
+from collections import Counter, defaultdict
+
+from django.db import connection
+from django.db.models import BooleanField, FloatField
+from django.db.models.expressions import RawSQL
+
+from .cache import content_versions
+from .models import Education, Work, Portfolio, Skills
+from .signals import content_changed
+from .tenants import current_tenant_id
+
+TYPES = {'portfolio': Portfolio, 'work': Work, 'education': Education, 'skills': Skills}
+SEARCH_FIELDS = {
+    Portfolio: ('title', 'description'),
+    Work: ('company', 'description'),
+    Education: ('school', 'degree'),
+    Skills: ('skillName',),
+}
+TOKEN_RE = re.compile(r'\w+')
+
+
+def tokenize(text):
+    return TOKEN_RE.findall((text or '').lower())
+
+
+def tsvector_sql(model, quote=None):
+    """The indexed expression. Queries must spell it exactly like this to use the GIN index."""
+    quote = quote or connection.ops.quote_name
+    columns = " || ' ' || ".join(f"coalesce({quote(model._meta.get_field(f).column)}, '')" for f in SEARCH_FIELDS[model])
+    return f"to_tsvector('english', {columns})"
+
+
+class PostgresSearch:
+    def search(self, query, models, limit):
+        hits = []
+        for model in models:
+            vector = tsvector_sql(model)
+            rows = (
+                model.objects.for_tenant()
+                .filter(RawSQL(f"{vector} @@ plainto_tsquery('english', %s)", [query], output_field=BooleanField()))
+                .annotate(rank=RawSQL(f"ts_rank({vector}, plainto_tsquery('english', %s))", [query], output_field=FloatField()))
+                .order_by('-rank')
+                .values_list('pk', 'rank')[:limit]
+            )
+            hits.extend((model, pk, rank) for pk, rank in rows)
+        return sorted(hits, key=lambda hit: -hit[2])[:limit]
+
+
+class InvertedIndex:
+    """tenant -> term -> {(model, pk): term frequency}, scored with BM25.
+
+    Each tenant has its own postings and document lengths, so one tenant's
+    content never skews another's scores. A tenant is indexed on its first
+    search.
+    """
+    k1 = 1.2
+    b = 0.75
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._postings = defaultdict(lambda: defaultdict(dict))
+        self._lengths = defaultdict(dict)
+        self._terms = {}
+        self._versions = {}
+
+    def search(self, query, models, limit):
+        terms = set(tokenize(query))
+        if not terms:
+            return []
+        tenant = current_tenant_id()
+        with self._lock:
+            # Read from the database, so edits made by other workers, commands or the shell show up too
+            live = content_versions(models, tenant)
+            for model in models:
+                if self._versions.get((tenant, model)) != live[model._meta.label_lower]:
+                    self.reindex(model, tenant, version=live[model._meta.label_lower])
+
+            lengths = self._lengths[tenant]
+            total = len(lengths) or 1
+            average = sum(lengths.values()) / total
+            scores = Counter()
+            for term in terms:
+                postings = self._postings[tenant].get(term, {})
+                idf = math.log(1 + (total - len(postings) + 0.5) / (len(postings) + 0.5))
+                for doc, tf in postings.items():
+                    if doc[0] in models:
+                        length = lengths[doc]
+                        scores[doc] += idf * tf * (self.k1 + 1) / (tf + self.k1 * (1 - self.b + self.b * length / average))
+        return [(model, pk, score) for (model, pk), score in scores.most_common(limit)]
+
+    def reindex(self, model, tenant, pks=None, version=None):
+        with self._lock:
+            if version is None:
+                # Before reading rows, so an edit committed meanwhile is picked up by the next search
+                version = content_versions([model], tenant)[model._meta.label_lower]
+            stale = [doc for doc in self._lengths[tenant] if doc[0] == model and (pks is None or doc[1] in pks)]
+            for doc in stale:
+                self._remove(tenant, doc)
+            rows = model.objects.for_tenant(tenant)
+            if pks is not None:
+                rows = rows.filter(pk__in=pks)
+            for pk, *values in rows.values_list('pk', *SEARCH_FIELDS[model]):
+                self._add(tenant, (model, pk), tokenize(' '.join(v or '' for v in values)))
+            self._versions[(tenant, model)] = version
+
+    def _add(self, tenant, doc, tokens):
+        counts = Counter(tokens)
+        for term, tf in counts.items():
+            self._postings[tenant][term][doc] = tf
+        self._lengths[tenant][doc] = len(tokens)
+        self._terms[(tenant, doc)] = list(counts)
+
+    def _remove(self, tenant, doc):
+        for term in self._terms.pop((tenant, doc), ()):
+            postings = self._postings[tenant][term]
+            postings.pop(doc, None)
+            if not postings:
+                del self._postings[tenant][term]
+        self._lengths[tenant].pop(doc, None)
+
+    def update(self, sender, pks=(), tenant=None, **kwargs):
+        tenant = current_tenant_id() if tenant is None else tenant
+        with self._lock:
+            # Nothing to keep current until the first search builds this model
+            if (tenant, sender) in self._versions:
+                self.reindex(sender, tenant, set(pks))
+
+    def clear(self):
+        with self._lock:
+            self._postings.clear()
+            self._lengths.clear()
+            self._terms.clear()
+            self._versions.clear()
+
+
+inverted_index = InvertedIndex()
+
+
+def get_search_backend():
+    return PostgresSearch() if connection.vendor == 'postgresql' else inverted_index
+
+
+def search(query, models=None, limit=20):
+    """[(model, pk, score), ...] best first."""
+    return get_search_backend().search(query, list(models or SEARCH_FIELDS), limit)
+
+
+def _update_index(sender, **kwargs):
+    if sender in SEARCH_FIELDS:
+        inverted_index.update(sender, **kwargs)
+
+
+content_changed.connect(_update_index, dispatch_uid='portfolio.search.update_index')
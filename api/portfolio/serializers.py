@@ -1,54 +1,232 @@
+from time import perf_counter
+
 from django.contrib.auth.models import User
-from rest_framework import serializers
+from django.db import models
+from django.db.models.functions import Cast
+from django.utils.functional import cached_property
+from rest_framework import permissions, serializers
+from .fragments import fragment_cache
+from .metrics import record, timed
 from .models import Education, Work, Portfolio, Skills
+from .tenants import current_tenant_id
+
+
+class TimedSerializerMixin:
+    """Report the time spent turning instances into primitives as the request's serialize phase."""
+
+    def to_representation(self, instance):
+        # Per row, so the lazy query of a list is counted as db rather than serialize
+        started = perf_counter()
+        try:
+            return super().to_representation(instance)
+        finally:
+            record('serialize', perf_counter() - started)
+
+
+class FragmentCacheMixin:
+    """Reuse each row's serialized output until its updated_at moves (see portfolio.fragments)."""
+
+    def to_representation(self, instance):
+        # A deferred updated_at would cost a query per row, so such rows are just serialized
+        key = self.fragment_key(instance.pk, instance.__dict__.get('updated_at'))
+        data = fragment_cache.get(key) if key is not None else None
+        return data if data is not None else self.render_fragment(instance, key)
+
+    def render_fragment(self, instance, key=None):
+        data = super().to_representation(instance)
+        if key is not None:
+            fragment_cache.set(key, data)
+        return data
+
+    def fragment_key(self, pk, version):
+        if pk is None or version is None:
+            return None
+        return (self.Meta.model._meta.label_lower, pk, version, self.fragment_variant)
+
+    @cached_property
+    def fragment_variant(self):
+        request = self.context.get('request')
+        return (tuple(self.fields), request.build_absolute_uri('/') if request is not None else '')
+
+    def model_columns(self):
+        return super().model_columns() | {'updated_at'}
+
+
+# updated_at as the database's own text: lists key thousands of rows on it, and
+# skipping the datetime conversion is most of the cost of checking the cache
+ROW_VERSION = Cast('updated_at', models.CharField())
+
+
+class FragmentListSerializer(serializers.ListSerializer):
+    """Lists of a queryset assembled from row fragments; only rows without one are read in full and rendered.
+
+    Rows are rendered from values_list() tuples through the child's
+    values_reader where it has one, so no model instances are built.
+    """
+    batch_size = 500
+
+    def to_representation(self, data):
+        if not isinstance(data, models.QuerySet) or data.query.is_sliced:
+            return super().to_representation(data)
+        child = self.child
+        group = (child.Meta.model._meta.label_lower, current_tenant_id(), child.fragment_variant)
+        if not fragment_cache.was_listed(group):
+            # Nothing to reuse yet: one plain scan, which fills the cache
+            rows = [row for _, row in self.render(data)]
+            fragment_cache.mark_listed(group)
+            return rows
+
+        versions = list(data.values_list('pk', ROW_VERSION))
+        keys = {pk: child.fragment_key(pk, version) for pk, version in versions}
+        found = fragment_cache.get_many(list(keys.values()))
+        rows = {pk: found[key] for pk, key in keys.items() if key in found}
+
+        missing = [pk for pk in keys if pk not in rows]
+        if len(missing) > len(keys) // 2:
+            batches = [data]  # mostly cold again: one plain scan beats long IN lists
+        else:
+            batches = [data.filter(pk__in=missing[i:i + self.batch_size]) for i in range(0, len(missing), self.batch_size)]
+        for batch in batches:
+            rows.update(self.render(batch))
+        # Rows deleted in between are left out
+        return [rows[pk] for pk, _ in versions if pk in rows]
 
-class UserSerializer(serializers.ModelSerializer):
+    def render(self, queryset):
+        """[(pk, representation)] for every row, each cached under the version it was read at."""
+        child = self.child
+        reader = child.values_reader()
+        if reader is None:
+            return [(instance.pk, child.render_fragment(instance, child.fragment_key(instance.pk, instance.row_version)))
+                    for instance in queryset.annotate(row_version=ROW_VERSION)]
+        columns, read = reader
+        tuples = list(queryset.values_list('pk', ROW_VERSION, *columns))
+        with timed('serialize'):
+            rendered = [(pk, child.fragment_key(pk, version), read(row)) for pk, version, *row in tuples]
+        fragment_cache.set_many({key: data for _, key, data in rendered})
+        return [(pk, data) for pk, _, data in rendered]
+
+
+class SparseFieldsetMixin:
+    """Narrow the output of read requests with ?fields=a,b or ?omit=c.
+
+    Only where the context opts in with 'sparse_fieldsets' (the content
+    routes): the bundle, /changes/ and search serialize with the request too,
+    but their output is cached or upserted by id, so it always has every field.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        if not self.context.get('sparse_fieldsets') or request is None or request.method not in permissions.SAFE_METHODS:
+            return
+
+        params = getattr(request, 'query_params', request.GET)
+        only, omit = self._names(params.get('fields')), self._names(params.get('omit'))
+        unknown = (only | omit) - set(self.fields)
+        if unknown:
+            raise serializers.ValidationError({'fields': f"Unknown field(s): {', '.join(sorted(unknown))}"})
+        for name in list(self.fields):
+            if (only and name not in only) or name in omit:
+                self.fields.pop(name)
+
+    @staticmethod
+    def _names(value):
+        return {name.strip() for name in value.split(',') if name.strip()} if value else set()
+
+    def model_columns(self):
+        """Model columns the remaining fields read, for QuerySet.only()."""
+        columns = set()
+        for field in self.fields.values():
+            columns.update(getattr(field, 'columns', [field.source]))
+        concrete = {f.attname for f in self.Meta.model._meta.concrete_fields} | {f.name for f in self.Meta.model._meta.concrete_fields}
+        return columns & concrete
+
+    def values_reader(self):
+        """(columns, read) where read(row) renders a values_list(*columns) tuple like to_representation would.
+
+        Skips building model instances and walking each field's get_attribute.
+        None when some field needs more than one plain column, in which case
+        the caller has to serialize instances as usual.
+        """
+        model_fields = {f.attname: f for f in self.Meta.model._meta.concrete_fields}
+        columns, names, positions, converters = [], [], [], []
+        for name, field in self.fields.items():
+            if field.write_only:
+                continue
+            source = getattr(field, 'columns', [field.source])
+            if len(source) != 1 or source[0] not in model_fields:
+                return None
+            if source[0] not in columns:
+                columns.append(source[0])
+            names.append(name)
+            positions.append(columns.index(source[0]))
+            # str()/int() of what the column already holds is a no-op; anything else keeps its own rules
+            passthrough = (
+                (type(field) is serializers.CharField and isinstance(model_fields[source[0]], (models.CharField, models.TextField)))
+                or (type(field) is serializers.IntegerField and isinstance(model_fields[source[0]], models.IntegerField))
+            )
+            if not passthrough:
+                converters.append((name, field.to_representation))
+
+        def read(row):
+            data = dict(zip(names, [row[i] for i in positions]))
+            for name, convert in converters:
+                if data[name] is not None:
+                    data[name] = convert(data[name])
+            return data
+        return columns, read
+
+
+class StoredImageField(serializers.FileField):
+    """Accepts uploads like FileField but reads back the URL stored on the row."""
+    columns = ['image_url']
+
+    def get_attribute(self, instance):
+        return instance.image_url
+
+    def to_representation(self, value):
+        if not value:
+            return None
+        request = self.context.get('request', None)
+        return request.build_absolute_uri(value) if request is not None else value
+
+
+class UserSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ['id', 'username', 'email', 'groups']
 
-class EducationSerializer(serializers.ModelSerializer):
-    image_url = serializers.SerializerMethodField()
-    image = serializers.FileField(required=False)  # Allow optional updates for images
+class EducationSerializer(TimedSerializerMixin, FragmentCacheMixin, SparseFieldsetMixin, serializers.ModelSerializer):
+    image = StoredImageField(required=False)  # Allow optional updates for images
 
     class Meta:
         model = Education
-        fields = ['id', 'school', 'degree', 'years', 'image', 'image_url', 'ordinal']
-
-    def get_image_url(self, obj):
-        if obj.image:
-            return obj.image.build_url(secure=True)
-        return None
+        fields = ['id', 'school', 'degree', 'years', 'image', 'image_url', 'image_srcset', 'image_status', 'ordinal']
+        read_only_fields = ['image_status']
+        list_serializer_class = FragmentListSerializer
 
 
-class WorkSerializer(serializers.ModelSerializer):
-    image_url = serializers.SerializerMethodField()
-    image = serializers.FileField(required=False)  # Allow optional updates for images
+class WorkSerializer(TimedSerializerMixin, FragmentCacheMixin, SparseFieldsetMixin, serializers.ModelSerializer):
+    image = StoredImageField(required=False)  # Allow optional updates for images
 
     class Meta:
         model = Work
-        fields = ['id', 'company', 'years', 'description', 'image', 'image_url', 'ordinal']
+        fields = ['id', 'company', 'years', 'description', 'image', 'image_url', 'image_srcset', 'image_status', 'ordinal']
+        read_only_fields = ['image_status']
+        list_serializer_class = FragmentListSerializer
 
-    def get_image_url(self, obj):
-        if obj.image:
-            return obj.image.build_url(secure=True)
-        return None
 
-
-class PortfolioSerializer(serializers.ModelSerializer):
-    image_url = serializers.SerializerMethodField()
-    image = serializers.FileField(required=False)  # Allow optional updates for images
+class PortfolioSerializer(TimedSerializerMixin, FragmentCacheMixin, SparseFieldsetMixin, serializers.ModelSerializer):
+    image = StoredImageField(required=False)  # Allow optional updates for images
 
     class Meta:
         model = Portfolio
-        fields = ['id', 'title', 'description', 'image', 'image_url', 'url', 'years', 'ordinal']
-
-    def get_image_url(self, obj):
-        if obj.image:
-            return obj.image.build_url(secure=True)
-        return None
+        fields = ['id', 'title', 'description', 'image', 'image_url', 'image_srcset', 'image_status', 'url', 'years', 'ordinal']
+        read_only_fields = ['image_status']
+        list_serializer_class = FragmentListSerializer
 
-class SkillsSerializer(serializers.ModelSerializer):
+class SkillsSerializer(TimedSerializerMixin, FragmentCacheMixin, SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = Skills  # Update to match new model name
         fields = ['id', 'skillName', 'ordinal']
+        list_serializer_class = FragmentListSerializer
@@ -0,0 +1,24 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import Signal
+from .models import Education, Work, Portfolio, Skills
+
+CONTENT_MODELS = (Education, Work, Portfolio, Skills)
+
+# Sent with sender=<model class> whenever rows of a content model change,
+# so caches built from those rows can throw away stale copies. `tenant` is
+# the id of the tenant owning all of `pks`. Deletes also pass `origin`, the
+# instance or queryset .delete() was called on, as post_delete does.
+content_changed = Signal()
+
+
+def _saved(sender, instance, created, **kwargs):
+    content_changed.send(sender=sender, pks=[instance.pk], op='create' if created else 'update', tenant=instance.tenant_id)
+
+
+def _deleted(sender, instance, origin=None, **kwargs):
+    content_changed.send(sender=sender, pks=[instance.pk], op='delete', tenant=instance.tenant_id, origin=origin)
+
+
+for _model in CONTENT_MODELS:
+    post_save.connect(_saved, sender=_model, dispatch_uid=f'portfolio.saved.{_model.__name__}')
+    post_delete.connect(_deleted, sender=_model, dispatch_uid=f'portfolio.deleted.{_model.__name__}')
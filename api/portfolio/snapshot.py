@@ -0,0 +1,240 @@
+"""Static snapshot of the content API.
+
+Every list and detail response of the content routes (plus /bundle/) is
+rendered to STATIC_ROOT/api-snapshot/<version>/ together with .gz/.br
+siblings, so WhiteNoise can serve it with far-future caching. The version is
+derived from the content_version() of each model the snapshot was built
+from, and current.json records which version is live along with them. With
+PORTFOLIO_SNAPSHOT['MODE'] set, portfolio.middleware.WhiteNoiseMiddleware
+answers plain API reads from the snapshot while those still match the
+database, which costs one validator query instead of the view's work. The
+database is the judge, so a snapshot built by the command is just as
+current for every worker.
+Only the default tenant is snapshotted; other tenants are served by Django.
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import tempfile
+import threading
+from collections import namedtuple
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.db import connections, transaction
+from rest_framework.renderers import JSONRenderer
+
+from .bundle import SECTIONS, build_bundle
+from .cache import acontent_versions, content_versions
+from .signals import CONTENT_MODELS, content_changed
+from .tenants import activate, current_tenant_id, default_tenant_id
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_DIR = 'api-snapshot'
+MANIFEST = 'current.json'
+
+Hit = namedtuple('Hit', 'url path models versions')
+
+
+def snapshot_root():
+    return os.path.join(settings.STATIC_ROOT, SNAPSHOT_DIR)
+
+
+def snapshot_url():
+    return f'{settings.STATIC_URL}{SNAPSHOT_DIR}/'
+
+
+def resources():
+    """(prefix, model, serializer, queryset) for every content route of the API router."""
+    from .urls import router
+
+    for prefix, viewset, basename in router.registry:
+        # Users have no updated_at to tell a stale copy apart, so they always go to Django
+        if viewset.queryset.model in CONTENT_MODELS:
+            yield prefix, viewset.queryset.model, viewset.serializer_class, viewset.queryset.for_tenant()
+
+
+def current_versions():
+    return content_versions(CONTENT_MODELS, default_tenant_id())
+
+
+def snapshot_version(versions):
+    return hashlib.md5(json.dumps(versions, sort_keys=True).encode()).hexdigest()[:12]
+
+
+def _request():
+    from django.test import RequestFactory  # test client machinery, kept off the start-up path
+
+    # Serializers build absolute URLs from the request, so render as the public host would
+    base = urlsplit(settings.PORTFOLIO_SNAPSHOT['BASE_URL'])
+    return RequestFactory().get('/', secure=base.scheme == 'https', HTTP_HOST=base.netloc)
+
+
+def render_files():
+    """{relative path: JSON bytes}, byte for byte what the API returns for the same URL."""
+    renderer = JSONRenderer()
+    request = _request()
+    context = {'request': request}
+    files = {}
+    with activate(default_tenant_id()):
+        for prefix, model, serializer, queryset in resources():
+            rows = list(queryset)
+            files[f'{prefix}.json'] = renderer.render(serializer(rows, many=True, context=context).data)
+            for row in rows:
+                files[f'{prefix}/{row.pk}.json'] = renderer.render(serializer(row, context=context).data)
+        files['bundle.json'] = renderer.render(build_bundle(request))
+    return files
+
+
+def build_snapshot(force=False, keep=None):
+    """Write the snapshot for the current content and make it live. Returns its version."""
+    # Read before rendering, so an edit made meanwhile makes this snapshot stale at once
+    versions = current_versions()
+    version = snapshot_version(versions)
+    root = snapshot_root()
+    target = os.path.join(root, version)
+    os.makedirs(root, exist_ok=True)
+
+    if force or not os.path.isdir(target):
+        from whitenoise.compress import Compressor  # pulls in brotli, only needed while building
+
+        staging = tempfile.mkdtemp(prefix='.build-', dir=root)
+        try:
+            compressor = Compressor(quiet=True)
+            for name, content in render_files().items():
+                path = os.path.join(staging, name)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path, 'wb') as f:
+                    f.write(content)
+                compressor.compress(path)
+            os.chmod(staging, 0o755)
+            if os.path.isdir(target):
+                shutil.rmtree(target)
+            os.replace(staging, target)
+        except BaseException:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+
+    manifest = os.path.join(root, MANIFEST)
+    with tempfile.NamedTemporaryFile('w', dir=root, delete=False) as f:
+        json.dump({'version': version, 'versions': versions}, f)
+    os.replace(f.name, manifest)
+    prune(keep if keep is not None else settings.PORTFOLIO_SNAPSHOT['KEEP'])
+    return version
+
+
+def prune(keep):
+    """Drop all but the newest `keep` versions; older ones may still be followed from a redirect."""
+    root = snapshot_root()
+    versions = [
+        os.path.join(root, name) for name in os.listdir(root)
+        if not name.startswith('.') and os.path.isdir(os.path.join(root, name))
+    ]
+    versions.sort(key=os.path.getmtime, reverse=True)
+    for path in versions[max(keep, 1):]:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+_manifest = (None, None)
+
+
+def current_manifest():
+    global _manifest
+    path = os.path.join(snapshot_root(), MANIFEST)
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+    if _manifest[0] != (path, mtime):
+        with open(path) as f:
+            _manifest = ((path, mtime), json.load(f))
+    return _manifest[1]
+
+
+_routes = None
+
+
+def _route_pattern():
+    global _routes
+    if _routes is None:
+        models = {prefix: (model,) for prefix, model, _, _ in resources()}
+        models['bundle'] = tuple(model for _, model, _ in SECTIONS)
+        pattern = re.compile(r'^/(?P<prefix>%s)/(?:(?P<pk>\d+)/)?$' % '|'.join(map(re.escape, models)))
+        _routes = (pattern, models)
+    return _routes
+
+
+def lookup(request):
+    """The snapshot file that would answer `request`, or None.
+
+    Only plain JSON reads qualify: anything with query parameters or asking
+    for the browsable API goes to the views as usual. The caller still has
+    to compare `versions` against the live ones.
+    """
+    if not settings.PORTFOLIO_SNAPSHOT['MODE'] or request.method not in ('GET', 'HEAD'):
+        return None
+    if current_tenant_id() != default_tenant_id():
+        return None
+    if request.GET or 'text/html' in request.headers.get('Accept', ''):
+        return None
+    pattern, models = _route_pattern()
+    match = pattern.match(request.path_info)
+    if match is None or (match['pk'] and match['prefix'] == 'bundle'):
+        return None
+    manifest = current_manifest()
+    if manifest is None:
+        return None
+    name = f"{match['prefix']}/{match['pk']}.json" if match['pk'] else f"{match['prefix']}.json"
+    path = os.path.join(snapshot_root(), manifest['version'], name)
+    if not os.path.isfile(path):
+        return None
+    url = f"{snapshot_url()}{manifest['version']}/{name}"
+    # Manifests written before versions were recorded never match
+    return Hit(url, path, models[match['prefix']], manifest.get('versions', {}))
+
+
+def is_fresh(hit):
+    live = content_versions(hit.models, default_tenant_id())
+    return all(hit.versions.get(label) == version for label, version in live.items())
+
+
+async def ais_fresh(hit):
+    live = await acontent_versions(hit.models, default_tenant_id())
+    return all(hit.versions.get(label) == version for label, version in live.items())
+
+
+_timer = None
+_timer_lock = threading.Lock()
+
+
+def _rebuild():
+    try:
+        build_snapshot()
+    except Exception:
+        logger.exception('Rebuilding the API snapshot failed')
+    finally:
+        connections.close_all()
+
+
+def schedule_rebuild(sender, tenant=None, **kwargs):
+    """Rebuild once writes have settled for DEBOUNCE_SECONDS, in the background."""
+    if not settings.PORTFOLIO_SNAPSHOT['AUTO'] or (tenant is not None and tenant != default_tenant_id()):
+        return
+
+    def start():
+        global _timer
+        with _timer_lock:
+            if _timer is not None:
+                _timer.cancel()
+            _timer = threading.Timer(settings.PORTFOLIO_SNAPSHOT['DEBOUNCE_SECONDS'], _rebuild)
+            _timer.daemon = True
+            _timer.start()
+
+    transaction.on_commit(start)
+
+
+content_changed.connect(schedule_rebuild, dispatch_uid='portfolio.snapshot.schedule_rebuild')
@@ -0,0 +1,77 @@
+import os
+import shutil
+import uuid
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from .metrics import timed
+
+
+class CloudinaryImageStorage:
+    # Bigger files go up in parts of this size, read from disk one part at a time
+    chunk_size = 20 * 1024 * 1024
+
+    def upload(self, path, folder):
+        import cloudinary.uploader  # only needed once an upload actually runs
+        if os.path.getsize(path) > self.chunk_size:
+            result = cloudinary.uploader.upload_large(path, folder=folder, resource_type='image', chunk_size=self.chunk_size)
+        else:
+            result = cloudinary.uploader.upload(path, folder=folder, resource_type='image')
+        return result['public_id']
+
+    def url(self, resource, width=None):
+        if width:
+            return resource.build_url(secure=True, width=width, crop='limit', fetch_format='auto', quality='auto')
+        return resource.build_url(secure=True)
+
+    def download(self, resource, target):
+        import requests
+        with requests.get(self.url(resource), stream=True, timeout=60) as response:
+            response.raise_for_status()
+            with open(target, 'wb') as out:
+                for chunk in response.iter_content(64 * 1024):
+                    out.write(chunk)
+
+
+class LocalImageStorage:
+    """Stand-in for Cloudinary that keeps images under MEDIA_ROOT, for offline use and tests."""
+
+    def __init__(self, location=None):
+        self.location = location or os.path.join(settings.MEDIA_ROOT, 'images')
+
+    def upload(self, path, folder):
+        name = f'{folder}/{uuid.uuid4().hex}{os.path.splitext(path)[1]}'
+        target = os.path.join(self.location, name)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        shutil.copyfile(path, target)
+        return name
+
+    def url(self, resource, width=None):
+        # No resizing here, every width points at the original file
+        name = f'{resource.public_id}.{resource.format}' if resource.format else resource.public_id
+        return f'{settings.MEDIA_URL}images/{name}'
+
+    def download(self, resource, target):
+        name = f'{resource.public_id}.{resource.format}' if resource.format else resource.public_id
+        shutil.copyfile(os.path.join(self.location, name), target)
+
+
+def get_image_storage():
+    return import_string(settings.PORTFOLIO_IMAGE_STORAGE)()
+
+
+def cloudinary_configured():
+    import cloudinary
+    config = cloudinary.config()
+    return bool(config.cloud_name and config.api_key and config.api_secret)
+
+
+def image_urls(resource, storage=None):
+    """The display URL and a srcset of PORTFOLIO_IMAGE_WIDTHS variants for a stored image."""
+    if not resource:
+        return None, None
+    storage = storage or get_image_storage()
+    with timed('image_url'):
+        srcset = ', '.join(f'{storage.url(resource, width)} {width}w' for width in settings.PORTFOLIO_IMAGE_WIDTHS)
+        return storage.url(resource), srcset
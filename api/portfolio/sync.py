@@ -0,0 +1,82 @@
+"""Delta sync: /changes/?since=<token> sends only what changed after the token.
+
+Every write to a content model sets updated_at, so changed rows are found
+with updated_at >= token on an indexed column. Deleted rows leave a
+Tombstone, written in the deleting transaction, for PORTFOLIO_SYNC
+TOMBSTONE_DAYS, unless the whole tenant is going with them. Without a
+token, or with one older than that, the answer is a full reset.
+Everything is that of the current tenant. Clients apply `deleted` before
+`changed`, upsert by id, and keep the new token for the next call.
+"""
+import base64
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import QuerySet
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import ValidationError
+
+from .bundle import SECTIONS
+from .models import Tenant, Tombstone
+from .signals import content_changed
+from .tenants import current_tenant_id
+
+
+def encode_token(moment):
+    return base64.urlsafe_b64encode(moment.isoformat().encode()).decode().rstrip('=')
+
+
+def decode_token(token):
+    try:
+        moment = parse_datetime(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)).decode())
+    except Exception:
+        moment = None
+    if moment is None or timezone.is_naive(moment):
+        raise ValidationError({'since': 'Invalid token.'})
+    return moment
+
+
+def horizon(now=None):
+    return (now or timezone.now()) - timedelta(days=settings.PORTFOLIO_SYNC['TOMBSTONE_DAYS'])
+
+
+def changes(since=None, request=None):
+    """{'token', 'reset', 'changed': {section: [rows]}, 'deleted': {section: [ids]}}"""
+    # Taken before reading, so anything committed while we read is in the next delta
+    now = timezone.now()
+    reset = since is None or since < horizon(now)
+    start = None if reset else since - timedelta(seconds=settings.PORTFOLIO_SYNC['OVERLAP_SECONDS'])
+
+    deleted = defaultdict(list)
+    if not reset:
+        tombstones = Tombstone.objects.filter(tenant_id=current_tenant_id(), deleted_at__gte=start)
+        for label, pk in tombstones.values_list('model', 'object_id'):
+            deleted[label].append(pk)
+
+    context = {'request': request}
+    result = {'token': encode_token(now), 'reset': reset, 'changed': {}, 'deleted': {}}
+    for key, model, serializer in SECTIONS:
+        queryset = model.objects.for_tenant().order_by('ordinal', 'id')
+        if not reset:
+            # A delta is mostly rows that just changed, with no fragments worth looking up first
+            queryset = list(queryset.filter(updated_at__gte=start))
+        result['changed'][key] = serializer(queryset, many=True, context=context).data
+        result['deleted'][key] = deleted[model._meta.label_lower]
+    return result
+
+
+def record_deletions(sender, pks, op, tenant=None, origin=None, **kwargs):
+    # Rows cascading from a deleted Tenant have nobody left to sync with, and
+    # a tombstone would point at the tenant row about to be deleted
+    if op != 'delete' or (origin.model if isinstance(origin, QuerySet) else type(origin)) is Tenant:
+        return
+    now = timezone.now()
+    tenant = current_tenant_id() if tenant is None else tenant
+    Tombstone.objects.bulk_create(Tombstone(tenant_id=tenant, model=sender._meta.label_lower, object_id=pk, deleted_at=now)
+                                  for pk in pks)
+    Tombstone.objects.filter(deleted_at__lt=horizon(now)).delete()
+
+
+content_changed.connect(record_deletions, dispatch_uid='portfolio.sync.record_deletions')
@@ -0,0 +1,151 @@
+"""Tenants: which portfolio a request, query or cache entry belongs to.
+
+TenantMiddleware resolves the tenant before anything else looks at the
+request, from the Host header (Tenant.domain) or from a /t/<slug>/ path
+prefix, which it strips so the URLconf never sees it. Requests matching
+neither go to the default tenant, so a single-site deployment keeps
+working unchanged. The tenant id then sits in a context variable:
+content querysets use it through for_tenant(), new rows are created for
+it, and generations, cached responses and the bundle are keyed by it.
+
+Slugs and domains of all tenants are read in one query and kept per
+process, so resolving a tenant costs nothing on the hot path.
+"""
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save
+from django.http import HttpResponseNotFound
+from django.http.request import split_domain_port
+from django.urls import get_script_prefix, set_script_prefix
+
+_current = ContextVar('portfolio_tenant', default=None)
+
+Directory = namedtuple('Directory', 'loaded default slugs domains')
+_directory = None
+
+
+def load_directory():
+    from .models import Tenant
+
+    default = settings.PORTFOLIO_TENANTS['DEFAULT']
+    rows = list(Tenant.objects.values_list('id', 'slug', 'domain'))
+    slugs = {slug: pk for pk, slug, _ in rows}
+    if default not in slugs:
+        slugs[default] = Tenant.objects.get_or_create(slug=default, defaults={'name': default})[0].pk
+    domains = {domain.lower(): pk for pk, _, domain in rows if domain}
+    return Directory(time.monotonic(), slugs[default], slugs, domains)
+
+
+def cached_directory():
+    """The directory if it is still fresh, else None."""
+    directory = _directory
+    if directory is None or time.monotonic() - directory.loaded > settings.PORTFOLIO_TENANTS['CACHE_SECONDS']:
+        return None
+    return directory
+
+
+def get_directory():
+    global _directory
+    directory = cached_directory()
+    if directory is None:
+        directory = _directory = load_directory()
+    return directory
+
+
+def clear_directory(**kwargs):
+    global _directory
+    _directory = None
+
+
+def default_tenant_id():
+    return get_directory().default
+
+
+def current_tenant_id():
+    """The tenant of the current request or activate() block, else the default tenant."""
+    tenant_id = _current.get()
+    return tenant_id if tenant_id is not None else default_tenant_id()
+
+
+def tenant_id_for(slug):
+    try:
+        return get_directory().slugs[slug]
+    except KeyError:
+        raise LookupError(f'Unknown tenant: {slug}') from None
+
+
+@contextmanager
+def activate(tenant_id):
+    """Run the block as `tenant_id`, for commands and background work outside requests."""
+    token = _current.set(tenant_id)
+    try:
+        yield
+    finally:
+        _current.reset(token)
+
+
+class TenantMiddleware:
+    """Pick the request's tenant, strip a /t/<slug>/ prefix and activate it for the rest of the request.
+
+    The prefix moves into the script prefix meanwhile, so reverse() and the
+    router's links keep pointing inside the tenant.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        prefix = self.resolve(request, get_directory())
+        if prefix is None:
+            return HttpResponseNotFound()
+        script_prefix = get_script_prefix()
+        set_script_prefix(script_prefix + prefix)
+        token = _current.set(request.tenant_id)
+        try:
+            return self.get_response(request)
+        finally:
+            _current.reset(token)
+            set_script_prefix(script_prefix)
+
+    async def __acall__(self, request):
+        directory = cached_directory() or await sync_to_async(get_directory)()
+        prefix = self.resolve(request, directory)
+        if prefix is None:
+            return HttpResponseNotFound()
+        script_prefix = get_script_prefix()
+        set_script_prefix(script_prefix + prefix)
+        token = _current.set(request.tenant_id)
+        try:
+            return await self.get_response(request)
+        finally:
+            _current.reset(token)
+            set_script_prefix(script_prefix)
+
+    def resolve(self, request, directory):
+        """Set request.tenant_id and return the stripped path prefix ('' if none), or None for an unknown slug."""
+        marker = f"/{settings.PORTFOLIO_TENANTS['PATH_PREFIX']}/"
+        if request.path_info.startswith(marker):
+            slug, _, rest = request.path_info[len(marker):].partition('/')
+            if slug not in directory.slugs:
+                return None
+            request.tenant_id = directory.slugs[slug]
+            request.path_info = '/' + rest
+            return f'{marker[1:]}{slug}/'
+        domain = split_domain_port(request.get_host())[0]
+        request.tenant_id = directory.domains.get(domain, directory.default)
+        return ''
+
+
+post_save.connect(clear_directory, sender='portfolio.Tenant', dispatch_uid='portfolio.tenants.saved')
+post_delete.connect(clear_directory, sender='portfolio.Tenant', dispatch_uid='portfolio.tenants.deleted')
@@ -1,3 +1,1309 @@
-from django.test import TestCase
+import asyncio
+import hashlib
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from cloudinary import CloudinaryResource
+from django.conf import settings
+from django.contrib.auth.models import Group, User
+from django.core.management import call_command
+from django.http import HttpResponse
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIClient
+
+from . import events, metrics, routers, signals, snapshot, sync, tenants, uploads, views
+from .storage import LocalImageStorage
+from .search import inverted_index
+from .warmup import warm_up
+from .benchmarks import seed
+from .fragments import FragmentCache, fragment_cache
+from .cache import DjangoCacheBackend, MemoryBackend, generation, get_backend, single_flight
+from .models import Education, ImageStatus, ImageUploadJob, Tenant, Tombstone, UploadSession, Work, Portfolio, Skills
+from .tenants import activate, default_tenant_id
+
+
+class PortfolioTestCase(TestCase):
+    client_class = APIClient
+
+    def setUp(self):
+        # Rolled back rows never send content_changed, so start every test cold
+        get_backend().clear()
+        fragment_cache.clear()
+        tenants.clear_directory()
+
+
+class BundleTests(PortfolioTestCase):
+    def setUp(self):
+        super().setUp()
+        Education.objects.create(school='ASU', degree='MS', years='2023', ordinal=1)
+        Work.objects.create(company='Acme', years='2022', description='Things', ordinal=1)
+        Portfolio.objects.create(title='Site', description='Mine', url='https://example.com', ordinal=1)
+        Skills.objects.create(skillName='Python', ordinal=1)
+
+    def test_bundle_matches_individual_endpoints(self):
+        bundle = self.client.get('/bundle/').json()
+        for key in ('education', 'work', 'portfolio', 'skills'):
+            self.assertEqual(bundle[key], self.client.get(f'/{key}/', HTTP_ACCEPT='application/json').json())
+
+    def test_bundle_is_cached_until_content_changes(self):
+        self.client.get('/bundle/')
+        # Only the validators of the sections
+        with self.assertNumQueries(1):
+            self.client.get('/bundle/')
+
+        Skills.objects.create(skillName='Django', ordinal=2)
+        skills = self.client.get('/bundle/').json()['skills']
+        self.assertEqual([s['skillName'] for s in skills], ['Python', 'Django'])
+
+    def test_edits_made_elsewhere_are_seen(self):
+        self.client.get('/bundle/')
+        # As another worker or a shell would, with no signal reaching this process
+        with mock.patch('portfolio.signals.content_changed.send'):
+            Skills.objects.update(skillName='Rust', updated_at=timezone.now())
+            Skills.objects.create(skillName='Go', ordinal=2)
+        skills = self.client.get('/bundle/').json()['skills']
+        self.assertEqual([s['skillName'] for s in skills], ['Rust', 'Go'])
+
+
+class ResponseCacheTests(PortfolioTestCase):
+    def setUp(self):
+        super().setUp()
+        self.skill = Skills.objects.create(skillName='Python', ordinal=1)
+
+    def test_list_and_retrieve_are_cached(self):
+        self.client.get('/skills/', HTTP_ACCEPT='application/json')
+        self.client.get(f'/skills/{self.skill.pk}/', HTTP_ACCEPT='application/json')
+        # Only the conditional-GET validator query is left
+        with self.assertNumQueries(2):
+            self.client.get('/skills/', HTTP_ACCEPT='application/json')
+            self.client.get(f'/skills/{self.skill.pk}/', HTTP_ACCEPT='application/json')
+
+    def test_query_params_are_part_of_the_key(self):
+        self.client.get('/skills/?a=1', HTTP_ACCEPT='application/json')
+        with self.assertNumQueries(2):
+            self.client.get('/skills/?a=2', HTTP_ACCEPT='application/json')
+
+    def test_save_and_delete_invalidate(self):
+        self.client.get('/skills/', HTTP_ACCEPT='application/json')
+        self.skill.skillName = 'Django'
+        self.skill.save()
+        self.assertEqual(self.client.get('/skills/', HTTP_ACCEPT='application/json').json()[0]['skillName'], 'Django')
+        self.skill.delete()
+        self.assertEqual(self.client.get('/skills/', HTTP_ACCEPT='application/json').json(), [])
+
+    def test_other_models_keep_their_entries(self):
+        self.client.get('/skills/', HTTP_ACCEPT='application/json')
+        Education.objects.create(school='ASU', degree='MS', years='2023', ordinal=1)
+        with self.assertNumQueries(1):
+            self.client.get('/skills/', HTTP_ACCEPT='application/json')
+
+    def test_edits_made_elsewhere_invalidate(self):
+        self.client.get('/skills/', HTTP_ACCEPT='application/json')
+        self.client.get(f'/skills/{self.skill.pk}/', HTTP_ACCEPT='application/json')
+        # As another worker or a shell would, with no signal reaching this process
+        with mock.patch('portfolio.signals.content_changed.send'):
+            Skills.objects.update(skillName='Django', updated_at=timezone.now())
+        self.assertEqual(self.client.get('/skills/', HTTP_ACCEPT='application/json').json()[0]['skillName'], 'Django')
+        self.assertEqual(self.client.get(f'/skills/{self.skill.pk}/', HTTP_ACCEPT='application/json').json()['skillName'],
+                         'Django')
+
+    def test_generation_moves_only_once_committed(self):
+        before = generation(Skills)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.skill.save()
+            self.assertEqual(generation(Skills), before)
+        self.assertGreater(generation(Skills), before)
+
+
+class ConditionalGetTests(PortfolioTestCase):
+    def setUp(self):
+        super().setUp()
+        self.work = Work.objects.create(company='Acme', years='2022', description='Things', ordinal=1)
+
+    def test_list_etag_round_trip(self):
+        response = self.client.get('/work/', HTTP_ACCEPT='application/json')
+        self.assertIn('Last-Modified', response)
+        with self.assertNumQueries(1):
+            response = self.client.get('/work/', HTTP_ACCEPT='application/json', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_detail_if_modified_since(self):
+        url = f'/work/{self.work.pk}/'
+        response = self.client.get(url, HTTP_ACCEPT='application/json')
+        response = self.client.get(url, HTTP_ACCEPT='application/json', HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_delete_changes_etag(self):
+        Work.objects.create(company='Other', years='2023', description='More', ordinal=2)
+        etag = self.client.get('/work/', HTTP_ACCEPT='application/json')['ETag']
+        Work.objects.filter(company='Other').delete()
+        response = self.client.get('/work/', HTTP_ACCEPT='application/json', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_query_string_changes_etag(self):
+        first = self.client.get('/work/', HTTP_ACCEPT='application/json')['ETag']
+        self.assertNotEqual(self.client.get('/work/?format=json')['ETag'], first)
+
+    def test_missing_detail_is_404(self):
+        for url in ('/work/999/', '/work/abc/', '/skills/abc/'):
+            self.assertEqual(self.client.get(url, HTTP_ACCEPT='application/json').status_code, 404, url)
+
+
+class FailingStorage:
+    def upload(self, path, folder):
+        raise ConnectionError('storage unavailable')
+
+
+class StagedUploadTestCase(PortfolioTestCase):
+    """Local storage under a temporary MEDIA_ROOT, jobs run on commit."""
+
+    def setUp(self):
+        super().setUp()
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        conf = dict(settings.PORTFOLIO_UPLOADS, EAGER=True, STAGING_DIR=os.path.join(media.name, 'staging'))
+        overrides = override_settings(
+            MEDIA_ROOT=media.name,
+            PORTFOLIO_IMAGE_STORAGE='portfolio.storage.LocalImageStorage',
+            PORTFOLIO_UPLOADS=conf,
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.media = media.name
+        self.education = Education.objects.create(school='ASU', degree='MS', years='2023', ordinal=1)
+
+
+class ImageUploadTests(StagedUploadTestCase):
+    def upload(self):
+        image = SimpleUploadedFile('logo.png', b'not really a png', content_type='image/png')
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.client.patch(f'/education/{self.education.pk}/', {'image': image}, format='multipart')
+        return response, callbacks
+
+    def test_update_returns_before_upload_and_flips_image_when_done(self):
+        response, callbacks = self.upload()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['image_status'], 'pending')
+
+        for callback in callbacks:
+            callback()
+        self.education.refresh_from_db()
+        self.assertEqual(self.education.image_status, ImageStatus.READY)
+        self.assertTrue(str(self.education.image).startswith('education/'))
+        job = ImageUploadJob.objects.get()
+        self.assertEqual(job.status, ImageUploadJob.DONE)
+        self.assertFalse(os.path.exists(job.source))
+        self.assertTrue(os.listdir(os.path.join(self.media, 'images', 'education')))
+        self.assertEqual(self.education.image_url, f'/media/images/{self.education.image.public_id}.png')
+
+    @override_settings(PORTFOLIO_IMAGE_STORAGE='portfolio.tests.FailingStorage')
+    def test_failed_uploads_back_off_then_give_up(self):
+        _, callbacks = self.upload()
+        for callback in callbacks:
+            callback()
+        job = ImageUploadJob.objects.get()
+        self.assertEqual((job.status, job.attempts), (ImageUploadJob.PENDING, 1))
+        self.assertGreater(job.next_attempt_at, job.updated_at)
+
+        for attempt in range(2, settings.PORTFOLIO_UPLOADS['MAX_ATTEMPTS'] + 1):
+            ImageUploadJob.objects.update(next_attempt_at=job.created_at)
+            uploads.process_due_jobs()
+        job.refresh_from_db()
+        self.education.refresh_from_db()
+        self.assertEqual(job.status, ImageUploadJob.FAILED)
+        self.assertEqual(self.education.image_status, ImageStatus.FAILED)
+
+    def test_older_job_does_not_overwrite_newer_upload(self):
+        _, first = self.upload()
+        _, second = self.upload()
+        for callback in second + first:
+            callback()
+        newest = ImageUploadJob.objects.latest('pk')
+        self.education.refresh_from_db()
+        self.assertTrue(self.education.image_url.endswith(newest.public_id))
+
+    def test_backoff_doubles(self):
+        base = settings.PORTFOLIO_UPLOADS['BACKOFF_SECONDS']
+        self.assertEqual([uploads.backoff(n) for n in (1, 2, 3)], [base, base * 2, base * 4])
+
+
+class ChunkedUploadTests(StagedUploadTestCase):
+    data = bytes(range(256)) * 1000
+
+    def open(self, size=None):
+        response = self.client.post(f'/education/{self.education.pk}/image-upload/',
+                                    {'size': size or len(self.data), 'filename': 'photo.PNG'}, format='json')
+        self.assertEqual(response.status_code, 201)
+        return response.json()['url']
+
+    def put(self, url, start, end):
+        return self.client.generic('PUT', url, self.data[start:end], content_type='application/octet-stream',
+                                   HTTP_CONTENT_RANGE=f'bytes {start}-{end - 1}/{len(self.data)}')
+
+    def finalize(self, url, digest=None):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(f'{url}finalize/', {'sha256': digest or hashlib.sha256(self.data).hexdigest()},
+                                    format='json')
+
+    def test_chunks_are_resumable_and_verified(self):
+        url = self.open()
+        self.assertEqual(self.put(url, 0, 100000).json()['offset'], 100000)
+        # A retried or skipped range is refused with the offset to resume from
+        for start in (0, 150000):
+            response = self.put(url, start, start + 1000)
+            self.assertEqual((response.status_code, response.json()['offset']), (409, 100000))
+        self.assertEqual(self.finalize(url).json()['offset'], 100000)
+        self.assertEqual(self.client.get(url).json()['offset'], 100000)
+        self.assertEqual(self.put(url, 100000, len(self.data)).json()['offset'], len(self.data))
+
+        response = self.finalize(url)
+        self.assertEqual(response.status_code, 202)
+        self.education.refresh_from_db()
+        self.assertEqual(self.education.image_status, ImageStatus.READY)
+        with open(os.path.join(self.media, 'images', f'{self.education.image.public_id}.png'), 'rb') as stored:
+            self.assertEqual(stored.read(), self.data)
+        self.assertFalse(UploadSession.objects.exists())
+
+    def test_interrupted_chunk_keeps_what_arrived(self):
+        class Dropped(io.BytesIO):
+            def read(self, size=-1):
+                if self.tell() >= 5000:
+                    raise OSError('connection reset')
+                return super().read(size)
+
+        self.open()
+        session = UploadSession.objects.get()
+        with mock.patch.object(uploads, 'READ_SIZE', 1000):
+            self.assertEqual(uploads.receive_chunk(session, 0, Dropped(self.data), len(self.data)), 5000)
+        session.refresh_from_db()
+        self.assertEqual(session.received, 5000)
+
+    def test_checksum_mismatch_starts_over(self):
+        url = self.open()
+        self.put(url, 0, len(self.data))
+        response = self.finalize(url, '0' * 64)
+        self.assertEqual((response.status_code, response.json()['offset']), (400, 0))
+        self.assertEqual(self.client.get(url).json()['offset'], 0)
+        self.assertFalse(ImageUploadJob.objects.exists())
+
+    def test_rejects_bad_requests(self):
+        self.assertEqual(self.client.post(f'/education/{self.education.pk}/image-upload/', {'size': 10 ** 12},
+                                          format='json').status_code, 400)
+        url = self.open()
+        self.assertEqual(self.client.generic('PUT', url, b'x', HTTP_CONTENT_RANGE='bytes 0-9/10').status_code, 400)
+        self.assertEqual(self.client.generic('PUT', url, b'x').status_code, 400)
+        self.assertEqual(self.client.post(f'{url}finalize/', {'sha256': 'nope'}, format='json').status_code, 400)
+
+    def test_idle_sessions_expire(self):
+        self.open()
+        session = UploadSession.objects.get()
+        UploadSession.objects.update(updated_at=timezone.now() - timedelta(hours=25))
+        uploads.process_due_jobs()
+        self.assertFalse(UploadSession.objects.exists())
+        self.assertFalse(os.path.exists(session.path))
+
+
+class StoredImageUrlTests(PortfolioTestCase):
+    def test_urls_are_computed_on_save(self):
+        work = Work.objects.create(company='Acme', years='2022', description='Things', ordinal=1,
+                                   image='image/upload/v1/work/logo.jpg')
+        cloud = settings.CLOUDINARY_STORAGE['CLOUD_NAME']
+        self.assertEqual(work.image_url, f'https://res.cloudinary.com/{cloud}/image/upload/v1/work/logo.jpg')
+        variants = work.image_srcset.split(', ')
+        self.assertEqual([v.rsplit(' ', 1)[1] for v in variants], ['320w', '640w', '1280w'])
+        self.assertIn('/c_limit,f_auto,q_auto,w_320/', variants[0])
+
+        work.image = 'work/other'
+        work.save(update_fields=['image'])
+        work.refresh_from_db()
+        self.assertTrue(work.image_url.endswith('/work/other'))
+
+        work.image = None
+        work.save()
+        self.assertEqual((work.image_url, work.image_srcset), (None, None))
+
+    def test_refresh_command_moves_updated_at_and_announces_changes(self):
+        work = Work.objects.create(company='Acme', years='2022', description='Things', ordinal=1,
+                                   image='image/upload/v1/work/logo.jpg')
+        untouched = Work.objects.create(company='Other', years='2021', description='Stuff', ordinal=2)
+        stale = timezone.now() - timedelta(days=1)
+        Work.objects.filter(pk=work.pk).update(image_srcset='', updated_at=stale)
+        Work.objects.filter(pk=untouched.pk).update(updated_at=stale)
+        received = []
+        receiver = lambda sender, **kwargs: received.append((sender, kwargs['pks']))
+        signals.content_changed.connect(receiver)
+        self.addCleanup(signals.content_changed.disconnect, receiver)
+
+        call_command('refresh_image_urls', stdout=io.StringIO())
+        work.refresh_from_db()
+        untouched.refresh_from_db()
+        self.assertIn('320w', work.image_srcset)
+        self.assertGreater(work.updated_at, stale)
+        self.assertEqual(untouched.updated_at, stale)
+        self.assertEqual(received, [(Work, [work.pk])])
+
+    def test_saving_an_uploaded_file_announces_the_final_urls(self):
+        resource = CloudinaryResource('work/logo', format='png', type='upload', resource_type='image')
+        received = []
+        receiver = lambda sender, **kwargs: received.append(Work.objects.get(pk=kwargs['pks'][0]).image_url)
+        signals.content_changed.connect(receiver, sender=Work)
+        self.addCleanup(signals.content_changed.disconnect, receiver)
+
+        with mock.patch('cloudinary.uploader.upload_resource', return_value=resource):
+            work = Work.objects.create(company='Acme', years='2022', description='Things', ordinal=1,
+                                       image=SimpleUploadedFile('logo.png', b'png', content_type='image/png'))
+        # The last word comes after the URLs were rewritten for the uploaded resource
+        self.assertEqual(received[-1], work.image_url)
+        self.assertTrue(work.image_url.endswith('/work/logo.png'))
+
+    def test_list_reads_urls_without_building_them(self):
+        Portfolio.objects.create(title='Site', description='Mine', url='https://example.com', ordinal=1,
+                                 image='image/upload/v1/portfolio/shot.png')
+        with mock.patch('cloudinary.CloudinaryResource.build_url') as build_url:
+            data = self.client.get('/portfolio/', HTTP_ACCEPT='application/json').json()
+        build_url.assert_not_called()
+        self.assertTrue(data[0]['image_url'].startswith('https://'))
+        self.assertIn('1280w', data[0]['image_srcset'])
+
+
+class ValuesListTests(PortfolioTestCase):
+    def setUp(self):
+        super().setUp()
+        Education.objects.create(school='ASU', degree='MS', years='2023', ordinal=1, image='image/upload/v1/education/asu.png')
+        Education.objects.create(school='Ünï "quoted"', degree='', years='2019', ordinal=2)
+        Education.objects.filter(ordinal=2).update(image_url='')
+        Work.objects.create(company='Acme', years='2022', description='Line\nbreak', ordinal=1)
+        Portfolio.objects.create(title='Site', description='Mine', url='https://example.com', ordinal=1,
+                                 image='image/upload/v1/portfolio/shot.png', image_status=ImageStatus.PENDING)
+        Skills.objects.create(skillName='Python', ordinal=1)
+
+    def serialized(self, viewset, query=''):
+        request = Request(RequestFactory().get(f'/x/?{query}'))
+        context = {'request': request, 'sparse_fieldsets': True}
+        serializer = viewset.serializer_class(viewset.queryset.all(), many=True, context=context)
+        return JSONRenderer().render(serializer.data)
+
+    def test_lists_are_byte_identical_to_the_serializers(self):
+        for route, viewset in (('education', views.EducationViewSet), ('work', views.WorkViewSet),
+                               ('portfolio', views.PortfolioViewSet), ('skills', views.SkillViewSet)):
+            for query in ('', 'fields=id,image', 'omit=image_url'):
+                if route == 'skills' and query:
+                    continue
+                with self.subTest(route=route, query=query):
+                    response = self.client.get(f'/{route}/?{query}', HTTP_ACCEPT='application/json')
+                    self.assertEqual(response.content, self.serialized(viewset, query))
+
+    def test_no_model_instances_are_built(self):
+        with mock.patch.object(Education, 'from_db') as from_db:
+            self.client.get('/education/', HTTP_ACCEPT='application/json')
+        from_db.assert_not_called()
+
+
+class FragmentCacheTests(PortfolioTestCase):
+    def setUp(self):
+        super().setUp()
+        self.works = [Work.objects.create(company=f'Company {i}', years='2022', description='Things', ordinal=i) for i in range(4)]
+
+    def get(self, query=''):
+        return self.client.get(f'/work/{query}', HTTP_ACCEPT='application/json')
+
+    def test_only_edited_rows_are_serialized_again(self):
+        self.get()
+        self.assertEqual(fragment_cache.stats()['entries'], 4)
+        self.works[1].description = 'Edited'
+        self.works[1].save()
+        self.works[3].delete()
+        before = fragment_cache.stats()
+        with self.assertNumQueries(3):  # aggregate for the ETag, versions, the one edited row
+            body = self.get().content
+        after = fragment_cache.stats()
+        self.assertEqual((after['hits'] - before['hits'], after['misses'] - before['misses']), (2, 1))
+
+        fragment_cache.clear()
+        get_backend().clear()
+        self.assertEqual(body, self.get().content)
+        self.assertEqual([w['description'] for w in json.loads(body)], ['Things', 'Edited', 'Things'])
+
+    def test_field_selections_are_cached_apart(self):
+        self.get()
+        self.assertEqual(list(self.get('?fields=id,company').json()[0]), ['id', 'company'])
+        self.assertEqual(fragment_cache.stats()['entries'], 8)
+
+    def test_least_recently_used_rows_are_evicted(self):
+        cache = FragmentCache(max_entries=2)
+        cache.set_many({'a': 1, 'b': 2})
+        cache.get('a')
+        cache.set('c', 3)
+        self.assertEqual(cache.get_many(['a', 'b', 'c']), {'a': 1, 'c': 3})
+        self.assertEqual(cache.stats(), {'hits': 3, 'misses': 1, 'evictions': 1, 'entries': 2})
+
+    def test_counters_are_exported(self):
+        self.get()
+        self.get('?fields=id')
+        body = self.client.get('/metrics/').content.decode()
+        self.assertIn('portfolio_fragment_cache_entries 8', body)
+        self.assertIn('# TYPE portfolio_fragment_cache_hits_total counter', body)
+
+
+class KeysetPaginationTests(PortfolioTestCase):
+    def setUp(self):
+        super().setUp()
+        # Duplicate ordinals are tie-broken by id
+        for i, ordinal in enumerate([3, 1, 2, 2, 5]):
+            Skills.objects.create(skillName=f'skill-{i}', ordinal=ordinal)
+
+    def walk(self, url):
+        pages = []
+        while url:
+            page = self.client.get(url, HTTP_ACCEPT='application/json').json()
+            pages.append([row['skillName'] for row in page['results']])
+            url = page['next']
+        return pages
+
+    def test_pages_follow_ordinal_then_id(self):
+        self.assertEqual(self.walk('/skills/?limit=2'), [['skill-1', 'skill-2'], ['skill-3', 'skill-0'], ['skill-4']])
+
+    def test_rows_added_before_the_cursor_do_not_shift_later_pages(self):
+        first = self.client.get('/skills/?limit=2', HTTP_ACCEPT='application/json').json()
+        # With offset pagination this would push skill-2 onto the next page again
+        Skills.objects.create(skillName='new', ordinal=0)
+        rest = sum(self.walk(first['next']), [])
+        self.assertEqual(rest, ['skill-3', 'skill-0', 'skill-4'])
+
+    def test_rows_that_stay_put_are_served_once_while_others_move(self):
+        first = self.client.get('/skills/?limit=2', HTTP_ACCEPT='application/json').json()
+        # One row moves from behind the cursor to ahead of it, one the other way
+        Skills.objects.filter(skillName='skill-4').update(ordinal=0)
+        Skills.objects.filter(skillName='skill-1').update(ordinal=10)
+        rest = sum(self.walk(first['next']), [])
+        self.assertEqual(rest, ['skill-3', 'skill-0', 'skill-1'])
+
+    def test_unpaginated_without_params(self):
+        self.assertEqual(len(self.client.get('/skills/', HTTP_ACCEPT='application/json').json()), 5)
+
+    def test_bad_cursor(self):
+        self.assertEqual(self.client.get('/skills/?cursor=nope', HTTP_ACCEPT='application/json').status_code, 404)
+
+
+class SparseFieldsetTests(PortfolioTestCase):
+    def setUp(self):
+        super().setUp()
+        Portfolio.objects.create(title='Site', description='A long write-up', url='https://example.com', ordinal=1)
+
+    def test_fields_narrow_output_and_sql(self):
+        with CaptureQueriesContext(connection) as captured:
+            data = self.client.get('/portfolio/?fields=id,title', HTTP_ACCEPT='application/json').json()
+        self.assertEqual(data, [{'id': data[0]['id'], 'title': 'Site'}])
+        select = [q['sql'] for q in captured if 'ORDER BY' in q['sql']][0]
+        self.assertNotIn('description', select)
+
+    def test_omit(self):
+        data = self.client.get('/portfolio/?omit=description,image_srcset', HTTP_ACCEPT='application/json').json()
+        self.assertNotIn('description', data[0])
+        self.assertIn('title', data[0])
+
+    def test_unknown_field_is_rejected(self):
+        response = self.client.get('/portfolio/?fields=nope', HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_bundle_and_changes_ignore_sparse_params(self):
+        self.client.get('/bundle/?omit=id')
+        self.assertIn('id', self.client.get('/bundle/').json()['portfolio'][0])
+        self.client.get('/bundle/?fields=title')
+        self.assertIn('description', self.client.get('/bundle/').json()['portfolio'][0])
+        self.assertIn('id', self.client.get('/changes/?omit=id').json()['changed']['portfolio'][0])
+
+
+class BulkUpdateTests(PortfolioTestCase):
+    def setUp(self):
+        super().setUp()
+        self.rows = [
+            Work.objects.create(company=name, years='2022', description='Things', ordinal=i)
+            for i, name in enumerate(['a', 'b', 'c'], start=1)
+        ]
+
+    def bulk(self, items):
+        return self.client.patch('/work/bulk/', items, format='json')
+
+    def test_reorder_in_one_update(self):
+        a, b, c = self.rows
+        self.client.get('/work/', HTTP_ACCEPT='application/json')
+        with CaptureQueriesContext(connection) as captured:
+            response = self.bulk([{'id': c.pk, 'ordinal': 1}, {'id': a.pk, 'ordinal': 3, 'years': '2020'}])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['id'] for row in response.json()], [c.pk, b.pk, a.pk])
+        self.assertEqual(sum(q['sql'].startswith('UPDATE') for q in captured), 1)
+
+        a.refresh_from_db()
+        self.assertEqual((a.ordinal, a.years), (3, '2020'))
+        listed = self.client.get('/work/', HTTP_ACCEPT='application/json').json()
+        self.assertEqual([row['company'] for row in listed], ['c', 'b', 'a'])
+
+    def test_duplicate_ordinals_are_rejected(self):
+        a, b, c = self.rows
+        self.assertEqual(self.bulk([{'id': a.pk, 'ordinal': 2}]).status_code, 400)
+        self.assertEqual(self.bulk([{'id': a.pk, 'ordinal': 9}, {'id': b.pk, 'ordinal': 9}]).status_code, 400)
+        a.refresh_from_db()
+        self.assertEqual(a.ordinal, 1)
+
+    def test_invalid_items_roll_back_everything(self):
+        a, b, _ = self.rows
+        response = self.bulk([{'id': a.pk, 'ordinal': 7}, {'id': b.pk, 'ordinal': 'x'}])
+        self.assertEqual(response.status_code, 400)
+        self.assertIn(str(b.pk), response.json())
+        self.assertEqual(self.bulk([{'id': 999, 'ordinal': 1}]).status_code, 400)
+        self.assertEqual(self.bulk({'id': a.pk}).status_code, 400)
+        response = self.bulk([{'id': a.pk, 'ordinal': 5}, {'id': 'x'}, {'id': [1]}])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.json()), {'1', '2'})
+        a.refresh_from_db()
+        self.assertEqual(a.ordinal, 1)
+
+
+class ImportExportTests(PortfolioTestCase):
+    def setUp(self):
+        super().setUp()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.storage = LocalImageStorage(os.path.join(self.tmp.name, 'media'))
+        source = os.path.join(self.tmp.name, 'logo.png')
+        with open(source, 'wb') as f:
+            f.write(b'png bytes')
+
+        Skills.objects.create(skillName='Python', ordinal=1)
+        Work.objects.create(company='Acme', years='2022', description='Things', ordinal=1,
+                            image=self.storage.upload(source, 'work'))
+        Portfolio.objects.create(title='Site', description='Mine', url='https://example.com', ordinal=1)
+
+    def run_command(self, name, path, fmt):
+        out = io.StringIO()
+        with mock.patch('portfolio.management.commands.%s.LocalImageStorage' % name, return_value=self.storage):
+            call_command(name, path, format=fmt, local=True, stdout=out)
+        return out.getvalue()
+
+    def test_round_trip(self):
+        for fmt in ('json', 'csv'):
+            with self.subTest(fmt=fmt):
+                path = os.path.join(self.tmp.name, fmt)
+                self.run_command('export_content', path, fmt)
+                self.assertTrue(os.listdir(os.path.join(path, 'images', 'work')))
+
+                Work.objects.all().delete()
+                Skills.objects.filter(skillName='Python').update(ordinal=5)
+                Portfolio.objects.update(years='2020')
+                output = self.run_command('import_content', path, fmt)
+                self.assertIn('rows/s', output)
+
+                work = Work.objects.get()
+                self.assertEqual((work.company, work.ordinal), ('Acme', 1))
+                self.assertTrue(work.image_url.endswith('.png'))
+                self.assertEqual(Skills.objects.get().ordinal, 1)
+                self.assertIsNone(Portfolio.objects.get().years)
+
+    def test_import_is_idempotent(self):
+        path = os.path.join(self.tmp.name, 'export')
+        self.run_command('export_content', path, 'json')
+        with mock.patch.object(self.storage, 'upload') as upload:
+            self.run_command('import_content', path, 'json')
+            self.run_command('import_content', path, 'json')
+        upload.assert_not_called()
+        self.assertEqual((Work.objects.count(), Skills.objects.count(), Portfolio.objects.count()), (1, 1, 1))
+
+    def test_creates_and_updates_are_announced_as_such(self):
+        path = os.path.join(self.tmp.name, 'export')
+        self.run_command('export_content', path, 'json')
+        Work.objects.all().delete()
+        skill = Skills.objects.get()
+        Skills.objects.update(ordinal=5)
+        received = []
+        receiver = lambda sender, **kwargs: received.append((sender, kwargs['op'], kwargs['pks']))
+        signals.content_changed.connect(receiver)
+        self.addCleanup(signals.content_changed.disconnect, receiver)
+
+        self.run_command('import_content', path, 'json')
+        self.assertCountEqual(received, [(Work, 'create', [Work.objects.get().pk]), (Skills, 'update', [skill.pk])])
+
+    def test_uploads_are_concurrent_and_rows_bulk_created(self):
+        path = os.path.join(self.tmp.name, 'export')
+        self.run_command('export_content', path, 'json')
+        with open(os.path.join(path, 'content.json')) as f:
+            data = json.load(f)
+        image = data['work'][0]['image']
+        data['work'] = [dict(data['work'][0], company=f'Co {i}', image=image) for i in range(20)]
+        with open(os.path.join(path, 'content.json'), 'w') as f:
+            json.dump(data, f)
+        with CaptureQueriesContext(connection) as captured:
+            self.run_command('import_content', path, 'json')
+        self.assertEqual(Work.objects.count(), 21)
+        self.assertEqual(Work.objects.filter(company__startswith='Co ', image_url__endswith='.png').count(), 20)
+        inserts = [q for q in captured if q['sql'].startswith('INSERT INTO "portfolio_work"')]
+        self.assertEqual(len(inserts), 1)
+
+
+@override_settings(DB_READ_AFTER_WRITE_SECONDS=5)
+class ReplicaRoutingTests(SimpleTestCase):
+    def setUp(self):
+        routers._last_write = 0.0
+        self.router = routers.ReplicaRouter()
+        patcher = mock.patch('portfolio.routers.replica_configured', return_value=True)
+        self.replica_configured = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def route(self, request):
+        seen = {}
+
+        def get_response(request):
+            seen['db'] = self.router.db_for_read(Skills)
+            return HttpResponse()
+
+        response = routers.ReplicaRoutingMiddleware(get_response)(request)
+        self.assertEqual(self.router.db_for_read(Skills), 'default')
+        return seen['db'], response
+
+    def test_safe_requests_read_from_replica(self):
+        self.assertEqual(self.route(RequestFactory().get('/skills/'))[0], 'replica')
+
+    def test_writes_use_primary_and_pin_the_client(self):
+        db, response = self.route(RequestFactory().post('/skills/'))
+        self.assertEqual(db, 'default')
+        self.assertEqual(self.router.db_for_write(Skills), 'default')
+
+        request = RequestFactory().get('/skills/')
+        request.COOKIES[routers.PIN_COOKIE] = response.cookies[routers.PIN_COOKIE].value
+        self.assertEqual(self.route(request)[0], 'default')
+
+    def test_recent_content_change_keeps_reads_on_primary(self):
+        routers.record_write()
+        self.assertEqual(self.route(RequestFactory().get('/skills/'))[0], 'default')
+
+    def test_other_apps_and_missing_replica_use_primary(self):
+        self.assertEqual(self.route(RequestFactory().get('/admin/'))[0], 'default')
+        self.replica_configured.return_value = False
+        self.assertEqual(self.route(RequestFactory().get('/skills/'))[0], 'default')
+
+
+@override_settings(ROOT_URLCONF='portfolio.async_urls')
+class AsyncReadTests(PortfolioTestCase):
+    def setUp(self):
+        super().setUp()
+        self.portfolio = Portfolio.objects.create(title='Site', description='Mine', url='https://example.com',
+                                                  ordinal=1, image='image/upload/v1/portfolio/shot.png')
+        Portfolio.objects.create(title='Other', description='Yours', url='https://example.org', ordinal=2)
+
+    async def test_matches_the_drf_views(self):
+        for url in ('/portfolio/', f'/portfolio/{self.portfolio.pk}/', '/portfolio/?fields=id,title'):
+            with override_settings(ROOT_URLCONF='portfolio.urls'):
+                expected = (await self.async_client.get(url, headers={'Accept': 'application/json'})).json()
+            with mock.patch.dict('portfolio.async_views._fallbacks', clear=True):
+                response = await self.async_client.get(url, headers={'Accept': 'application/json'})
+            self.assertEqual(response.json(), expected)
+            self.assertIn('ETag', response)
+
+    async def test_conditional_and_errors(self):
+        response = await self.async_client.get('/portfolio/')
+        again = await self.async_client.get('/portfolio/', headers={'If-None-Match': response['ETag']})
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual((await self.async_client.get('/portfolio/999/')).status_code, 404)
+        self.assertEqual((await self.async_client.get('/portfolio/?fields=nope')).status_code, 400)
+
+    async def test_other_requests_fall_back_to_drf(self):
+        page = (await self.async_client.get('/portfolio/?limit=1')).json()
+        self.assertEqual(len(page['results']), 1)
+        response = await self.async_client.patch(f'/portfolio/{self.portfolio.pk}/', 'title=New',
+                                                 content_type='application/x-www-form-urlencoded')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((await self.async_client.get(f'/portfolio/{self.portfolio.pk}/')).json()['title'], 'New')
+        self.assertEqual((await self.async_client.get('/bundle/')).status_code, 200)
+
+
+class QueryCountTests(PortfolioTestCase):
+    """Exact queries per endpoint on a cold cache, the same for 2 rows and for 12, so N+1s fail here."""
+    expected = {
+        ('get', '/users/'): 2,
+        ('get', '/users/{user}/'): 2,
+        ('get', '/education/'): 2,
+        ('get', '/education/{education}/'): 2,
+        ('patch', '/education/{education}/'): 2,
+        ('get', '/work/'): 2,
+        ('get', '/portfolio/'): 2,
+        ('get', '/skills/'): 2,
+        ('get', '/skills/{skills}/'): 2,
+        ('patch', '/skills/{skills}/'): 2,
+        ('get', '/bundle/'): 5,
+        ('get', '/search/?q=item'): 7,
+    }
+
+    def seed(self, rows):
+        group = Group.objects.create(name=f'group{rows}')
+        for i in range(rows):
+            User.objects.create(username=f'user{rows}-{i}').groups.add(group)
+            Education.objects.create(school=f'School item {i}', degree='BS', years='2020', ordinal=i)
+            Work.objects.create(company=f'Company item {i}', years='2020', description='Things', ordinal=i)
+            Portfolio.objects.create(title=f'Site {i}', description='Mine', url='https://example.com', ordinal=i)
+            Skills.objects.create(skillName=f'Skill {i}', ordinal=i)
+        return {'user': User.objects.last().pk, 'education': Education.objects.last().pk, 'skills': Skills.objects.last().pk}
+
+    def test_query_counts_do_not_grow_with_rows(self):
+        self.client.force_authenticate(User.objects.create_superuser('admin'))
+        for rows in (2, 12):
+            ids = self.seed(rows)
+            for (method, url), count in self.expected.items():
+                get_backend().clear()
+                fragment_cache.clear()
+                inverted_index.clear()
+                with self.subTest(rows=rows, url=url, method=method), self.assertNumQueries(count):
+                    data = {'ordinal': 100 + rows} if method == 'patch' else None
+                    response = getattr(self.client, method)(url.format(**ids), data, HTTP_ACCEPT='application/json')
+                    self.assertEqual(response.status_code, 200)
+
+
+class UserDirectoryTests(PortfolioTestCase):
+    def setUp(self):
+        super().setUp()
+        joined = timezone.now()
+        for i, name in enumerate(['alice', 'alfred', 'bob', 'albert', 'carol']):
+            User.objects.create(username=name, date_joined=joined - timedelta(days=i))
+
+    def test_users_are_paged_newest_first_without_repeats(self):
+        names, url = [], '/users/?limit=2'
+        while url:
+            body = self.client.get(url).json()
+            names += [user['username'] for user in body['results']]
+            url = body['next']
+        self.assertEqual(names, ['alice', 'alfred', 'bob', 'albert', 'carol'])
+        self.assertEqual(len(self.client.get('/users/').json()['results']), 5)
+
+    def test_cursor_keeps_microseconds(self):
+        joined = timezone.now().replace(microsecond=500000)
+        for i in range(3):
+            User.objects.create(username=f'u{i}', date_joined=joined - timedelta(microseconds=100 * i))
+        names, url = [], '/users/?limit=1&username=u'
+        while url:
+            body = self.client.get(url).json()
+            names += [user['username'] for user in body['results']]
+            url = body['next']
+        self.assertEqual(names, ['u0', 'u1', 'u2'])
+
+    def test_username_prefix(self):
+        body = self.client.get('/users/?username=al').json()
+        self.assertEqual([user['username'] for user in body['results']], ['alice', 'alfred', 'albert'])
+        self.assertEqual(self.client.get('/users/?username=Al').json()['results'], [])
+
+    def test_counts(self):
+        self.assertNotIn('count', self.client.get('/users/').json())
+        self.assertEqual(self.client.get('/users/?username=al&count=exact&limit=1').json()['count'], 3)
+        self.assertEqual(self.client.get('/users/?count=approx').json()['count'], 5)
+        with mock.patch('portfolio.pagination.ESTIMATE_CAP', 2):
+            self.assertEqual(self.client.get('/users/?count=approx').json()['count'], 2)
+        self.assertEqual(self.client.get('/users/?count=all').status_code, 400)
+
+    def test_index_serves_the_page_query(self):
+        queryset = User.objects.order_by('-date_joined', '-id')[:51]
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            plan = ' '.join(str(row) for row in cursor.fetchall())
+        self.assertIn('portfolio_user_joined', plan)
+
+
+class QueryPlanTests(PortfolioTestCase):
+    """Every list query must walk an ordering index, not scan and sort the table."""
+    urls = ['/education/', '/work/', '/portfolio/', '/skills/', '/skills/?limit=50',
+            '/skills/?limit=2&cursor=WzEwMDAsMTAwMF0', '/education/?fields=id,school', '/users/']
+
+    @classmethod
+    def setUpTestData(cls):
+        seed(2000, users=2000)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def plan(self, sql):
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute(f'EXPLAIN {sql}')
+            else:
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            return '\n'.join(str(row[-1]) for row in cursor.fetchall())
+
+    def test_list_queries_use_an_index(self):
+        for url in self.urls:
+            with self.subTest(url=url), CaptureQueriesContext(connection) as captured:
+                self.assertEqual(self.client.get(url, HTTP_ACCEPT='application/json').status_code, 200)
+                sql = next(q['sql'] for q in captured.captured_queries if 'ORDER BY' in q['sql'])
+                plan = self.plan(sql)
+                self.assertNotIn('TEMP B-TREE FOR ORDER BY', plan)
+                self.assertFalse('Seq Scan' in plan and 'Sort' in plan, plan)
+
+
+class StreamingListTests(PortfolioTestCase):
+    def setUp(self):
+        super().setUp()
+        for i in range(5):
+            Skills.objects.create(skillName=f'Skill {i}', ordinal=i)
+
+    def test_json_stream_matches_regular_list(self):
+        response = self.client.get('/skills/?stream=json&fields=id,skillName')
+        self.assertTrue(response.streaming)
+        regular = self.client.get('/skills/?fields=id,skillName', HTTP_ACCEPT='application/json')
+        self.assertEqual(b''.join(response.streaming_content), regular.content)
+
+    def test_ndjson_stream_reads_in_chunks(self):
+        with mock.patch('portfolio.views.SkillViewSet.stream_chunk_size', 2), CaptureQueriesContext(connection) as queries:
+            body = b''.join(self.client.get('/skills/?stream=ndjson').streaming_content)
+        self.assertEqual([json.loads(line)['ordinal'] for line in body.splitlines()], [0, 1, 2, 3, 4])
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(self.client.get('/skills/?stream=csv').status_code, 400)
+
+    def test_user_stream_prefetches_groups(self):
+        group = Group.objects.create(name='editors')
+        for i in range(3):
+            User.objects.create(username=f'user{i}').groups.add(group)
+        with self.assertNumQueries(2):
+            rows = json.loads(b''.join(self.client.get('/users/?stream=json').streaming_content))
+        self.assertEqual([row['groups'] for row in rows], [[group.pk]] * 3)
+
+
+@override_settings(ROOT_URLCONF='portfolio.async_urls', PORTFOLIO_EVENTS=dict(settings.PORTFOLIO_EVENTS, KEEPALIVE=0.05))
+class EventStreamTests(PortfolioTestCase):
+    def setUp(self):
+        super().setUp()
+        self.broker = events.MemoryBroker(queue_size=3, history=5)
+        patcher = mock.patch('portfolio.events._broker', self.broker)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def read(self, body, chunks):
+        return ''.join([await anext(body) for _ in range(chunks)])
+
+    async def test_stream_receives_published_changes(self):
+        response = await self.async_client.get('/events/')
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        body = aiter(response.streaming_content)
+        self.assertEqual(await anext(body), b'retry: 3000\n\n')
+        self.assertEqual(len(self.broker._subscribers), 1)
+        await asyncio.to_thread(self.broker.publish, {'model': 'skills', 'ids': [1], 'op': 'update', 'version': 2})
+        self.assertEqual(await anext(body), b'id: 1\ndata: {"model":"skills","ids":[1],"op":"update","version":2}\n\n')
+        self.assertEqual(await anext(body), b': keepalive\n\n')
+        await body.aclose()
+
+    async def test_resume_and_reset(self):
+        for i in range(7):
+            self.broker.publish({'model': 'work', 'ids': [i], 'op': 'delete', 'version': i})
+        stream = events.stream(last_id=5)
+        self.assertIn('id: 6', await self.read(stream, 3))
+        await stream.aclose()
+        # Event 1 has dropped out of the history, and id 99 was never issued here
+        for last_id in (1, 99):
+            stream = events.stream(last_id=last_id)
+            self.assertEqual(await self.read(stream, 2), 'retry: 3000\n\ndata: {"op":"reset"}\n\n')
+            await stream.aclose()
+
+    async def test_slow_client_gets_a_reset(self):
+        stream = events.stream()
+        await anext(stream)
+        for i in range(5):
+            self.broker.publish({'model': 'work', 'ids': [i], 'op': 'update', 'version': i})
+        await asyncio.sleep(0)
+        self.assertEqual(await anext(stream), 'data: {"op":"reset"}\n\n')
+        await stream.aclose()
+        self.assertEqual(self.broker._subscribers, {})
+
+    def test_committed_changes_are_published(self):
+        with mock.patch.object(self.broker, 'publish') as publish:
+            with self.captureOnCommitCallbacks(execute=True):
+                skill = Skills.objects.create(skillName='Go', ordinal=1)
+            publish.assert_called_once_with({'model': 'skills', 'ids': [skill.pk], 'op': 'create',
+                                             'version': generation(Skills), 'tenant': default_tenant_id()})
+        self.assertEqual(self.client.post('/events/').status_code, 405)
+
+    async def test_file_broker_fans_out_across_processes(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'events.log')
+            publisher, listener = events.FileBroker(path), events.FileBroker(path, poll_interval=0.01)
+            queue = listener.subscribe()
+            await asyncio.to_thread(publisher.publish, {'model': 'education', 'ids': [3], 'op': 'delete', 'version': 1})
+            event = await asyncio.wait_for(queue.get(), 5)
+            self.assertEqual((event['ids'], event['id']), ([3], os.path.getsize(path)))
+
+
+@override_settings(PORTFOLIO_SYNC={'OVERLAP_SECONDS': 0, 'TOMBSTONE_DAYS': 30})
+class ChangesTests(PortfolioTestCase):
+    def setUp(self):
+        super().setUp()
+        self.work = Work.objects.create(company='Acme', years='2022', description='Things', ordinal=1)
+        self.skill = Skills.objects.create(skillName='Python', ordinal=1)
+        Skills.objects.create(skillName='Django', ordinal=2)
+
+    def test_full_reset_without_token(self):
+        body = self.client.get('/changes/').json()
+        self.assertTrue(body['reset'])
+        self.assertEqual([s['skillName'] for s in body['changed']['skills']], ['Python', 'Django'])
+        self.assertEqual(body['deleted'], {'education': [], 'work': [], 'portfolio': [], 'skills': []})
+
+    def test_only_changes_after_the_token(self):
+        token = self.client.get('/changes/').json()['token']
+        body = self.client.get(f'/changes/?since={token}').json()
+        self.assertFalse(body['reset'])
+        self.assertEqual(body['changed'], {'education': [], 'work': [], 'portfolio': [], 'skills': []})
+
+        self.skill.skillName = 'Python 3'
+        self.skill.save()
+        work_pk = self.work.pk
+        self.work.delete()
+        with self.assertNumQueries(5):
+            body = self.client.get(f'/changes/?since={token}').json()
+        self.assertEqual([s['skillName'] for s in body['changed']['skills']], ['Python 3'])
+        self.assertEqual(body['deleted']['work'], [work_pk])
+        self.assertEqual(self.client.get(f"/changes/?since={body['token']}").json()['deleted']['work'], [])
+
+    def test_expired_or_bad_token(self):
+        old = sync.encode_token(timezone.now() - timedelta(days=31))
+        self.assertTrue(self.client.get(f'/changes/?since={old}').json()['reset'])
+        self.assertEqual(self.client.get('/changes/?since=nonsense').status_code, 400)
+
+    def test_old_tombstones_are_pruned(self):
+        Tombstone.objects.create(model='portfolio.work', object_id=99, deleted_at=timezone.now() - timedelta(days=40))
+        pk = self.work.pk
+        self.work.delete()
+        self.assertEqual(list(Tombstone.objects.values_list('object_id', flat=True)), [pk])
+
+
+@override_settings(ALLOWED_HOSTS=['testserver', '.example'])
+class TenantTests(PortfolioTestCase):
+    def setUp(self):
+        super().setUp()
+        self.acme = Tenant.objects.create(slug='acme', name='Acme', domain='acme.example')
+        Skills.objects.create(skillName='Python', ordinal=1)
+        with activate(self.acme.pk):
+            self.skill = Skills.objects.create(skillName='Rust', ordinal=1)
+            Education.objects.create(school='MIT', degree='BS', years='2020', ordinal=1)
+
+    def names(self, url, **extra):
+        return [s['skillName'] for s in self.client.get(url, HTTP_ACCEPT='application/json', **extra).json()]
+
+    def test_tenant_from_path_or_host(self):
+        self.assertEqual(self.names('/skills/'), ['Python'])
+        self.assertEqual(self.names('/t/acme/skills/'), ['Rust'])
+        self.assertEqual(self.names('/skills/', HTTP_HOST='acme.example'), ['Rust'])
+        self.assertEqual(self.names('/skills/', HTTP_HOST='other.example'), ['Python'])
+        self.assertEqual(self.client.get('/t/nobody/skills/').status_code, 404)
+        self.assertEqual(self.client.get(f'/skills/{self.skill.pk}/').status_code, 404)
+        # Links stay inside the tenant
+        self.assertEqual(self.client.get('/t/acme/', HTTP_ACCEPT='application/json').json()['skills'],
+                         'http://testserver/t/acme/skills/')
+        self.assertEqual(self.client.get('/skills/', HTTP_ACCEPT='application/json').status_code, 200)
+
+    async def test_async_reads_are_scoped(self):
+        with override_settings(ROOT_URLCONF='portfolio.async_urls'), \
+                mock.patch.dict('portfolio.async_views._fallbacks', clear=True):
+            for url, expected in (('/skills/', ['Python']), ('/t/acme/skills/', ['Rust'])):
+                response = await self.async_client.get(url, headers={'Accept': 'application/json'})
+                self.assertEqual([s['skillName'] for s in response.json()], expected)
+            response = await self.async_client.get(f'/skills/{self.skill.pk}/', headers={'Accept': 'application/json'})
+            self.assertEqual(response.status_code, 404)
+
+    def test_writes_belong_to_the_tenant(self):
+        self.client.force_authenticate(User.objects.create_superuser('admin'))
+        response = self.client.post('/t/acme/skills/', {'skillName': 'Go', 'ordinal': 2}, format='json')
+        self.assertEqual(Skills.objects.get(pk=response.json()['id']).tenant, self.acme)
+        # Ordinals only have to be unique within the tenant
+        response = self.client.patch('/skills/bulk/', [{'id': Skills.objects.get(skillName='Python').pk, 'ordinal': 2}],
+                                     format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.patch('/t/acme/skills/bulk/', [{'id': self.skill.pk, 'ordinal': 2}],
+                                           format='json').status_code, 400)
+
+    def test_edits_only_invalidate_their_own_tenant(self):
+        for url in ('/bundle/', '/t/acme/bundle/'):
+            self.client.get(url)
+        default_generation = generation(Skills)
+        self.skill.skillName = 'Rust 2024'
+        self.skill.save()
+        self.assertEqual(generation(Skills), default_generation)
+        with self.assertNumQueries(1):
+            self.assertEqual([s['skillName'] for s in self.client.get('/bundle/').json()['skills']], ['Python'])
+        self.assertEqual([s['skillName'] for s in self.client.get('/t/acme/bundle/').json()['skills']], ['Rust 2024'])
+
+        pk = self.skill.pk
+        self.skill.delete()
+        self.assertEqual(self.client.get('/changes/').json()['changed']['education'], [])
+        token = sync.encode_token(timezone.now() - timedelta(minutes=1))
+        self.assertEqual(self.client.get(f'/changes/?since={token}').json()['deleted']['skills'], [])
+        self.assertEqual(self.client.get(f'/t/acme/changes/?since={token}').json()['deleted']['skills'], [pk])
+
+    def test_deleting_a_tenant_takes_its_content_along(self):
+        Tombstone.objects.create(tenant=self.acme, model='portfolio.skills', object_id=0)
+        self.acme.delete()
+        # Constraints are only checked at commit, which a TestCase never reaches
+        connection.check_constraints()
+        self.assertFalse(Education.objects.exists())
+        self.assertEqual(list(Skills.objects.values_list('skillName', flat=True)), ['Python'])
+        self.assertFalse(Tombstone.objects.exists())
+
+    def test_list_query_walks_the_tenant_index(self):
+        with activate(self.acme.pk):
+            seed(200)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        with CaptureQueriesContext(connection) as captured:
+            self.client.get('/t/acme/education/', HTTP_ACCEPT='application/json')
+        sql = next(q['sql'] for q in captured.captured_queries if 'ORDER BY' in q['sql'])
+        with connection.cursor() as cursor:
+            prefix = 'EXPLAIN' if connection.vendor == 'postgresql' else 'EXPLAIN QUERY PLAN'
+            cursor.execute(f'{prefix} {sql}')
+            plan = '\n'.join(str(row[-1]) for row in cursor.fetchall())
+        self.assertIn('education_tenant_order', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+
+class SearchTests(PortfolioTestCase):
+    def setUp(self):
+        super().setUp()
+        inverted_index.clear()
+        self.api = Portfolio.objects.create(title='Django API', description='REST API built with Django', url='https://a.example', ordinal=1)
+        Portfolio.objects.create(title='Game', description='Unity game with a Django leaderboard', url='https://b.example', ordinal=2)
+        Work.objects.create(company='Acme', years='2022', description='Python services', ordinal=1)
+
+    def test_results_are_ranked_and_serialized(self):
+        results = self.client.get('/search/?q=django').json()['results']
+        self.assertEqual([(r['type'], r['item']['id']) for r in results][0], ('portfolio', self.api.pk))
+        self.assertEqual(len(results), 2)
+        self.assertGreater(results[0]['score'], results[1]['score'])
+
+        results = self.client.get('/search/?q=python&type=work').json()['results']
+        self.assertEqual([r['item']['company'] for r in results], ['Acme'])
+
+    def test_rejects_empty_query_and_unknown_type(self):
+        self.assertEqual(self.client.get('/search/?q=').status_code, 400)
+        self.assertEqual(self.client.get('/search/?q=x&type=users').status_code, 400)
+
+    def test_index_follows_writes_without_rebuilding(self):
+        self.client.get('/search/?q=django')
+        skill = Skills.objects.create(skillName='Kubernetes', ordinal=1)
+        self.api.title = 'Flask API'
+        self.api.description = 'REST API'
+        self.api.save()
+
+        with mock.patch.object(inverted_index, 'reindex', wraps=inverted_index.reindex) as reindex:
+            self.assertEqual([r['item']['id'] for r in self.client.get('/search/?q=kubernetes').json()['results']], [skill.pk])
+            self.assertEqual(len(self.client.get('/search/?q=django').json()['results']), 1)
+            skill_pk = skill.pk
+            skill.delete()
+            self.assertEqual(self.client.get('/search/?q=kubernetes').json()['results'], [])
+        # Only the deleted row was touched, never a full rebuild
+        self.assertEqual([call.args for call in reindex.call_args_list], [(Skills, default_tenant_id(), {skill_pk})])
+
+    def test_edits_made_elsewhere_are_reindexed(self):
+        self.client.get('/search/?q=django')
+        # As another worker or a shell would, with no signal reaching this process
+        with mock.patch('portfolio.signals.content_changed.send'):
+            Work.objects.update(description='Django services', updated_at=timezone.now())
+        self.assertEqual(len(self.client.get('/search/?q=django').json()['results']), 3)
+
+    def test_scores_only_count_the_tenants_own_documents(self):
+        expected = [r['score'] for r in self.client.get('/search/?q=django').json()['results']]
+        acme = Tenant.objects.create(slug='acme', name='Acme')
+        with activate(acme.pk):
+            for ordinal in range(20):
+                Portfolio.objects.create(title=f'Django {ordinal}', description='Django', url='https://c.example',
+                                         ordinal=ordinal)
+        self.client.get('/t/acme/search/?q=django')
+        self.assertEqual([r['score'] for r in self.client.get('/search/?q=django').json()['results']], expected)
+
+
+class SnapshotTests(PortfolioTestCase):
+    def setUp(self):
+        super().setUp()
+        static_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, static_root, True)
+        self.settings = override_settings(STATIC_ROOT=static_root, PORTFOLIO_SNAPSHOT={
+            'MODE': 'serve', 'AUTO': False, 'DEBOUNCE_SECONDS': 0, 'KEEP': 2, 'BASE_URL': 'http://testserver',
+        })
+        self.settings.enable()
+        self.addCleanup(self.settings.disable)
+        self.skill = Skills.objects.create(skillName='Python ' * 40, ordinal=1)
+        Work.objects.create(company='Acme', years='2022', description='Things', ordinal=1)
+
+    def snapshot_mode(self, mode):
+        return override_settings(PORTFOLIO_SNAPSHOT={**settings.PORTFOLIO_SNAPSHOT, 'MODE': mode})
+
+    def test_files_match_api_responses(self):
+        with self.snapshot_mode(''):
+            live = {url: self.client.get(url, HTTP_ACCEPT='application/json').content
+                    for url in ('/skills/', f'/skills/{self.skill.pk}/', '/work/', '/bundle/')}
+        version = snapshot.build_snapshot()
+        root = os.path.join(settings.STATIC_ROOT, 'api-snapshot', version)
+        for url, name in (('/skills/', 'skills.json'), (f'/skills/{self.skill.pk}/', f'skills/{self.skill.pk}.json'),
+                          ('/work/', 'work.json'), ('/bundle/', 'bundle.json')):
+            with open(os.path.join(root, name), 'rb') as f:
+                self.assertEqual(f.read(), live[url])
+        self.assertTrue(os.path.exists(os.path.join(root, 'skills.json.gz')))
+        self.assertTrue(os.path.exists(os.path.join(root, 'skills.json.br')))
+
+    def test_serves_fresh_snapshot_after_one_validator_query(self):
+        snapshot.build_snapshot()
+        # As in a server that did not build it: nothing cached, no generations
+        get_backend().clear()
+        with self.assertNumQueries(1):
+            response = self.client.get('/skills/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Cache-Control'], 'no-cache')
+
+        # Only the changed section goes stale, whoever changed it; filtered reads never qualify
+        with mock.patch('portfolio.signals.content_changed.send'):
+            Skills.objects.create(skillName='Django', ordinal=2)
+        self.assertEqual(len(self.client.get('/skills/').json()), 2)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get('/work/')['Cache-Control'], 'no-cache')
+        self.assertIsNone(snapshot.lookup(RequestFactory().get('/work/?fields=id')))
+
+    async def test_async_freshness_reads_the_database(self):
+        await sync_to_async(snapshot.build_snapshot)()
+        hit = await sync_to_async(snapshot.lookup)(RequestFactory().get('/skills/'))
+        self.assertTrue(await snapshot.ais_fresh(hit))
+        await Skills.objects.filter(pk=self.skill.pk).aupdate(updated_at=timezone.now())
+        self.assertFalse(await snapshot.ais_fresh(hit))
+
+    def test_redirects_to_immutable_file(self):
+        version = snapshot.build_snapshot()
+        with self.snapshot_mode('redirect'):
+            response = self.client.get('/work/')
+            self.assertRedirects(response, f'/static/api-snapshot/{version}/work.json', fetch_redirect_response=False)
+            static = self.client.get(response['Location'])
+        self.assertEqual(static.status_code, 200)
+        self.assertIn('immutable', static['Cache-Control'])
+        self.assertEqual(json.loads(b''.join(static.streaming_content))[0]['company'], 'Acme')
+
+    def test_rebuild_is_scheduled_after_commit(self):
+        with mock.patch.object(snapshot.threading, 'Timer') as timer, \
+                override_settings(PORTFOLIO_SNAPSHOT={**settings.PORTFOLIO_SNAPSHOT, 'AUTO': True}):
+            with self.captureOnCommitCallbacks(execute=True):
+                Skills.objects.create(skillName='Django', ordinal=2)
+                timer.assert_not_called()
+        timer.assert_called_once_with(0, snapshot._rebuild)
+
+
+class MetricsTests(PortfolioTestCase):
+    def setUp(self):
+        super().setUp()
+        metrics.registry.clear()
+        Skills.objects.create(skillName='Python', ordinal=1)
+
+    def test_server_timing_breaks_down_the_request(self):
+        response = self.client.get('/skills/', HTTP_ACCEPT='application/json')
+        timing = dict(entry.split(';', 1) for entry in response['Server-Timing'].split(', '))
+        self.assertEqual(set(timing), {'db', 'serialize', 'app'})
+        self.assertIn('desc="2 queries"', timing['db'])
+
+    def test_metrics_endpoint_exposes_route_totals(self):
+        self.client.get('/skills/', HTTP_ACCEPT='application/json')
+        self.client.get('/skills/', HTTP_ACCEPT='application/json')
+        with metrics.timed('upload'):
+            pass  # outside a request, like the upload workers
+
+        body = self.client.get('/metrics/').content.decode()
+        self.assertIn('portfolio_request_duration_seconds_count{route="skills-list",method="GET"} 2', body)
+        self.assertIn('portfolio_requests_total{route="skills-list",method="GET",status="200"} 2', body)
+        self.assertIn('portfolio_db_queries_total{route="skills-list"} 3', body)  # second one is cached
+        self.assertIn('portfolio_phase_seconds_total{route="background",phase="upload"}', body)
+
+        with override_settings(PORTFOLIO_METRICS={**settings.PORTFOLIO_METRICS, 'TOKEN': 'secret'}):
+            self.assertEqual(self.client.get('/metrics/').status_code, 403)
+            self.assertEqual(self.client.get('/metrics/', HTTP_AUTHORIZATION='Bearer secret').status_code, 200)
+
+
+class SingleFlightTests(SimpleTestCase):
+    def compute(self, value, delay=0.0):
+        calls = []
+
+        def compute():
+            calls.append(1)
+            time.sleep(delay)
+            return value
+        return compute, calls
+
+    def test_concurrent_callers_share_one_computation(self):
+        compute, calls = self.compute({'rows': 1}, delay=0.1)
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(single_flight('k', compute))) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [{'rows': 1}] * 8)
+
+    @override_settings(PORTFOLIO_SINGLE_FLIGHT={'TIMEOUT': 2.0, 'LOCK_TIMEOUT': 5})
+    def test_waits_for_leader_in_another_process(self):
+        backend = DjangoCacheBackend(alias='default')
+        backend.add('k:lock', 1, 5)  # held by "another worker"
+        threading.Timer(0.05, backend.set, ['k', 'shared']).start()
+        compute, calls = self.compute('own')
+        with mock.patch('portfolio.cache._backend', backend):
+            self.assertEqual(single_flight('k', compute), 'shared')
+        self.assertEqual(calls, [])
+        backend.clear()
+
+    @override_settings(PORTFOLIO_SINGLE_FLIGHT={'TIMEOUT': 0.1, 'LOCK_TIMEOUT': 5})
+    def test_stuck_leader_only_costs_the_timeout(self):
+        backend = DjangoCacheBackend(alias='default')
+        backend.add('k:lock', 1, 5)
+        compute, calls = self.compute('own')
+        started = time.monotonic()
+        with mock.patch('portfolio.cache._backend', backend):
+            self.assertEqual(single_flight('k', compute), 'own')
+        self.assertLess(time.monotonic() - started, 1)
+        self.assertEqual(len(calls), 1)
+        backend.clear()
+
+
+class WarmupTests(PortfolioTestCase):
+    @override_settings(PORTFOLIO_WARMUP={'ENABLED': True, 'PATHS': ['/bundle/', '/skills/'], 'HOST': 'testserver'})
+    def test_primes_response_caches(self):
+        Skills.objects.create(skillName='Python', ordinal=1)
+        self.assertEqual(warm_up(), {'/bundle/': 200, '/skills/': 200})
+        with self.assertNumQueries(1):  # only the section validators
+            self.client.get('/bundle/')
+        with self.assertNumQueries(1):  # only the conditional-GET validators
+            self.client.get('/skills/', HTTP_ACCEPT='application/json')
+
+
+class CacheBackendTests(TestCase):
+    def test_memory_backend_evicts_least_recently_used(self):
+        backend = MemoryBackend(max_entries=2)
+        backend.set('a', 1)
+        backend.set('b', 2)
+        backend.get('a')
+        backend.set('c', 3)
+        self.assertIsNone(backend.get('b'))
+        self.assertEqual((backend.get('a'), backend.get('c')), (1, 3))
+
+    def test_file_backend_shares_counters(self):
+        with tempfile.TemporaryDirectory() as location:
+            caches = {'portfolio': {
+                'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                'LOCATION': location,
+            }}
+            with override_settings(CACHES=caches):
+                first, second = DjangoCacheBackend(), DjangoCacheBackend()
+                start = first.counter('gen')
+                self.assertEqual(second.counter('gen'), start)
+                second.incr('gen')
+                self.assertEqual(first.counter('gen'), start + 1)
+                first.set('k', [1, 2])
+                self.assertEqual(second.get('k'), [1, 2])
@@ -0,0 +1,193 @@
+"""Moving portfolio content in and out in bulk, for the import_content/export_content commands.
+
+Both work on the current tenant's rows; the commands pick the tenant with --tenant.
+"""
+import csv
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Education, Work, Portfolio, Skills, ImageModel
+from .signals import content_changed
+from .tenants import current_tenant_id
+
+# name -> (model, natural key used to match rows on import)
+CONTENT = {
+    'education': (Education, ('school', 'degree')),
+    'work': (Work, ('company', 'years')),
+    'portfolio': (Portfolio, ('title',)),
+    'skills': (Skills, ('skillName',)),
+}
+
+# Derived or bookkeeping columns that are never exported
+SKIPPED_FIELDS = {'id', 'tenant', 'image', 'image_status', 'image_url', 'image_srcset', 'updated_at'}
+
+
+def export_fields(model):
+    return [f.name for f in model._meta.concrete_fields if f.name not in SKIPPED_FIELDS]
+
+
+def image_name(resource):
+    return f'{resource.public_id}.{resource.format}' if resource.format else resource.public_id
+
+
+class Progress:
+    def __init__(self, write, label, total, every=25):
+        self.write, self.label, self.total, self.every = write, label, total, every
+        self.done = 0
+        self.started = time.monotonic()
+
+    def step(self):
+        self.done += 1
+        if self.done % self.every == 0 or self.done == self.total:
+            self.write(f'  {self.label}: {self.done}/{self.total} ({self.rate():.1f}/s)')
+
+    def rate(self):
+        return self.done / max(time.monotonic() - self.started, 1e-9)
+
+
+def read_rows(path, fmt):
+    if fmt == 'json':
+        with open(os.path.join(path, 'content.json')) as f:
+            return json.load(f)
+    data = {}
+    for name in CONTENT:
+        csv_path = os.path.join(path, f'{name}.csv')
+        if os.path.exists(csv_path):
+            # CSV writes NULL as an empty cell, so that is what it reads back as on nullable columns
+            nullable = {f for f in export_fields(CONTENT[name][0]) if CONTENT[name][0]._meta.get_field(f).null}
+            with open(csv_path, newline='') as f:
+                data[name] = [{k: None if k in nullable and v == '' else v for k, v in row.items()}
+                              for row in csv.DictReader(f)]
+    return data
+
+
+def write_rows(path, fmt, data):
+    if fmt == 'json':
+        with open(os.path.join(path, 'content.json'), 'w') as f:
+            json.dump(data, f, indent=2, cls=DjangoJSONEncoder)
+        return
+    for name, rows in data.items():
+        model = CONTENT[name][0]
+        columns = export_fields(model) + (['image'] if issubclass(model, ImageModel) else [])
+        with open(os.path.join(path, f'{name}.csv'), 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=columns)
+            writer.writeheader()
+            writer.writerows(rows)
+
+
+def run_pool(jobs, workers, progress):
+    """Run (key, fn) jobs on a bounded thread pool; returns {key: result}."""
+    results = {}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(fn): key for key, fn in jobs}
+        for future in as_completed(futures):
+            results[futures[future]] = future.result()
+            progress.step()
+    return results
+
+
+def export_content(path, fmt, storage, workers, write, with_images=True):
+    images_dir = os.path.join(path, 'images')
+    data, downloads = {}, []
+    for name, (model, _) in CONTENT.items():
+        rows = []
+        for obj in model.objects.for_tenant().order_by('ordinal', 'pk'):
+            # Real values (None, numbers, dates) rather than value_to_string(), which spells NULL "None"
+            row = {field: model._meta.get_field(field).value_from_object(obj) for field in export_fields(model)}
+            if issubclass(model, ImageModel):
+                row['image'] = ''
+                if obj.image and with_images:
+                    row['image'] = image_name(obj.image)
+                    target = os.path.join(images_dir, row['image'])
+                    downloads.append((row['image'], lambda r=obj.image, t=target: _download(storage, r, t)))
+            rows.append(row)
+        data[name] = rows
+        write(f'{name}: {len(rows)} row(s)')
+
+    write_rows(path, fmt, data)
+    if downloads:
+        run_pool(downloads, workers, Progress(write, 'images', len(downloads)))
+    return data
+
+
+def _download(storage, resource, target):
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    storage.download(resource, target)
+
+
+def import_content(path, fmt, storage, workers, write):
+    data = read_rows(path, fmt)
+    summary = {}
+    for name, rows in data.items():
+        model, key = CONTENT[name]
+        started = time.monotonic()
+        summary[name] = _import_model(model, key, rows, path, storage, workers, write)
+        elapsed = time.monotonic() - started
+        write(f'{name}: {summary[name]} in {elapsed:.2f}s ({len(rows) / max(elapsed, 1e-9):.0f} rows/s)')
+    return summary
+
+
+def _import_model(model, key, rows, path, storage, workers, write):
+    fields = export_fields(model)
+    has_image = issubclass(model, ImageModel)
+    existing = {tuple(getattr(obj, k) for k in key): obj for obj in model.objects.for_tenant()}
+
+    # Upload images first, concurrently; rows that already point at the same
+    # image (by public_id) are left alone so re-running an import is cheap.
+    uploads = []
+    for row in rows:
+        if not (has_image and row.get('image')):
+            continue
+        current = existing.get(tuple(row[k] for k in key))
+        public_id = os.path.splitext(row['image'])[0]
+        if current is not None and current.image and current.image.public_id == public_id:
+            continue
+        folder = model._meta.get_field('image').options.get('folder', model._meta.model_name)
+        source = os.path.join(path, 'images', row['image'])
+        uploads.append((row['image'], lambda s=source, f=folder: storage.upload(s, f)))
+    uploaded = run_pool(uploads, workers, Progress(write, f'{model._meta.model_name} images', len(uploads))) if uploads else {}
+
+    to_create, to_update, unchanged = [], [], 0
+    new_keys = set()
+    now = timezone.now()
+    for row in rows:
+        values = {f: model._meta.get_field(f).to_python(row[f]) for f in fields if f in row}
+        natural_key = tuple(values[k] for k in key)
+        obj = existing.get(natural_key)
+        image = uploaded.get(row.get('image')) if has_image else None
+        if obj is None:
+            obj = existing[natural_key] = model(**values)
+            new_keys.add(natural_key)
+            to_create.append(obj)
+        elif natural_key in new_keys:
+            # Repeated keys in one file collapse onto the same new row
+            for f, v in values.items():
+                setattr(obj, f, v)
+        elif image is None and all(getattr(obj, f) == v for f, v in values.items()):
+            unchanged += 1
+            continue
+        else:
+            for f, v in values.items():
+                setattr(obj, f, v)
+            obj.updated_at = now
+            to_update.append(obj)
+        if image is not None:
+            obj.image = image
+        if has_image:
+            obj.refresh_image_urls(storage)
+
+    update_fields = fields + (['image', 'image_url', 'image_srcset'] if has_image else []) + ['updated_at']
+    with transaction.atomic():
+        model.objects.bulk_create(to_create, batch_size=500)
+        model.objects.bulk_update(to_update, update_fields, batch_size=500)
+
+    for op, objs in (('create', to_create), ('update', to_update)):
+        if objs:
+            content_changed.send(sender=model, pks=[obj.pk for obj in objs], op=op, tenant=current_tenant_id())
+    return {'created': len(to_create), 'updated': len(to_update), 'unchanged': unchanged, 'images': len(uploaded)}
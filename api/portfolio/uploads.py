@@ -0,0 +1,241 @@
+import hashlib
+import logging
+import os
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .metrics import timed
+from .models import ImageStatus, ImageUploadJob, UploadSession
+from .storage import get_image_storage
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _conf(name):
+    return settings.PORTFOLIO_UPLOADS[name]
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=_conf('WORKERS'), thread_name_prefix='image-upload')
+    return _executor
+
+
+def stage_file(image_file):
+    """Copy an uploaded file somewhere that outlives the request."""
+    staging_dir = _conf('STAGING_DIR')
+    os.makedirs(staging_dir, exist_ok=True)
+    path = os.path.join(staging_dir, uuid.uuid4().hex + os.path.splitext(image_file.name)[1])
+    with open(path, 'wb') as staged:
+        for chunk in image_file.chunks():
+            staged.write(chunk)
+    return path
+
+
+def enqueue_upload(instance, image_file, folder):
+    """Mark `instance` as pending and hand the upload to the worker pool once committed."""
+    return enqueue_staged(instance, stage_file(image_file), folder)
+
+
+def enqueue_staged(instance, path, folder):
+    """enqueue_upload() for a file that is already in STAGING_DIR."""
+    job = ImageUploadJob.objects.create(
+        model=instance._meta.label_lower,
+        object_id=instance.pk,
+        folder=folder,
+        source=path,
+    )
+    instance.image_status = ImageStatus.PENDING
+    instance.save(update_fields=['image_status', 'updated_at'])
+    transaction.on_commit(lambda: submit(job.pk))
+    return job
+
+
+def submit(job_id):
+    if _conf('EAGER'):
+        run_job(job_id)
+    else:
+        get_executor().submit(_run_in_worker, job_id)
+
+
+def _run_in_worker(job_id):
+    try:
+        run_job(job_id)
+    except Exception:
+        logger.exception('Image upload job %s crashed', job_id)
+    finally:
+        connections.close_all()
+
+
+def backoff(attempts):
+    return _conf('BACKOFF_SECONDS') * 2 ** (attempts - 1)
+
+
+def run_job(job_id):
+    # Claiming with a conditional UPDATE keeps two workers off the same job
+    claimed = ImageUploadJob.objects.filter(pk=job_id, status=ImageUploadJob.PENDING).update(
+        status=ImageUploadJob.RUNNING, attempts=F('attempts') + 1, updated_at=timezone.now()
+    )
+    if not claimed:
+        return
+    job = ImageUploadJob.objects.get(pk=job_id)
+
+    try:
+        with timed('upload'):
+            public_id = get_image_storage().upload(job.source, job.folder)
+    except Exception as e:
+        job.error = str(e)
+        if job.attempts >= _conf('MAX_ATTEMPTS'):
+            job.status = ImageUploadJob.FAILED
+            job.save()
+            _finish(job, status=ImageStatus.FAILED)
+        else:
+            delay = backoff(job.attempts)
+            job.status = ImageUploadJob.PENDING
+            job.next_attempt_at = timezone.now() + timedelta(seconds=delay)
+            job.save()
+            if not _conf('EAGER'):
+                threading.Timer(delay, submit, [job.pk]).start()
+        return
+
+    job.public_id = public_id
+    job.status = ImageUploadJob.DONE
+    job.error = ''
+    job.save()
+    _finish(job, status=ImageStatus.READY, public_id=public_id)
+
+
+def _finish(job, status, public_id=None):
+    if os.path.exists(job.source):
+        os.remove(job.source)
+
+    # A newer upload for the same row wins, whichever finishes first
+    newer = ImageUploadJob.objects.filter(model=job.model, object_id=job.object_id, pk__gt=job.pk).exists()
+    instance = apps.get_model(job.model).objects.filter(pk=job.object_id).first()
+    if newer or instance is None:
+        return
+
+    instance.image_status = status
+    fields = ['image_status', 'updated_at']
+    if public_id:
+        instance.image = public_id
+        fields.append('image')
+    instance.save(update_fields=fields)
+
+
+def process_due_jobs(stale_after=timedelta(minutes=10)):
+    """Run every pending job whose retry time has come, e.g. after a restart."""
+    # Jobs left running by a worker that died are handed out again
+    ImageUploadJob.objects.filter(
+        status=ImageUploadJob.RUNNING, updated_at__lt=timezone.now() - stale_after
+    ).update(status=ImageUploadJob.PENDING)
+
+    due = ImageUploadJob.objects.filter(status=ImageUploadJob.PENDING, next_attempt_at__lte=timezone.now())
+    job_ids = list(due.values_list('pk', flat=True))
+    for job_id in job_ids:
+        run_job(job_id)
+    expire_sessions()
+    return len(job_ids)
+
+
+# Chunked uploads: POST <route>/<pk>/image-upload/ opens a session, PUT /uploads/<id>/ with
+# Content-Range appends bytes at the current offset, POST /uploads/<id>/finalize/ checks
+# the sha256 and hands the staged file to the jobs above. The request body is copied to
+# the staging file as it arrives, so memory stays at READ_SIZE whatever the image size.
+READ_SIZE = 64 * 1024
+
+
+class OffsetMismatch(Exception):
+    """The chunk does not start where the session stopped; resume from `offset`."""
+
+    def __init__(self, offset):
+        super().__init__(f'Expected a chunk starting at byte {offset}')
+        self.offset = offset
+
+
+class ChecksumMismatch(Exception):
+    pass
+
+
+def open_session(instance, folder, size, filename=''):
+    staging_dir = _conf('STAGING_DIR')
+    os.makedirs(staging_dir, exist_ok=True)
+    path = os.path.join(staging_dir, uuid.uuid4().hex + os.path.splitext(filename)[1].lower())
+    open(path, 'wb').close()
+    return UploadSession.objects.create(
+        model=instance._meta.label_lower, object_id=instance.pk, folder=folder, path=path, size=size)
+
+
+def receive_chunk(session, start, stream, length):
+    """Write `length` bytes of `stream` at `start` and return the new offset.
+
+    Whatever arrives before a dropped connection is kept, so the client
+    resumes from the last byte the server actually has.
+    """
+    if start != session.received:
+        raise OffsetMismatch(session.received)
+    written = 0
+    with open(session.path, 'r+b') as staged:
+        staged.seek(start)
+        staged.truncate()
+        try:
+            while written < length:
+                piece = stream.read(min(READ_SIZE, length - written))
+                if not piece:
+                    break
+                staged.write(piece)
+                written += len(piece)
+        except OSError:
+            logger.info('Upload %s interrupted at byte %s', session.pk, start + written)
+    # Conditional, so of two requests racing for the same range only one moves the offset
+    moved = UploadSession.objects.filter(pk=session.pk, received=start).update(
+        received=start + written, updated_at=timezone.now())
+    if not moved:
+        session.refresh_from_db()
+        raise OffsetMismatch(session.received)
+    session.received = start + written
+    return session.received
+
+
+def finish_session(session, sha256):
+    """Check the staged bytes against `sha256` and queue the image for storage.
+
+    On a mismatch the session starts over from byte 0.
+    """
+    digest = hashlib.sha256()
+    with open(session.path, 'rb') as staged:
+        for piece in iter(lambda: staged.read(1024 * 1024), b''):
+            digest.update(piece)
+    if digest.hexdigest() != sha256.lower():
+        open(session.path, 'wb').close()
+        UploadSession.objects.filter(pk=session.pk).update(received=0, updated_at=timezone.now())
+        raise ChecksumMismatch('sha256 of the received bytes does not match')
+
+    instance = apps.get_model(session.model).objects.get(pk=session.object_id)
+    with transaction.atomic():
+        enqueue_staged(instance, session.path, session.folder)
+        session.delete()
+    return instance
+
+
+def expire_sessions():
+    """Drop sessions untouched for SESSION_HOURS, with their staged bytes."""
+    stale = UploadSession.objects.filter(updated_at__lt=timezone.now() - timedelta(hours=_conf('SESSION_HOURS')))
+    for session in stale:
+        if os.path.exists(session.path):
+            os.remove(session.path)
+        session.delete()
@@ -12,5 +12,10 @@ router.register(r'skills', views.SkillViewSet)
 # Wire up our API using automatic URL routing.
 # Additionally, we include login URLs for the browsable API.
 urlpatterns = [
+    path('bundle/', views.BundleView.as_view(), name='bundle'),
+    path('changes/', views.ChangesView.as_view(), name='changes'),
+    path('uploads/<uuid:pk>/', views.UploadSessionView.as_view(), name='upload-session'),
+    path('uploads/<uuid:pk>/finalize/', views.UploadFinalizeView.as_view(), name='upload-finalize'),
+    path('search/', views.SearchView.as_view(), name='search'),
     path('', include(router.urls)),
 ]
\ No newline at end of file
@@ -1,108 +1,177 @@
-from django.shortcuts import render
+import re
+
+from django.core.exceptions import ObjectDoesNotExist
+from django.shortcuts import get_object_or_404, render
+from django.http import Http404, HttpResponse
 from django.contrib.auth.models import User
 from rest_framework import permissions, viewsets, parsers, status
 from rest_framework.response import Response
+from rest_framework.views import APIView
 from rest_framework.parsers import MultiPartParser, FormParser
 from .serializers import UserSerializer, EducationSerializer, PortfolioSerializer, WorkSerializer, SkillsSerializer
-from .models import Education, Work, Portfolio, Skills
+from .models import Education, Work, Portfolio, Skills, UploadSession
+from .bundle import get_bundle
+from .search import TYPES, search
+from .sync import changes, decode_token
+from .uploads import ChecksumMismatch, OffsetMismatch, finish_session, receive_chunk
+from .mixins import (
+    BulkUpdateMixin, CachedResponseMixin, ConditionalGetMixin, ImageUploadMixin, SparseQuerysetMixin, StreamingListMixin,
+    TenantQuerysetMixin,
+)
+from .pagination import KeysetPagination, UserPagination
+
+CONTENT_RANGE = re.compile(r'bytes (\d+)-(\d+)/(\d+)')
+SHA256 = re.compile(r'[0-9a-fA-F]{64}')
 
-class UserViewSet(viewsets.ModelViewSet):
-    queryset = User.objects.all().order_by('-date_joined')
+
+class UserViewSet(StreamingListMixin, viewsets.ModelViewSet):
+    """Paged newest first; ?username= narrows to a username prefix."""
+    queryset = User.objects.all().order_by('-date_joined', '-id').prefetch_related('groups')
     serializer_class = UserSerializer
     permission_classes = [permissions.AllowAny]
+    pagination_class = UserPagination
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        prefix = self.request.query_params.get('username')
+        if prefix:
+            # The range lets the unique index on username serve the lookup on every database
+            # (SQLite never uses an index for LIKE); startswith keeps the match exact under any collation.
+            queryset = queryset.filter(username__gte=prefix, username__lt=prefix + '\U0010ffff',
+                                       username__startswith=prefix)
+        return queryset
+
+
+class ContentViewSet(StreamingListMixin, ConditionalGetMixin, CachedResponseMixin, TenantQuerysetMixin, SparseQuerysetMixin,
+                     BulkUpdateMixin, viewsets.ModelViewSet):
+    """Shared read path (conditional GET, response cache, keyset pages, sparse fields, streaming) and bulk updates.
+
+    Everything is limited to the request's tenant.
+    """
+    pagination_class = KeysetPagination
+
+    def get_serializer_context(self):
+        return {**super().get_serializer_context(), 'sparse_fieldsets': True}
 
-class EducationViewSet(viewsets.ModelViewSet):
-    queryset = Education.objects.all().order_by('ordinal')
+
+class EducationViewSet(ImageUploadMixin, ContentViewSet):
+    queryset = Education.objects.all().order_by('ordinal', 'id')
     serializer_class = EducationSerializer
     parser_classes = (MultiPartParser, FormParser)
+    image_folder = 'education'
+
 
-    def update(self, request, *args, **kwargs):
-        partial = kwargs.pop('partial', False)  # Handle both PUT and PATCH
-        instance = self.get_object()
-        
-        # Handle Cloudinary image upload
-        image_file = request.FILES.get('image')
-        if image_file:
-            try:
-                # Upload new image to Cloudinary
-                upload_result = cloudinary.uploader.upload(
-                    image_file,
-                    folder='education',  # Specify your folder
-                    resource_type="image"
-                )
-                request.data['image'] = upload_result['public_id']
-            except Exception as e:
-                return Response({'error': f'Image upload failed: {str(e)}'}, status=status.HTTP_400_BAD_REQUEST)
-        
-        # Update the instance
-        serializer = self.get_serializer(instance, data=request.data, partial=partial)
-        if serializer.is_valid():
-            serializer.save()
-            return Response(serializer.data, status=status.HTTP_200_OK)
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
-
-
-class WorkViewSet(viewsets.ModelViewSet):
-    queryset = Work.objects.all().order_by('ordinal')
+class WorkViewSet(ImageUploadMixin, ContentViewSet):
+    queryset = Work.objects.all().order_by('ordinal', 'id')
     serializer_class = WorkSerializer
     parser_classes = (MultiPartParser, FormParser)
+    image_folder = 'work'
 
-    def update(self, request, *args, **kwargs):
-        partial = kwargs.pop('partial', False)  # Handle both PUT and PATCH
-        instance = self.get_object()
-        
-        # Handle Cloudinary image upload
-        image_file = request.FILES.get('image')
-        if image_file:
-            try:
-                # Upload new image to Cloudinary
-                upload_result = cloudinary.uploader.upload(
-                    image_file,
-                    folder='work',  # Specify your folder
-                    resource_type="image"
-                )
-                request.data['image'] = upload_result['public_id']
-            except Exception as e:
-                return Response({'error': f'Image upload failed: {str(e)}'}, status=status.HTTP_400_BAD_REQUEST)
-        
-        # Update the instance
-        serializer = self.get_serializer(instance, data=request.data, partial=partial)
-        if serializer.is_valid():
-            serializer.save()
-            return Response(serializer.data, status=status.HTTP_200_OK)
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
-
-class PortfolioViewSet(viewsets.ModelViewSet):
-    queryset = Portfolio.objects.all().order_by('ordinal')
+
+class PortfolioViewSet(ImageUploadMixin, ContentViewSet):
+    queryset = Portfolio.objects.all().order_by('ordinal', 'id')
     serializer_class = PortfolioSerializer
     parser_classes = (MultiPartParser, FormParser)
+    image_folder = 'portfolio'
+
 
-    def update(self, request, *args, **kwargs):
-        partial = kwargs.pop('partial', False)  # Handle both PUT and PATCH
-        instance = self.get_object()
-        
-        # Handle Cloudinary image upload
-        image_file = request.FILES.get('image')
-        if image_file:
-            try:
-                # Upload new image to Cloudinary
-                upload_result = cloudinary.uploader.upload(
-                    image_file,
-                    folder='portfolio',  # Specify your folder
-                    resource_type="image"
-                )
-                request.data['image'] = upload_result['public_id']
-            except Exception as e:
-                return Response({'error': f'Image upload failed: {str(e)}'}, status=status.HTTP_400_BAD_REQUEST)
-        
-        # Update the instance
-        serializer = self.get_serializer(instance, data=request.data, partial=partial)
-        if serializer.is_valid():
-            serializer.save()
-            return Response(serializer.data, status=status.HTTP_200_OK)
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
-
-class SkillViewSet(viewsets.ModelViewSet):  # Changed from SkillsViewSet
-    queryset = Skills.objects.all().order_by('ordinal')
+class SkillViewSet(ContentViewSet):  # Changed from SkillsViewSet
+    queryset = Skills.objects.all().order_by('ordinal', 'id')
     serializer_class = SkillsSerializer
-    permission_classes = [permissions.IsAuthenticatedOrReadOnly]
\ No newline at end of file
+    permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+
+class BundleView(APIView):
+    """Education, work, portfolio and skills in a single precomputed document."""
+    permission_classes = [permissions.AllowAny]
+
+    def get(self, request, *args, **kwargs):
+        return HttpResponse(get_bundle(request), content_type='application/json')
+
+
+class ChangesView(APIView):
+    """Rows created or updated and ids deleted since ?since=<token>, plus the next token."""
+    permission_classes = [permissions.AllowAny]
+
+    def get(self, request, *args, **kwargs):
+        token = request.query_params.get('since')
+        response = Response(changes(decode_token(token) if token else None, request))
+        response['Cache-Control'] = 'no-cache'
+        return response
+
+
+class UploadSessionView(APIView):
+    """GET: bytes received so far. PUT with Content-Range: bytes <start>-<end>/<size> appends a chunk."""
+    # The body is copied to disk as it is read, never parsed or buffered
+    parser_classes = []
+
+    def get(self, request, pk):
+        session = get_object_or_404(UploadSession, pk=pk)
+        return Response({'id': str(session.pk), 'offset': session.received, 'size': session.size})
+
+    def put(self, request, pk):
+        session = get_object_or_404(UploadSession, pk=pk)
+        match = CONTENT_RANGE.fullmatch(request.headers.get('Content-Range', ''))
+        if match is None:
+            return Response({'error': 'Expected Content-Range: bytes <start>-<end>/<size>.'}, status=status.HTTP_400_BAD_REQUEST)
+        start, end, total = map(int, match.groups())
+        length = int(request.META.get('CONTENT_LENGTH') or 0)
+        if total != session.size or not start <= end < total or length != end - start + 1:
+            return Response({'error': 'Content-Range does not fit this upload.'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            offset = receive_chunk(session, start, request.stream, length)
+        except OffsetMismatch as e:
+            return Response({'error': str(e), 'offset': e.offset}, status=status.HTTP_409_CONFLICT)
+        return Response({'id': str(session.pk), 'offset': offset, 'size': session.size})
+
+
+class UploadFinalizeView(APIView):
+    """POST {"sha256": "<hex>"} once every byte is in: verify and queue the image like a regular upload."""
+    parser_classes = [parsers.JSONParser]
+
+    def post(self, request, pk):
+        session = get_object_or_404(UploadSession, pk=pk)
+        sha256 = request.data.get('sha256') if isinstance(request.data, dict) else None
+        if not isinstance(sha256, str) or not SHA256.fullmatch(sha256):
+            return Response({'error': 'Expected a hex sha256 of the whole file.'}, status=status.HTTP_400_BAD_REQUEST)
+        if session.received != session.size:
+            return Response({'error': 'Upload incomplete.', 'offset': session.received}, status=status.HTTP_409_CONFLICT)
+        try:
+            instance = finish_session(session, sha256)
+        except ChecksumMismatch as e:
+            return Response({'error': str(e), 'offset': 0}, status=status.HTTP_400_BAD_REQUEST)
+        except ObjectDoesNotExist:
+            raise Http404
+        return Response({'model': session.model, 'id': instance.pk, 'image_status': instance.image_status},
+                        status=status.HTTP_202_ACCEPTED)
+
+
+class SearchView(APIView):
+    """Ranked full-text search over portfolio, work, education and skills: /search/?q=django&type=work"""
+    permission_classes = [permissions.AllowAny]
+    serializers = {Portfolio: PortfolioSerializer, Work: WorkSerializer, Education: EducationSerializer, Skills: SkillsSerializer}
+
+    def get(self, request, *args, **kwargs):
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response({'error': 'Missing ?q= search terms.'}, status=status.HTTP_400_BAD_REQUEST)
+        types = [name for name in request.query_params.get('type', '').split(',') if name]
+        if set(types) - set(TYPES):
+            return Response({'error': f"type must be one of {', '.join(TYPES)}"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = max(1, min(int(request.query_params.get('limit', 20)), 100))
+        except ValueError:
+            limit = 20
+
+        hits = search(query, [TYPES[name] for name in types] or None, limit)
+        names = {model: name for name, model in TYPES.items()}
+        objects = {model: model.objects.for_tenant().in_bulk([pk for m, pk, _ in hits if m is model]) for model in {m for m, _, _ in hits}}
+        results = [
+            {
+                'type': names[model],
+                'score': round(score, 4),
+                'item': self.serializers[model](objects[model][pk], context={'request': request}).data,
+            }
+            for model, pk, score in hits
+            if pk in objects[model]
+        ]
+        return Response({'query': query, 'results': results})
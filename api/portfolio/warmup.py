@@ -0,0 +1,29 @@
+import logging
+import time
+
+from django.conf import settings
+from django.db import connections
+from django.urls import get_resolver
+
+logger = logging.getLogger(__name__)
+
+
+def warm_up():
+    """Get a fresh worker ready for its first visitor; returns {path: status} of the primed reads.
+
+    Opens every database connection (kept by CONN_MAX_AGE), imports the
+    URLconf and with it the views and serializers, and sends the configured
+    reads through the full stack so the response caches are filled.
+    """
+    from django.test import Client  # only this function needs the test client
+
+    conf = settings.PORTFOLIO_WARMUP
+    started = time.perf_counter()
+    for connection in connections.all():
+        connection.ensure_connection()
+    get_resolver().url_patterns
+
+    client = Client(HTTP_HOST=conf['HOST'], raise_request_exception=False)
+    statuses = {path: client.get(path, HTTP_ACCEPT='application/json').status_code for path in conf['PATHS']}
+    logger.info('Warmed up in %.0f ms: %s', (time.perf_counter() - started) * 1000, statuses)
+    return statuses
@@ -94,35 +94,27 @@ function App() {
     return () => window.removeEventListener('scroll', handleScroll);
   }, []);
 
-  const fetchData = async () => {
+  // quiet: refresh in place after a pushed change, keeping the page up if it fails
+  const fetchData = async ({ quiet = false } = {}) => {
     try {
-      setLoading(true);
-      setError(null);
-
-      const endpoints = {
-        education: `${API_BASE_URL}/education/`,
-        work: `${API_BASE_URL}/work/`,
-        portfolio: `${API_BASE_URL}/portfolio/`,
-        skills: `${API_BASE_URL}/skills/`,
-      };
-
-      const responses = await Promise.all(
-        Object.entries(endpoints).map(async ([key, url]) => {
-          const response = await fetch(url);
-          if (!response.ok) throw new Error(`Failed to fetch ${key} data`);
-          const data = await response.json();
-          return data.sort((a, b) => (a.ordinal || 0) - (b.ordinal || 0));
-        })
-      );
+      if (!quiet) {
+        setLoading(true);
+        setError(null);
+      }
+
+      const response = await fetch(`${API_BASE_URL}/bundle/`);
+      if (!response.ok) throw new Error('Failed to fetch portfolio data');
+      const bundle = await response.json();
+      const byOrdinal = (a, b) => (a.ordinal || 0) - (b.ordinal || 0);
 
       setData({
-        education: responses[0],
-        work: responses[1],
-        portfolio: responses[2],
-        skills: responses[3],
+        education: bundle.education.sort(byOrdinal),
+        work: bundle.work.sort(byOrdinal),
+        portfolio: bundle.portfolio.sort(byOrdinal),
+        skills: bundle.skills.sort(byOrdinal),
       });
     } catch (err) {
-      setError(err.message);
+      if (!quiet) setError(err.message);
     } finally {
       setLoading(false);
     }
@@ -130,6 +122,20 @@ function App() {
 
   useEffect(() => {
     fetchData();
+
+    // The API pushes a notice whenever content changes (ASGI deployments; elsewhere
+    // /events/ is a 404 and EventSource gives up). A burst of edits is one reload.
+    if (typeof EventSource === 'undefined') return undefined;
+    const events = new EventSource(`${API_BASE_URL}/events/`);
+    let timer;
+    events.onmessage = () => {
+      clearTimeout(timer);
+      timer = setTimeout(() => fetchData({ quiet: true }), 250);
+    };
+    return () => {
+      clearTimeout(timer);
+      events.close();
+    };
   }, []);
 
   const scrollToTop = () => {
@@ -315,9 +321,11 @@ const EducationSection = ({ educationRef, data, darkMode }) => (
             ${darkMode ? 'bg-gray-800 text-white' : 'bg-white text-gray-900'}`}
           style={{ minHeight: '300px' }} // Ensure equal height for all cards
         >
-          {edu.image && (
+          {edu.image_url && (
             <img
-              src={edu.image}
+              src={edu.image_url}
+              srcSet={edu.image_srcset}
+              sizes="128px"
               alt={edu.school}
               className="w-32 h-32 object-contain rounded-full mb-4"
             />
@@ -347,9 +355,11 @@ const WorkSection = ({ workRef, data, darkMode }) => (
         >
           {/* Company Info */}
           <div className="flex flex-col items-center text-center w-full lg:w-1/4">
-            {job.image && (
+            {job.image_url && (
               <img
-                src={job.image}
+                src={job.image_url}
+                srcSet={job.image_srcset}
+                sizes="96px"
                 alt={job.company}
                 className="w-24 h-24 object-cover rounded-full ring-2 ring-cyan-500 shadow-md transform hover:scale-105 transition-transform"
               />
@@ -411,9 +421,11 @@ const PortfolioSection = ({ portfolioRef, data, darkMode }) => (
               darkMode ? 'bg-gray-800 text-white' : 'bg-white text-gray-900'
             } ${idx % 2 === 0 ? 'lg:ml-8' : 'lg:mr-8'}`}
           >
-            {project.image && (
+            {project.image_url && (
               <img
-                src={project.image}
+                src={project.image_url}
+                srcSet={project.image_srcset}
+                sizes="(min-width: 1024px) 40vw, 100vw"
                 alt={project.title}
                 className="w-full h-full object-cover rounded-lg mb-4 transform transition-transform duration-300 hover:scale-105 border-2 border-cyan-500"
               />